@@ -55,8 +55,11 @@ const cicdStack = new CICDStack(app, `${StackPrefix}-CICD`, {
     'cdk/lambda/text_generation/**',
     'cdk/lambda/audioToText/**',
     'cdk/lambda/case_generation/**',
-    'cdk/lambda/summary_generation/**'
+    'cdk/lambda/summary_generation/**',
+    'cdk/lambda/shared/**'
   ],
+  buildContext: 'cdk/lambda',
+  sharedDirs: ['cdk/lambda/shared'],
 });
 
 const apiStack = new ApiGatewayStack(app, `${StackPrefix}-Api`, dbStack, vpcStack, {
@@ -0,0 +1,86 @@
+"""
+Exercise segmented transcription offline with a fake transcription backend.
+
+A synthetic recording is planned into segments, each segment is "transcribed" by slicing the
+ground-truth transcript (shifted to segment-relative times, with per-job speaker labels shuffled
+and a little timing jitter), segments finish in random order, and the stitched transcript is
+checked against the transcript of the whole recording.
+
+Usage:
+    python benchmarks/segmentation_check.py [hours ...]   (default: 2)
+"""
+import os
+import sys
+import json
+import time
+import random
+from bisect import bisect_right
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from helpers.segmentation import plan_segments, transcribe_segments  # noqa: E402
+from helpers.transcript import format_diarized_transcript  # noqa: E402
+from transcript_benchmark import synthetic_transcript  # noqa: E402
+
+
+class FakeTranscriptionBackend:
+    """Returns the part of a known transcript each segment covers, as separate jobs would."""
+
+    def __init__(self, data, seed=11):
+        self.items = data["results"]["items"]
+        self.segments = data["results"]["speaker_labels"]["segments"]
+        self.starts = [float(seg["start_time"]) for seg in self.segments]
+        self.rng = random.Random(seed)
+
+    def speaker_at(self, t):
+        return self.segments[bisect_right(self.starts, t) - 1]["speaker_label"]
+
+    def __call__(self, segment):
+        rng = random.Random(segment["index"])
+        # Each job names speakers in its own order
+        relabel = dict(zip(["spk_0", "spk_1"], rng.sample(["spk_0", "spk_1"], 2)))
+        items, labels, inside = [], [], False
+        for item in self.items:
+            if item["type"] == "punctuation":
+                if inside:
+                    items.append(item)
+                continue
+            start = float(item["start_time"])
+            inside = segment["start"] <= start < segment["end"]
+            if not inside:
+                continue
+            jitter = rng.uniform(-0.05, 0.05)
+            local = max(0.0, start - segment["start"] + jitter)
+            speaker = relabel[self.speaker_at(start)]
+            items.append({"type": "pronunciation", "start_time": f"{local:.3f}",
+                          "end_time": f"{local + 0.3:.3f}", "alternatives": item["alternatives"]})
+            if not labels or labels[-1]["speaker_label"] != speaker:
+                labels.append({"start_time": f"{local:.3f}", "speaker_label": speaker})
+        time.sleep(self.rng.uniform(0, 0.05))
+        return {"results": {"speaker_labels": {"segments": labels}, "items": items}}
+
+
+def main(hours_list):
+    for hours in hours_list:
+        data = json.loads(synthetic_transcript(hours))
+        segments = data["results"]["speaker_labels"]["segments"]
+        duration = float(segments[-1]["end_time"])
+        # Short pauses before each speaker turn stand in for what silence detection would find
+        silences = [(float(seg["start_time"]) - 0.2, float(seg["start_time"])) for seg in segments[1:]]
+        plan = plan_segments(duration, silences)
+
+        partials = []
+        started = time.perf_counter()
+        stitcher = transcribe_segments(plan, FakeTranscriptionBackend(data),
+                                       on_progress=lambda s: partials.append(s.next_index), max_workers=8)
+        elapsed = time.perf_counter() - started
+
+        expected = format_diarized_transcript(data)
+        stitched = format_diarized_transcript(stitcher.to_transcribe_result())
+        assert stitched == expected, "stitched transcript differs from the whole-recording transcript"
+        print(f"{hours}h: {len(plan)} segments, {len(partials)} partial updates, "
+              f"stitched in {elapsed:.2f}s, transcript matches")
+
+
+if __name__ == "__main__":
+    main([float(h) for h in sys.argv[1:]] or [2])
@@ -0,0 +1,127 @@
+"""
+Benchmark the streaming transcript post-processor against the previous implementation
+(json.loads + string concatenation + one replace pass per PII marker) on synthetic
+Transcribe output.
+
+Usage:
+    python benchmarks/transcript_benchmark.py [hours ...]   (default: 1 5)
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from helpers.transcript import stream_diarized_transcript  # noqa: E402
+
+WORDS_PER_SECOND = 2.5
+WORDS = ["the", "client", "said", "that", "landlord", "notice", "court", "hearing", "[PII.NAME]",
+         "agreement", "rent", "evidence", "[PII.ADDRESS]", "police", "statement", "[PII.PHONE]"]
+
+
+def legacy_format(data):
+    speaker_segments = data["results"]["speaker_labels"]["segments"]
+    items = data["results"]["items"]
+    speaker_map = {}
+    speaker_counter = 1
+    for segment in speaker_segments:
+        label = segment["speaker_label"]
+        if label not in speaker_map:
+            speaker_map[label] = f"Speaker {speaker_counter}"
+            speaker_counter += 1
+    output = []
+    segment_index = 0
+    segment = speaker_segments[segment_index]
+    speaker = segment["speaker_label"]
+    current_line = f"**{speaker_map[speaker]}:** "
+    for item in items:
+        if item["type"] == "punctuation":
+            current_line = current_line.rstrip() + item["alternatives"][0]["content"] + " "
+        else:
+            while (segment_index + 1 < len(speaker_segments) and
+                   float(item["start_time"]) >= float(speaker_segments[segment_index + 1]["start_time"])):
+                output.append(current_line.strip())
+                segment_index += 1
+                segment = speaker_segments[segment_index]
+                speaker = segment["speaker_label"]
+                current_line = f"**{speaker_map[speaker]}:** "
+            current_line += item["alternatives"][0]["content"] + " "
+    output.append(current_line.strip())
+    return "\n\n".join(output)
+
+
+def legacy_pii(text):
+    for marker, custom in {
+        '[PII.NAME]': '[NAME]', '[PII.EMAIL]': '[EMAIL]', '[PII.PHONE]': '[PHONE]', '[PII.SSN]': '[SSN]',
+        '[PII.CREDIT_DEBIT_NUMBER]': '[CREDIT_CARD]', '[PII.BANK_ACCOUNT_NUMBER]': '[BANK_ACCOUNT]',
+        '[PII.ADDRESS]': '[ADDRESS]',
+    }.items():
+        text = text.replace(marker, custom)
+    return text
+
+
+def legacy_pipeline(raw):
+    return legacy_pii(legacy_format(json.loads(raw.decode())))
+
+
+def synthetic_transcript(hours, seed=7):
+    """Generate Transcribe-shaped output with two speakers alternating every few seconds."""
+    rng = random.Random(seed)
+    items, segments, words = [], [], []
+    t, end = 0.0, hours * 3600
+    speaker = 0
+    while t < end:
+        seg_start = t
+        seg_items = []
+        for _ in range(rng.randint(5, 40)):
+            start, t = t, t + 1 / WORDS_PER_SECOND
+            word = rng.choice(WORDS)
+            words.append(word)
+            items.append({"start_time": f"{start:.2f}", "end_time": f"{t:.2f}", "type": "pronunciation",
+                          "alternatives": [{"confidence": "0.99", "content": word}]})
+            seg_items.append({"start_time": f"{start:.2f}", "end_time": f"{t:.2f}",
+                              "speaker_label": f"spk_{speaker}"})
+            if rng.random() < 0.1:
+                items.append({"type": "punctuation", "alternatives": [{"confidence": "0.0", "content": "."}]})
+        segments.append({"start_time": f"{seg_start:.2f}", "end_time": f"{t:.2f}",
+                         "speaker_label": f"spk_{speaker}", "items": seg_items})
+        speaker = 1 - speaker
+    data = {"jobName": "benchmark", "results": {
+        "transcripts": [{"transcript": " ".join(words)}],
+        "speaker_labels": {"speakers": 2, "segments": segments},
+        "items": items,
+    }, "status": "COMPLETED"}
+    return json.dumps(data).encode()
+
+
+def measure(fn, raw, repeat=3):
+    """Return the result, best wall time, and peak traced memory (traced separately, as tracing skews timing)."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(raw)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(hours_list):
+    for hours in hours_list:
+        raw = synthetic_transcript(hours)
+        legacy, legacy_s, legacy_peak = measure(legacy_pipeline, raw)
+        streamed, stream_s, stream_peak = measure(lambda b: stream_diarized_transcript(io.BytesIO(b)), raw)
+        assert streamed == legacy, "streaming output differs from the previous implementation"
+        print(f"{hours}h transcript ({len(raw) / 1e6:.1f} MB JSON)")
+        print(f"  previous:  {legacy_s:7.2f}s  peak {legacy_peak / 1e6:8.1f} MB")
+        print(f"  streaming: {stream_s:7.2f}s  peak {stream_peak / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main([float(h) for h in sys.argv[1:]] or [1, 5])
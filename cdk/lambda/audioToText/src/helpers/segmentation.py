@@ -0,0 +1,265 @@
+import re
+import logging
+import subprocess
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger()
+
+FFMPEG = "ffmpeg"
+
+# Anything quieter than this for at least SILENCE_MIN_SECONDS is a candidate cut point
+SILENCE_NOISE_DB = -30
+SILENCE_MIN_SECONDS = 0.5
+
+SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+DURATION = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+# Words heard by two neighbouring segments at most this many seconds apart are the same word
+MATCH_TOLERANCE = 0.3
+
+
+def parse_silencedetect(output):
+    """
+    Parse the stderr of an ffmpeg silencedetect run.
+
+    Returns:
+        tuple: (duration in seconds or None, list of (silence_start, silence_end) pairs)
+    """
+    match = DURATION.search(output)
+    duration = None
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    silences, start = [], None
+    for line in output.splitlines():
+        found = SILENCE_START.search(line)
+        if found:
+            start = max(0.0, float(found.group(1)))
+            continue
+        found = SILENCE_END.search(line)
+        if found and start is not None:
+            silences.append((start, float(found.group(1))))
+            start = None
+    # A recording that ends in silence reports no silence_end
+    if start is not None and duration is not None:
+        silences.append((start, duration))
+    return duration, silences
+
+
+def detect_silences(path):
+    """
+    Decode an audio file with ffmpeg and return its duration and silent intervals.
+    """
+    result = subprocess.run(
+        [FFMPEG, "-hide_banner", "-nostats", "-vn", "-i", path,
+         "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS}",
+         "-f", "null", "-"],
+        capture_output=True, text=True, check=True,
+    )
+    return parse_silencedetect(result.stderr)
+
+
+def plan_segments(duration, silences, segment_seconds=600.0, overlap_seconds=15.0):
+    """
+    Split a recording into overlapping segments whose edges fall in silences.
+
+    Segment i ends at the silence closest to segment_seconds after its start, and segment i + 1
+    starts at the silence closest to overlap_seconds before that cut, so both transcriptions hear
+    the overlap and no word is split by an edge. Words are kept from the segment whose
+    [keep_from, keep_until) window contains their start time; the window boundaries are the cuts.
+
+    Args:
+        duration (float): Length of the recording in seconds.
+        silences (list): (start, end) pairs of silent intervals, in order.
+        segment_seconds (float): Target length of a segment.
+        overlap_seconds (float): Target overlap between neighbouring segments.
+
+    Returns:
+        list: One dict per segment with index, start, end, keep_from and keep_until
+              (None for the last segment).
+    """
+    midpoints = [(start + end) / 2 for start, end in silences]
+
+    def nearest(target, low, high):
+        i = bisect_left(midpoints, target)
+        candidates = [m for m in midpoints[max(0, i - 1):i + 1] if low < m < high]
+        return min(candidates, key=lambda m: abs(m - target), default=target)
+
+    segments = []
+    start, keep_from = 0.0, 0.0
+    while duration - start > segment_seconds * 1.25:
+        cut = nearest(start + segment_seconds, start + segment_seconds * 0.75, start + segment_seconds * 1.25)
+        segments.append({"index": len(segments), "start": start, "end": cut,
+                         "keep_from": keep_from, "keep_until": cut})
+        start = nearest(cut - overlap_seconds, start, cut - overlap_seconds / 2)
+        keep_from = cut
+    segments.append({"index": len(segments), "start": start, "end": duration,
+                     "keep_from": keep_from, "keep_until": None})
+    return segments
+
+
+def cut_segment(path, segment, output_path):
+    """
+    Copy one segment of a recording into its own file without re-encoding.
+    """
+    subprocess.run(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-y",
+         "-ss", f"{segment['start']:.3f}", "-to", f"{segment['end']:.3f}",
+         "-i", path, "-vn", "-c", "copy", output_path],
+        check=True,
+    )
+
+
+def transcript_words(data):
+    """
+    Flatten a Transcribe result into [start_time, end_time, speaker_label, content] words.
+    Punctuation has no times or speaker and attaches to the preceding word.
+    """
+    segments = (data["results"].get("speaker_labels") or {}).get("segments") or []
+    starts = [float(seg["start_time"]) for seg in segments]
+    labels = [seg["speaker_label"] for seg in segments]
+
+    words = []
+    for item in data["results"]["items"]:
+        content = item["alternatives"][0]["content"]
+        if item["type"] == "punctuation":
+            words.append([None, None, None, content])
+            continue
+        start = float(item["start_time"])
+        speaker = item.get("speaker_label")
+        if speaker is None:
+            speaker = labels[max(bisect_right(starts, start) - 1, 0)] if labels else "spk_0"
+        words.append([start, float(item["end_time"]), speaker, content])
+    return words
+
+
+class SegmentStitcher:
+    """
+    Stitches per-segment transcriptions back into one transcript as segments finish.
+
+    Segments may finish in any order; each one is stitched once every segment before it is
+    available, so the stitched transcript always covers a prefix of the recording. Speaker labels
+    are local to each Transcribe job, so they are mapped onto global labels by matching the words
+    both neighbouring segments heard in their overlap.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.pending = {}
+        self.next_index = 0
+        self.words = []
+        self.previous = None
+        self.speakers = []
+
+    @property
+    def complete(self):
+        return self.next_index == len(self.plan)
+
+    def add(self, index, words):
+        """
+        Add the words of a finished segment (times relative to the segment start).
+
+        Returns:
+            bool: True if the stitched transcript grew.
+        """
+        self.pending[index] = words
+        grew = False
+        while self.next_index in self.pending:
+            self._stitch(self.plan[self.next_index], self.pending.pop(self.next_index))
+            self.next_index += 1
+            grew = True
+        return grew
+
+    def _stitch(self, segment, words):
+        offset = segment["start"]
+        absolute = [[w[0] + offset, w[1] + offset, w[2], w[3]] if w[0] is not None else w for w in words]
+        mapping = self._map_speakers(absolute)
+        relabeled = [[w[0], w[1], mapping[w[2]], w[3]] if w[0] is not None else w for w in absolute]
+
+        keep_from, keep_until = segment["keep_from"], segment["keep_until"]
+        keep = False
+        for word in relabeled:
+            if word[0] is not None:
+                keep = word[0] >= keep_from and (keep_until is None or word[0] < keep_until)
+            if keep:
+                self.words.append(word)
+        self.previous = relabeled
+
+    def _map_speakers(self, words):
+        local_labels = list(dict.fromkeys(w[2] for w in words if w[0] is not None))
+        votes = Counter()
+        if self.previous:
+            heard = [w for w in self.previous if w[0] is not None]
+            heard_starts = [w[0] for w in heard]
+            for word in words:
+                if word[0] is None:
+                    continue
+                i = bisect_left(heard_starts, word[0] - MATCH_TOLERANCE)
+                while i < len(heard) and heard[i][0] <= word[0] + MATCH_TOLERANCE:
+                    if heard[i][3].lower() == word[3].lower():
+                        votes[(word[2], heard[i][2])] += 1
+                        break
+                    i += 1
+
+        mapping, claimed = {}, set()
+        for (local, global_label), _ in votes.most_common():
+            if local not in mapping and global_label not in claimed:
+                mapping[local] = global_label
+                claimed.add(global_label)
+
+        # Speakers not heard in the overlap take over the remaining known speakers in order of
+        # appearance before new speakers are introduced
+        unclaimed = [label for label in self.speakers if label not in claimed]
+        for local in local_labels:
+            if local in mapping:
+                continue
+            if unclaimed:
+                mapping[local] = unclaimed.pop(0)
+            else:
+                mapping[local] = f"spk_{len(self.speakers)}"
+                self.speakers.append(mapping[local])
+        return mapping
+
+    def to_transcribe_result(self):
+        """
+        Return the stitched transcript in the shape of a Transcribe result, so it can be formatted
+        like the output of a single job.
+        """
+        items, segments = [], []
+        for start, end, speaker, content in self.words:
+            if start is None:
+                items.append({"type": "punctuation", "alternatives": [{"content": content}]})
+                continue
+            if not segments or segments[-1]["speaker_label"] != speaker:
+                segments.append({"start_time": f"{start:.3f}", "speaker_label": speaker})
+            items.append({"type": "pronunciation", "start_time": f"{start:.3f}", "end_time": f"{end:.3f}",
+                          "speaker_label": speaker, "alternatives": [{"content": content}]})
+        return {"results": {"speaker_labels": {"segments": segments}, "items": items}}
+
+
+def transcribe_segments(plan, transcribe, on_progress=None, max_workers=4):
+    """
+    Transcribe segments concurrently and stitch them as they finish.
+
+    Args:
+        plan (list): Segments from plan_segments().
+        transcribe (callable): Takes a segment and returns its Transcribe result dict, with times
+                               relative to the segment start.
+        on_progress (callable, optional): Called with the stitcher whenever the stitched
+                                          transcript grows.
+        max_workers (int): Number of segments transcribed at once.
+
+    Returns:
+        SegmentStitcher: The stitcher holding the complete transcript.
+    """
+    stitcher = SegmentStitcher(plan)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(transcribe, segment): segment["index"] for segment in plan}
+        for future in as_completed(futures):
+            if stitcher.add(futures[future], transcript_words(future.result())) and on_progress:
+                on_progress(stitcher)
+    return stitcher
@@ -0,0 +1,160 @@
+import re
+import logging
+from bisect import bisect_right
+
+import ijson
+
+logger = logging.getLogger()
+
+# Transcribe PII markers and the labels shown to students
+PII_MARKERS = {
+    'NAME': 'NAME',
+    'EMAIL': 'EMAIL',
+    'PHONE': 'PHONE',
+    'SSN': 'SSN',
+    'CREDIT_DEBIT_NUMBER': 'CREDIT_CARD',
+    'BANK_ACCOUNT_NUMBER': 'BANK_ACCOUNT',
+    'ADDRESS': 'ADDRESS',
+}
+PII_PATTERN = re.compile(r"\[PII\.(" + "|".join(PII_MARKERS) + r")\]")
+
+# ijson prefixes of the fields read from the Transcribe output
+SEGMENT_START_TIME = "results.speaker_labels.segments.item.start_time"
+SEGMENT_LABEL = "results.speaker_labels.segments.item.speaker_label"
+ITEM_PREFIX = "results.items.item"
+ITEM_TYPE = ITEM_PREFIX + ".type"
+ITEM_START_TIME = ITEM_PREFIX + ".start_time"
+ITEM_CONTENT = ITEM_PREFIX + ".alternatives.item.content"
+
+# Bytes read from the transcript stream per parser read
+CHUNK_SIZE = 64 * 1024
+
+
+def _replace_pii(match):
+    return f"[{PII_MARKERS[match.group(1)]}]"
+
+
+def customize_pii_markers(text):
+    """
+    Convert PII markers to custom format in a single regex pass
+    e.g., [PII.NAME] -> [NAME], [PII.EMAIL] -> [EMAIL]
+    """
+    return PII_PATTERN.sub(_replace_pii, text)
+
+
+class DiarizedTranscriptWriter:
+    """
+    Builds the "**Speaker N:** ..." transcript from Transcribe items.
+
+    Speaker segments are looked up by pre-parsed start times with bisect instead of re-parsing
+    timestamps on every item, lines are accumulated as token lists and joined once, and PII
+    markers are rewritten per token as items are added.
+    """
+
+    def __init__(self, segment_starts, segment_labels):
+        speaker_map = {}
+        for label in segment_labels:
+            if label not in speaker_map:
+                speaker_map[label] = f"**Speaker {len(speaker_map) + 1}:**"
+        self.starts = segment_starts
+        self.headers = [speaker_map[label] for label in segment_labels]
+        self.index = 0
+        self.lines = []
+        self.parts = [self.headers[0]] if self.headers else []
+
+    def add(self, is_punctuation, content, start_time=None):
+        if "[" in content:
+            content = PII_PATTERN.sub(_replace_pii, content)
+
+        if is_punctuation:
+            # Punctuation attaches to the preceding token
+            if self.parts:
+                self.parts[-1] += content
+            else:
+                self.parts.append(content)
+            return
+
+        if start_time is not None and self.index + 1 < len(self.starts):
+            target = bisect_right(self.starts, start_time) - 1
+            if target > self.index:
+                self.lines.append(" ".join(self.parts))
+                # Segments skipped without any items still get their speaker line
+                self.lines.extend(self.headers[self.index + 1:target])
+                self.index = target
+                self.parts = [self.headers[target]]
+
+        self.parts.append(content)
+
+    def getvalue(self):
+        return "\n\n".join(self.lines + [" ".join(self.parts)])
+
+
+def format_diarized_transcript(data):
+    """
+    Format an already-parsed Transcribe result into a diarized transcript with custom PII markers.
+    """
+    segments = data["results"]["speaker_labels"]["segments"]
+    writer = DiarizedTranscriptWriter(
+        [float(seg["start_time"]) for seg in segments],
+        [seg["speaker_label"] for seg in segments],
+    )
+    for item in data["results"]["items"]:
+        content = item["alternatives"][0]["content"]
+        if item["type"] == "punctuation":
+            writer.add(True, content)
+        else:
+            writer.add(False, content, float(item["start_time"]))
+    return writer.getvalue()
+
+
+def stream_diarized_transcript(stream, chunk_size=CHUNK_SIZE):
+    """
+    Format a Transcribe result JSON read incrementally from a binary file-like object.
+
+    The document is tokenized in a single pass and never materialized as a whole: speaker
+    segments are reduced to start times and labels, and items are written out as soon as each
+    one is complete. Items that precede the speaker labels in the document are buffered until
+    the segments are known.
+
+    Args:
+        stream: A binary file-like object containing the Transcribe output JSON.
+        chunk_size (int): Number of bytes read per chunk.
+
+    Returns:
+        str: The diarized transcript with custom PII markers.
+    """
+    starts, labels = [], []
+    writer = None
+    buffered = []
+    is_punctuation, content, start_time = False, "", None
+
+    for prefix, event, value in ijson.parse(stream, buf_size=chunk_size):
+        if prefix == ITEM_TYPE:
+            is_punctuation = value == "punctuation"
+        elif prefix == ITEM_START_TIME:
+            start_time = float(value)
+        elif prefix == ITEM_CONTENT:
+            content = value
+        elif prefix == ITEM_PREFIX and event == "end_map":
+            if writer is None and starts:
+                # Items arriving after segments means the segments array is complete
+                writer = DiarizedTranscriptWriter(starts, labels)
+                for entry in buffered:
+                    writer.add(*entry)
+                buffered = []
+            if writer is not None:
+                writer.add(is_punctuation, content, start_time)
+            else:
+                buffered.append((is_punctuation, content, start_time))
+            is_punctuation, content, start_time = False, "", None
+        elif prefix == SEGMENT_START_TIME:
+            starts.append(float(value))
+        elif prefix == SEGMENT_LABEL:
+            labels.append(value)
+
+    if writer is None:
+        writer = DiarizedTranscriptWriter(starts, labels)
+        for entry in buffered:
+            writer.add(*entry)
+
+    return writer.getvalue()
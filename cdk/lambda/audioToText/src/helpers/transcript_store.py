@@ -0,0 +1,55 @@
+import gzip
+import logging
+
+logger = logging.getLogger()
+
+# Offloaded transcripts are stored in the audio bucket under this prefix
+TRANSCRIPT_KEY_PREFIX = "stored-transcripts/"
+
+
+def transcript_key(audio_file_id):
+    """Return the S3 key of an offloaded transcript."""
+    return f"{TRANSCRIPT_KEY_PREFIX}{audio_file_id}.md.gz"
+
+
+def offload_transcript(s3, bucket, audio_file_id, text, threshold):
+    """
+    Decide where a transcript is stored, writing it to S3 when it is larger than the threshold.
+
+    Short transcripts stay inline in "audio_files".audio_text. Longer ones are gzip-compressed into
+    the bucket, and only the object key and the uncompressed size go to Postgres, which keeps
+    large text out of the table and the proxy traffic. The object is written before the row is
+    updated, so a stored key always points to an existing object.
+
+    Args:
+        s3: A boto3 S3 client.
+        bucket (str): The bucket offloaded transcripts are stored in.
+        audio_file_id (str): The audio file the transcript belongs to.
+        text (str): The transcript.
+        threshold (int): Largest transcript, in UTF-8 bytes, stored inline.
+
+    Returns:
+        tuple: (inline audio_text or None, S3 key or None, size in bytes)
+    """
+    data = text.encode("utf-8")
+    if len(data) <= threshold:
+        return text, None, len(data)
+
+    key = transcript_key(audio_file_id)
+    compressed = gzip.compress(data, compresslevel=6)
+    s3.put_object(Bucket=bucket, Key=key, Body=compressed, ContentType="application/gzip")
+    logger.info(f"Offloaded transcript of {audio_file_id} to S3 ({len(data)} bytes, {len(compressed)} compressed)")
+    return None, key, len(data)
+
+
+def load_transcript(s3, bucket, audio_text, s3_key):
+    """
+    Return a transcript whether it is stored inline or offloaded to S3.
+    """
+    if not s3_key:
+        return audio_text
+    body = s3.get_object(Bucket=bucket, Key=s3_key)["Body"]
+    try:
+        return gzip.decompress(body.read()).decode("utf-8")
+    finally:
+        body.close()
@@ -4,9 +4,15 @@ import time
 import random
 import logging
 import boto3
-import psycopg
-import urllib.request
-import httpx
+from urllib.parse import urlparse, unquote
+from botocore.config import Config
+from botocore.exceptions import ResponseStreamingError, ReadTimeoutError, IncompleteReadError
+
+from helpers.transcript import stream_diarized_transcript, format_diarized_transcript
+from helpers.transcript_store import offload_transcript, load_transcript
+from helpers.notifications import NotificationDispatcher, iam_authorizer
+from helpers.db import Database
+from helpers.segmentation import detect_silences, plan_segments, cut_segment, transcript_words, SegmentStitcher
 
 # Set up logging for the Lambda function
 logger = logging.getLogger()
@@ -14,7 +20,12 @@ logger.setLevel(logging.INFO)
 
 # Initialize AWS service clients using environment configuration
 transcribe = boto3.client("transcribe", region_name=os.environ.get("AWS_REGION"))
-s3 = boto3.client("s3", region_name=os.environ.get("AWS_REGION"))
+lambda_client = boto3.client("lambda", region_name=os.environ.get("AWS_REGION"))
+s3 = boto3.client(
+    "s3",
+    region_name=os.environ.get("AWS_REGION"),
+    config=Config(retries={"max_attempts": 5, "mode": "standard"}),
+)
 
 # Environment variables (must be set in Lambda configuration)
 DB_SECRET_NAME = os.environ["SM_DB_CREDENTIALS"]    # Secrets Manager secret for RDS credentials
@@ -23,234 +34,656 @@ RDS_PROXY_ENDPOINT = os.environ["RDS_PROXY_ENDPOINT"]  # RDS Proxy endpoint
 AUDIO_BUCKET = os.environ.get("AUDIO_BUCKET")         # S3 bucket where audio files are stored
 APPSYNC_API_URL = os.environ.get("APPSYNC_API_URL")   # AppSync GraphQL endpoint
 
-# AWS clients for Secrets Manager and Parameter Store
-secrets_manager_client = boto3.client("secretsmanager")
-ssm_client = boto3.client("ssm", region_name=REGION)
+# AppSync notifications share the container's pooled HTTP/2 client
+notifications = NotificationDispatcher(APPSYNC_API_URL)
+appsync_authorizer = iam_authorizer(REGION)
+
+# Pooled database connections, reused across invocations in this container
+db = Database(DB_SECRET_NAME, RDS_PROXY_ENDPOINT)
+
+# Transcription jobs started by this function; the completion rule matches on this prefix
+JOB_NAME_PREFIX = "transcription-"
+
+# Transcription state recorded on "audio_files", so each audio file is transcribed once
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+
+# A claimed job that Transcribe still doesn't know after this long was never started and may be taken over
+CLAIM_GRACE_SECONDS = 120
+
+# Transcripts larger than this many UTF-8 bytes are stored compressed in S3 instead of inline in Postgres
+TRANSCRIPT_INLINE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_INLINE_MAX_BYTES", "65536"))
+
+# Transcribe writes its output to the audio bucket under this prefix
+TRANSCRIPT_PREFIX = "transcripts/"
+
+# Attempts at streaming a transcript when the connection drops mid-body
+TRANSCRIPT_READ_ATTEMPTS = 3
+
+# Segmented mode: long recordings are split at silences and the segments are transcribed concurrently
+SEGMENT_JOB_PREFIX = f"{JOB_NAME_PREFIX}segment-"
+SEGMENT_ACTION = "segment_audio"
+SEGMENT_SECONDS = float(os.environ.get("SEGMENT_SECONDS", "600"))
+SEGMENT_OVERLAP_SECONDS = float(os.environ.get("SEGMENT_OVERLAP_SECONDS", "15"))
+
+# A segmented transcription has no single job to look up, so its claim may be taken over once it
+# has been in progress for this long
+SEGMENT_CLAIM_TIMEOUT_SECONDS = int(os.environ.get("SEGMENT_CLAIM_TIMEOUT_SECONDS", str(3 * 3600)))
 
-# Cached database connection and secret to reuse across Lambda invocations
-connection = None
-db_secret = None
+
+def invoke_event_notification(audio_file_id, message):
+    """
+    Queue a sendNotification mutation to AppSync to notify clients of an event.
+    The request is signed with the function's IAM role, so it does not depend on a user token
+    and can be sent from the asynchronous completion stage. Bursts are coalesced and delivered
+    when the handler returns.
+    """
+    notifications.notify(audio_file_id, message, appsync_authorizer)
 
 
-def invoke_event_notification(audio_file_id, message, cognito_token):
+def add_audio_to_db(audio_file_id, audio_text, job_name, status=STATUS_COMPLETED, segments=None):
     """
-    Send a GraphQL mutation to AppSync to notify clients of an event.
-    Requires a valid Cognito JWT token for authentication.
+    Store a transcript and its transcription status. Transcripts above TRANSCRIPT_INLINE_MAX_BYTES
+    are offloaded to S3 and only referenced from the row. The transcript is only stored while
+    job_name holds the in-progress claim of the file: a transcript that was already completed, or
+    whose claim failed or moved to another job, is never overwritten, so duplicate or stale
+    completion events are reported with a 409 and can be ignored.
+
+    For a segmented transcription, segments is the number of segments stitched into the
+    transcript. A transcript covering no more segments than the stored one is not written and is
+    reported with a 204. The row is locked while the transcript is written, so concurrent writes,
+    including their offloaded objects, land in the order they were checked.
     """
     try:
-        # Define the GraphQL mutation
-        query = """
-        mutation sendNotification($message: String!, $audioFileId: String!) {
-            sendNotification(message: $message, audioFileId: $audioFileId) {
-                message
-                audioFileId
-            }
-        }
-        """
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT stitched_segments FROM "audio_files"
+                    WHERE audio_file_id = %s AND transcription_status = %s AND transcription_job = %s
+                    FOR UPDATE;
+                """, (audio_file_id, STATUS_IN_PROGRESS, job_name), label="lock_audio_file")
+                row = cur.fetchone()
+                if row is None:
+                    logger.info(f"Transcript for audio_file_id {audio_file_id} was already completed or is no "
+                                f"longer claimed by {job_name}")
+                    return {"statusCode": 409, "body": json.dumps({"message": "Already completed"})}
+                if segments is not None and row[0] is not None and row[0] >= segments:
+                    logger.info(f"Transcript of {segments} segments for audio_file_id {audio_file_id} is "
+                                f"superseded by one of {row[0]} segments")
+                    return {"statusCode": 204, "body": json.dumps({"message": "Superseded"})}
+
+                inline_text, s3_key, size = offload_transcript(s3, AUDIO_BUCKET, audio_file_id, audio_text,
+                                                               TRANSCRIPT_INLINE_MAX_BYTES)
+                # Inline transcripts are indexed for search by a trigger on audio_text. Offloaded ones have
+                # no audio_text, so their text is sent once to build the search vector.
+                search_text = audio_text if s3_key else None
+                cur.execute("""
+                    UPDATE "audio_files"
+                    SET audio_text = %s, audio_text_s3_key = %s, audio_text_size = %s, transcription_status = %s,
+                        stitched_segments = %s, search_vector = COALESCE(transcript_search_vector(%s), search_vector)
+                    WHERE audio_file_id = %s;
+                """, (inline_text, s3_key, size, status, segments, search_text, audio_file_id), label="add_audio_to_db")
+        # amazonq-ignore-next-line
+        logger.info(f"Audio text stored for audio_file_id: {audio_file_id}")
+        # amazonq-ignore-next-line
+        return {"statusCode": 200, "body": json.dumps({"message": "Stored successfully"})}
+    except Exception as e:
+        # amazonq-ignore-next-line
+        logger.error(f"DB update error for audio_file_id {audio_file_id}: {e}")
+        return {"statusCode": 500, "body": json.dumps({"error": "DB update failed"})}
 
-        # Set HTTP headers including the Cognito token
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": cognito_token  # Prefix with "Bearer " if your AppSync setup requires it
-        }
 
-        # Construct the payload
-        payload = {
-            "query": query,
-            "variables": {"message": message, "audioFileId": audio_file_id}
+def claim_transcription(audio_file_id, job_name):
+    """
+    Record job_name as the transcription of an audio file with a conditional write, so concurrent
+    or repeated requests cannot start a second job. Files that were never transcribed, or whose
+    transcription failed, can be claimed.
+
+    Returns:
+        tuple: (True, None) if the claim succeeded, otherwise (False, the existing transcription
+               as a dict with status, job_name, audio_text,
+               audio_text_s3_key, stale and age), or (False, None) if
+               the audio file does not exist.
+    """
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE "audio_files"
+                SET transcription_status = %s, transcription_job = %s, transcription_started = now(),
+                    stitched_segments = NULL
+                WHERE audio_file_id = %s AND (transcription_status IS NULL OR transcription_status = %s)
+                RETURNING audio_file_id;
+            """, (STATUS_IN_PROGRESS, job_name, audio_file_id, STATUS_FAILED))
+            claimed = cur.fetchone() is not None
+            row = None
+            if not claimed:
+                cur.execute("""
+                    SELECT transcription_status, transcription_job, audio_text, audio_text_s3_key,
+                           extract(epoch FROM now() - transcription_started)
+                    FROM "audio_files" WHERE audio_file_id = %s;
+                """, (audio_file_id,))
+                row = cur.fetchone()
+
+    if claimed or row is None:
+        return claimed, None
+    age = float(row[4]) if row[4] is not None else None
+    return False, {"status": row[0], "job_name": row[1], "audio_text": row[2], "audio_text_s3_key": row[3],
+                   "stale": age is not None and age > CLAIM_GRACE_SECONDS, "age": age}
+
+
+def reclaim_transcription(audio_file_id, abandoned_job, job_name):
+    """
+    Take over an in-progress claim whose job was never started, or whose segmented transcription
+    ran for longer than SEGMENT_CLAIM_TIMEOUT_SECONDS. Returns True if the claim moved to job_name.
+    """
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE "audio_files" SET transcription_job = %s, transcription_started = now(), stitched_segments = NULL
+                WHERE audio_file_id = %s AND transcription_status = %s AND transcription_job = %s
+                RETURNING audio_file_id;
+            """, (job_name, audio_file_id, STATUS_IN_PROGRESS, abandoned_job))
+            return cur.fetchone() is not None
+
+
+def set_transcription_status(audio_file_id, status, job_name=None):
+    """
+    Record the transcription status of an audio file, e.g. FAILED so the file can be submitted again.
+    With job_name, the status is only changed while that job holds the in-progress claim, so a late
+    event from a superseded job cannot fail a transcription that is running or completed.
+
+    Returns:
+        bool: True if the status was changed.
+    """
+    try:
+        with db.connection() as conn:
+            if job_name is None:
+                cur = conn.execute('UPDATE "audio_files" SET transcription_status = %s WHERE audio_file_id = %s;',
+                                   (status, audio_file_id))
+            else:
+                cur = conn.execute("""
+                    UPDATE "audio_files" SET transcription_status = %s
+                    WHERE audio_file_id = %s AND transcription_status = %s AND transcription_job = %s;
+                """, (status, audio_file_id, STATUS_IN_PROGRESS, job_name))
+            return cur.rowcount > 0
+    except Exception as e:
+        logger.error(f"Failed to set transcription status of {audio_file_id} to {status}: {e}")
+        return False
+
+
+def get_transcription_status(audio_file_id):
+    """Return the recorded transcription status of an audio file, or None."""
+    row = db.fetchone('SELECT transcription_status FROM "audio_files" WHERE audio_file_id = %s;', (audio_file_id,),
+                      label="get_transcription_status")
+    return row[0] if row else None
+
+
+def transcription_job_exists(job_name):
+    """Return True if Transcribe knows a job with this name."""
+    try:
+        transcribe.get_transcription_job(TranscriptionJobName=job_name)
+        return True
+    except transcribe.exceptions.BadRequestException:
+        return False
+
+
+def get_cors_headers():
+    """Return standard CORS headers for API responses."""
+    return {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+        "Access-Control-Allow-Methods": "OPTIONS,GET",
+        "Access-Control-Allow-Credentials": "true"
+    }
+
+def parse_job_name(job_name):
+    """
+    Extract the audio_file_id from a job name of the form
+    transcription-{audio_file_id}-{timestamp}-{random}.
+    """
+    return job_name[len(JOB_NAME_PREFIX):].rsplit("-", 2)[0]
+
+
+def start_transcription_job(job_name, media_key, file_type, output_key):
+    """
+    Start a Transcribe job with speaker labels and PII redaction for an audio object in the bucket.
+    """
+    transcribe.start_transcription_job(
+        TranscriptionJobName=job_name,
+        Media={"MediaFileUri": f"s3://{AUDIO_BUCKET}/{media_key}"},
+        MediaFormat=file_type,
+        LanguageCode="en-US",
+        OutputBucketName=AUDIO_BUCKET,
+        OutputKey=output_key,
+        Settings={
+            'ShowSpeakerLabels': True,
+            'MaxSpeakerLabels': 2,
+            'ShowAlternatives': False,
+        },
+        ContentRedaction={
+            'RedactionType': 'PII',
+            'RedactionOutput': 'redacted_and_unredacted',
+            'PiiEntityTypes': [
+                'NAME', 'EMAIL', 'PHONE', 'SSN', 
+                'CREDIT_DEBIT_NUMBER', 'BANK_ACCOUNT_NUMBER', 
+                'ADDRESS'
+            ]
         }
+    )
 
-        # Perform the HTTP request
-        with httpx.Client() as client:
-            response = client.post(APPSYNC_API_URL, headers=headers, json=payload)
-            response_data = response.json()
 
-        # Log AppSync response details
-        logger.info(f"AppSync Response: {json.dumps(response_data, indent=2)}")
+def new_job_name(audio_file_id):
+    """Return a unique job name of the form transcription-{audio_file_id}-{timestamp}-{random}."""
+    return f"{JOB_NAME_PREFIX}{audio_file_id}-{int(time.time())}-{random.randint(1000, 9999)}"
 
-        # Check for errors in the response
-        if response.status_code != 200 or "errors" in response_data:
-            raise Exception(f"Failed to send notification: {response_data}")
 
-        return response_data["data"]["sendNotification"]
+def start_transcription(audio_file_id, file_name, file_type, job_name=None):
+    """
+    Start stage: start a Transcribe job for an uploaded audio file and return its job name.
+    Completion is handled by complete_transcription() when Transcribe emits its
+    job state change event.
+    """
+    media_key = f"{audio_file_id}/{file_name}.{file_type}"
+    logger.info(f"Starting transcription for: s3://{AUDIO_BUCKET}/{media_key}")
 
-    except Exception as e:
-        logger.error(f"Error publishing event to AppSync: {e}")
-        raise
+    job_name = job_name or new_job_name(audio_file_id)
+    start_transcription_job(job_name, media_key, file_type, f"{TRANSCRIPT_PREFIX}{audio_file_id}/")
+    return job_name
 
 
-def get_secret(secret_name, expect_json=True):
+def parse_s3_uri(uri):
     """
-    Retrieve a secret from AWS Secrets Manager, parse JSON if requested, and cache the result.
+    Return the (bucket, key) of a transcript URI reported by Transcribe, which is either an
+    s3:// URI or a path-style https://s3.<region>.amazonaws.com/<bucket>/<key> URL.
     """
-    global db_secret
-    if db_secret is None:
-        try:
-            raw = secrets_manager_client.get_secret_value(SecretId=secret_name)["SecretString"]
-            db_secret = json.loads(raw) if expect_json else raw
-        except json.JSONDecodeError as e:
-            # amazonq-ignore-next-line
-            msg = f"Secret {secret_name} is not valid JSON: {e}"
-            # amazonq-ignore-next-line
-            logger.error(msg)
-            raise ValueError(msg)
-        except Exception as e:
-            # amazonq-ignore-next-line
-            logger.error(f"Error fetching secret {secret_name}: {e}")
-            raise
-    return db_secret
+    parsed = urlparse(uri)
+    if parsed.scheme == "s3":
+        return parsed.netloc, unquote(parsed.path.lstrip("/"))
+    bucket, _, key = parsed.path.lstrip("/").partition("/")
+    return bucket, unquote(key)
 
 
-def get_parameter(param_name, cached_var):
+def read_transcript(bucket, key):
     """
-    Retrieve a parameter from AWS Systems Manager Parameter Store and cache the result.
+    Stream a transcript object from S3 straight into the formatter, without holding the JSON in memory.
+    Requests are retried by the client; a connection dropped mid-body restarts the read.
     """
-    if cached_var is None:
+    for attempt in range(1, TRANSCRIPT_READ_ATTEMPTS + 1):
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"]
         try:
-            resp = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
-            cached_var = resp["Parameter"]["Value"]
-        except Exception as e:
-            logger.error(f"Error fetching parameter {param_name}: {e}")
-            raise
-    return cached_var
+            return stream_diarized_transcript(body)
+        except (ResponseStreamingError, ReadTimeoutError, IncompleteReadError) as e:
+            if attempt == TRANSCRIPT_READ_ATTEMPTS:
+                raise
+            logger.warning(f"Transcript read of {key} interrupted (attempt {attempt}): {e}")
+        finally:
+            body.close()
 
 
-def connect_to_db():
+def delete_transcript_outputs(job):
     """
-    Establish (or reuse) a connection to the RDS database via the Proxy.
-    Uses credentials stored in Secrets Manager.
+    Delete the transcript objects Transcribe wrote for a job; the unredacted copy contains PII.
     """
-    global connection
-    if connection is None or connection.closed:
-        secret = get_secret(DB_SECRET_NAME)
-        params = {
-            'dbname': secret['dbname'],
-            'user': secret['username'],
-            'password': secret['password'],
-            'host': RDS_PROXY_ENDPOINT,
-            'port': secret['port']
-        }
-        # Build connection string for psycopg2
-        conn_str = " ".join(f"{k}={v}" for k, v in params.items())
+    transcript = job.get("Transcript") or {}
+    for field in ("RedactedTranscriptFileUri", "TranscriptFileUri"):
+        if not transcript.get(field):
+            continue
+        bucket, key = parse_s3_uri(transcript[field])
         try:
-            connection = psycopg.connect(conn_str)
-            logger.info("Connected to the database.")
+            s3.delete_object(Bucket=bucket, Key=key)
+            logger.info(f"Deleted transcript {key} from S3")
         except Exception as e:
-            logger.error(f"Database connection failed: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
-            raise
-    return connection
-
-def format_diarized_transcript(data):
-    speaker_segments = data["results"]["speaker_labels"]["segments"]
-    items = data["results"]["items"]
-
-    # Map each speaker_label (e.g., spk_0) to Speaker 1, Speaker 2, etc.
-    speaker_map = {}
-    speaker_counter = 1
-    for segment in speaker_segments:
-        label = segment["speaker_label"]
-        if label not in speaker_map:
-            speaker_map[label] = f"Speaker {speaker_counter}"
-            speaker_counter += 1
-
-    output = []
-    segment_index = 0
-    segment = speaker_segments[segment_index]
-    speaker = segment["speaker_label"]
-    current_line = f"**{speaker_map[speaker]}:** "
-
-    for item in items:
-        if item["type"] == "punctuation":
-            current_line = current_line.rstrip() + item["alternatives"][0]["content"] + " "
+            logger.error(f"Failed to delete transcript {key} from S3: {e}")
+
+
+def fail_unstored_transcription(audio_file_id, job_name):
+    """
+    Fail a transcription whose transcript could not be stored, so its recording, which is kept,
+    can be submitted again. If the failure cannot be recorded either, the error is raised so the
+    event is retried instead of leaving the file claimed by a job that will never complete.
+    """
+    if set_transcription_status(audio_file_id, STATUS_FAILED, job_name):
+        invoke_event_notification(audio_file_id, "transcription_failed")
+        return
+    if get_transcription_status(audio_file_id) == STATUS_IN_PROGRESS:
+        raise RuntimeError(f"Could not store or fail the transcription {job_name} of {audio_file_id}")
+
+
+def complete_transcription(job_name, status):
+    """
+    Completion stage: fetch and format the transcript of a finished job, store it,
+    notify clients via AppSync and delete the source audio and transcript objects from S3.
+    """
+    audio_file_id = parse_job_name(job_name)
+
+    if status != "COMPLETED":
+        logger.error(f"Transcription job {job_name} finished with status {status}")
+        if set_transcription_status(audio_file_id, STATUS_FAILED, job_name):
+            invoke_event_notification(audio_file_id, "transcription_failed")
         else:
-            while (segment_index + 1 < len(speaker_segments) and
-                   float(item["start_time"]) >= float(speaker_segments[segment_index + 1]["start_time"])):
-                output.append(current_line.strip())
-                segment_index += 1
-                segment = speaker_segments[segment_index]
-                speaker = segment["speaker_label"]
-                current_line = f"**{speaker_map[speaker]}:** "
+            logger.info(f"Ignoring failure of {job_name}, which no longer holds the transcription of {audio_file_id}")
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
+
+    # EventBridge may deliver the same state change more than once
+    if get_transcription_status(audio_file_id) == STATUS_COMPLETED:
+        logger.info(f"Ignoring duplicate completion of {job_name}")
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
+
+    job = transcribe.get_transcription_job(TranscriptionJobName=job_name)["TranscriptionJob"]
+    bucket, key = parse_s3_uri(job["Transcript"]["RedactedTranscriptFileUri"])
+
+    # Stream and format the transcript in one pass, applying custom PII markers as it goes
+    formatted_transcript = read_transcript(bucket, key)
+
+    # Store transcript and notify clients
+    stored = add_audio_to_db(audio_file_id, formatted_transcript, job_name)
+    if stored["statusCode"] == 409:
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
+    if stored["statusCode"] != 200:
+        fail_unstored_transcription(audio_file_id, job_name)
+        delete_transcript_outputs(job)
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": STATUS_FAILED}
 
-            current_line += item["alternatives"][0]["content"] + " "
+    # amazonq-ignore-next-line
+    logger.info(f"About to invoke event notification with audio_file_id={audio_file_id}")
 
-    output.append(current_line.strip())
-    return "\n\n".join(output)
+    # This sends to AppSync → triggers `onNotify`
+    invoke_event_notification(audio_file_id, "transcription_complete")
 
-def add_audio_to_db(audio_file_id, audio_text):
-    conn = connect_to_db()
+    # Delete the audio file from S3
+    audio_key = job["Media"]["MediaFileUri"].split(f"s3://{AUDIO_BUCKET}/", 1)[-1]
     try:
-        cur = conn.cursor()
-        sql = 'UPDATE "audio_files" SET audio_text = %s WHERE audio_file_id = %s;'
-        cur.execute(sql, (audio_text, audio_file_id))
-        conn.commit()
+        s3.delete_object(Bucket=AUDIO_BUCKET, Key=audio_key)
         # amazonq-ignore-next-line
-        cur.close()
-        # amazonq-ignore-next-line
-        logger.info(f"Audio text stored for audio_file_id: {audio_file_id}")
-        # amazonq-ignore-next-line
-        return {"statusCode": 200, "body": json.dumps({"message": "Stored successfully"})}
+        logger.info(f"Deleted file {audio_key} from S3")
     except Exception as e:
-        # amazonq-ignore-next-line
-        logger.error(f"DB update error for audio_file_id {audio_file_id}: {e}")
-        if cur:
-            cur.close()
-        conn.rollback()
-        return {"statusCode": 500, "body": json.dumps({"error": "DB update failed"})}
+        logger.error(f"Failed to delete audio file from S3: {e}")
 
+    delete_transcript_outputs(job)
 
+    return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
 
-def get_cors_headers():
-    """Return standard CORS headers for API responses."""
-    return {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
-        "Access-Control-Allow-Methods": "OPTIONS,GET",
-        "Access-Control-Allow-Credentials": "true"
-    }
 
-def customize_pii_markers(transcript_text):
+def new_segment_claim(audio_file_id):
     """
-    Convert PII markers to custom format
-    e.g., [PII.NAME] -> [NAME], [PII.EMAIL] -> [EMAIL]
+    Return the name a segmented transcription is claimed under, of the form
+    transcription-segment-{audio_file_id}-{timestamp}. Its segment jobs are named after it.
     """
-    pii_replacements = {
-        '[PII.NAME]': '[NAME]',
-        '[PII.EMAIL]': '[EMAIL]',
-        '[PII.PHONE]': '[PHONE]',
-        '[PII.SSN]': '[SSN]',
-        '[PII.CREDIT_DEBIT_NUMBER]': '[CREDIT_CARD]',
-        '[PII.BANK_ACCOUNT_NUMBER]': '[BANK_ACCOUNT]',
-        '[PII.ADDRESS]': '[ADDRESS]'
-    }
-    
-    for pii_marker, custom_marker in pii_replacements.items():
-        transcript_text = transcript_text.replace(pii_marker, custom_marker)
-    
-    return transcript_text
+    return f"{SEGMENT_JOB_PREFIX}{audio_file_id}-{int(time.time())}"
+
+
+def parse_segment_claim(claim):
+    """Extract the audio_file_id and timestamp from a segmented transcription's claim."""
+    audio_file_id, timestamp = claim[len(SEGMENT_JOB_PREFIX):].rsplit("-", 1)
+    return audio_file_id, timestamp
+
+
+def parse_segment_job_name(job_name):
+    """
+    Extract the audio_file_id, segment index and claim from a job name of the form
+    {claim}-{index}-{random}.
+    """
+    claim, index, _ = job_name.rsplit("-", 2)
+    audio_file_id, _ = parse_segment_claim(claim)
+    return audio_file_id, int(index), claim
+
+
+def segment_prefix(claim):
+    """S3 prefix holding the plan and finished segment transcripts of a segmented transcription."""
+    audio_file_id, timestamp = parse_segment_claim(claim)
+    return f"{TRANSCRIPT_PREFIX}{audio_file_id}/segments/{timestamp}/"
+
+
+def segment_media_prefix(claim):
+    """S3 prefix holding the audio segments cut for a segmented transcription."""
+    audio_file_id, timestamp = parse_segment_claim(claim)
+    return f"{audio_file_id}/segments/{timestamp}/"
+
+
+def delete_segment_objects(claim):
+    """
+    Delete the plan, segment transcripts and audio segments of a segmented transcription. Segments
+    of the claim that finish afterwards find no plan and stop.
+    """
+    keys = []
+    for prefix in (segment_prefix(claim), segment_media_prefix(claim)):
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=AUDIO_BUCKET, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    try:
+        for i in range(0, len(keys), 1000):
+            s3.delete_objects(Bucket=AUDIO_BUCKET,
+                              Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True})
+        logger.info(f"Deleted {len(keys)} objects of segmented transcription {claim}")
+    except Exception as e:
+        logger.error(f"Failed to delete objects of segmented transcription {claim} from S3: {e}")
+
+
+def invoke_segmentation(function_arn, audio_file_id, file_name, file_type, claim):
+    """
+    Re-invoke this function asynchronously to segment a recording, which takes longer than an API request allows.
+    """
+    lambda_client.invoke(
+        FunctionName=function_arn,
+        InvocationType="Event",
+        Payload=json.dumps({
+            "action": SEGMENT_ACTION,
+            "audio_file_id": audio_file_id,
+            "file_name": file_name,
+            "file_type": file_type,
+            "job_name": claim,
+        }),
+    )
+
+
+def start_segmented_transcription(audio_file_id, file_name, file_type, claim):
+    """
+    Start stage of segmented mode: split the recording at silences into overlapping segments and
+    start one Transcribe job per segment, named after the claim. Recordings that fit in one
+    segment run as a single job, which takes over the claim. Each job is started as soon as its
+    segment is uploaded, so early segments are transcribed while later ones are still being cut.
+    """
+    media_key = f"{audio_file_id}/{file_name}.{file_type}"
+    local_path = f"/tmp/{audio_file_id}.{file_type}"
+    s3.download_file(AUDIO_BUCKET, media_key, local_path)
+    try:
+        duration, silences = detect_silences(local_path)
+        plan = plan_segments(duration, silences, SEGMENT_SECONDS, SEGMENT_OVERLAP_SECONDS)
+        if len(plan) == 1:
+            job_name = new_job_name(audio_file_id)
+            if not reclaim_transcription(audio_file_id, claim, job_name):
+                logger.info(f"Segmented transcription {claim} no longer holds the claim of {audio_file_id}")
+                return []
+            return [start_transcription(audio_file_id, file_name, file_type, job_name)]
+
+        prefix = segment_prefix(claim)
+        s3.put_object(Bucket=AUDIO_BUCKET, Key=f"{prefix}plan.json",
+                      Body=json.dumps({"media_key": media_key, "segments": plan}))
+
+        job_names = []
+        for segment in plan:
+            chunk_path = f"/tmp/{audio_file_id}-{segment['index']:04d}.{file_type}"
+            chunk_key = f"{segment_media_prefix(claim)}{segment['index']:04d}.{file_type}"
+            cut_segment(local_path, segment, chunk_path)
+            s3.upload_file(chunk_path, AUDIO_BUCKET, chunk_key)
+            os.remove(chunk_path)
+
+            job_name = f"{claim}-{segment['index']}-{random.randint(1000, 9999)}"
+            start_transcription_job(job_name, chunk_key, file_type, f"{prefix}jobs/{segment['index']:04d}/")
+            job_names.append(job_name)
+
+        logger.info(f"Started {len(job_names)} segment transcriptions for {media_key} ({duration:.0f}s)")
+        return job_names
+    finally:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+
+
+def complete_segment(job_name, status):
+    """
+    Completion stage of segmented mode: store the words of a finished segment, stitch every
+    segment finished so far and push the longer transcript to clients. Whichever segment
+    finishes last completes the transcription and cleans up. A failed segment fails the whole
+    transcription and deletes its plan, so the segments still running stop when they finish.
+    """
+    audio_file_id, index, claim = parse_segment_job_name(job_name)
+    prefix = segment_prefix(claim)
+
+    if status != "COMPLETED":
+        logger.error(f"Segment transcription job {job_name} finished with status {status}")
+        if set_transcription_status(audio_file_id, STATUS_FAILED, claim):
+            invoke_event_notification(audio_file_id, "transcription_failed")
+        delete_segment_objects(claim)
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
+
+    job = transcribe.get_transcription_job(TranscriptionJobName=job_name)["TranscriptionJob"]
+    _, segment_key = parse_s3_uri(job["Media"]["MediaFileUri"])
+
+    try:
+        plan = json.load(s3.get_object(Bucket=AUDIO_BUCKET, Key=f"{prefix}plan.json")["Body"])
+    except s3.exceptions.NoSuchKey:
+        logger.info(f"Segmented transcription {claim} was already completed or failed")
+        delete_transcript_outputs(job)
+        s3.delete_object(Bucket=AUDIO_BUCKET, Key=segment_key)
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status}
+
+    words_key = f"{prefix}words/{index:04d}.json"
+    try:
+        # A retried event finds the words it stored before its transcript outputs were deleted
+        words = json.load(s3.get_object(Bucket=AUDIO_BUCKET, Key=words_key)["Body"])
+    except s3.exceptions.NoSuchKey:
+        bucket, key = parse_s3_uri(job["Transcript"]["RedactedTranscriptFileUri"])
+
+        # A segment is a few minutes of audio, so its transcript is small enough to load whole
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+        try:
+            words = transcript_words(json.load(body))
+        finally:
+            body.close()
+
+        s3.put_object(Bucket=AUDIO_BUCKET, Key=words_key, Body=json.dumps(words))
+        delete_transcript_outputs(job)
+        s3.delete_object(Bucket=AUDIO_BUCKET, Key=segment_key)
+
+    finished = set()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=AUDIO_BUCKET, Prefix=f"{prefix}words/"):
+        for obj in page.get("Contents", []):
+            finished.add(int(obj["Key"].rsplit("/", 1)[-1].split(".")[0]))
+
+    # Only the segments finished without gaps from the start of the recording can be stitched
+    stitcher = SegmentStitcher(plan["segments"])
+    while stitcher.next_index in finished:
+        i = stitcher.next_index
+        if i == index:
+            stitcher.add(i, words)
+        else:
+            stitcher.add(i, json.load(s3.get_object(Bucket=AUDIO_BUCKET, Key=f"{prefix}words/{i:04d}.json")["Body"]))
+
+    progress = f"{stitcher.next_index}/{len(plan['segments'])}"
+    if index >= stitcher.next_index:
+        logger.info(f"Segment {index} of {audio_file_id} is waiting for earlier segments ({progress} stitched)")
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": "IN_PROGRESS", "segments": progress}
+
+    stored = add_audio_to_db(audio_file_id, format_diarized_transcript(stitcher.to_transcribe_result()), claim,
+                             STATUS_COMPLETED if stitcher.complete else STATUS_IN_PROGRESS, stitcher.next_index)
+    if stored["statusCode"] == 204:
+        # A segment that finished at the same time stored and announced a longer transcript
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": "IN_PROGRESS", "segments": progress}
+    if stored["statusCode"] == 409:
+        # The transcription was completed by another segment, failed, or its claim was taken over
+        delete_segment_objects(claim)
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": status, "segments": progress}
+    if stored["statusCode"] != 200:
+        # Fails the whole transcription like a failed segment; the recording is kept for a resubmission
+        fail_unstored_transcription(audio_file_id, claim)
+        delete_segment_objects(claim)
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": STATUS_FAILED, "segments": progress}
+
+    if not stitcher.complete:
+        invoke_event_notification(audio_file_id, "transcription_partial")
+        return {"audioFileId": audio_file_id, "jobName": job_name, "status": "IN_PROGRESS", "segments": progress}
+
+    invoke_event_notification(audio_file_id, "transcription_complete")
+
+    try:
+        s3.delete_object(Bucket=AUDIO_BUCKET, Key=plan["media_key"])
+        logger.info(f"Deleted file {plan['media_key']} from S3")
+    except Exception as e:
+        logger.error(f"Failed to delete audio file from S3: {e}")
+    delete_segment_objects(claim)
+
+    return {"audioFileId": audio_file_id, "jobName": job_name, "status": status, "segments": progress}
+
+
+def handle_segment_event(event):
+    """
+    Handle the asynchronous invocation that segments a recording and starts its transcriptions.
+    """
+    audio_file_id = event["audio_file_id"]
+    claim = event["job_name"]
+    try:
+        job_names = start_segmented_transcription(audio_file_id, event["file_name"], event["file_type"], claim)
+    except Exception as e:
+        # Not re-raised: an asynchronous retry would start a second set of jobs
+        logger.error(f"Segmentation of {audio_file_id} failed: {e}", exc_info=True)
+        if set_transcription_status(audio_file_id, STATUS_FAILED, claim):
+            invoke_event_notification(audio_file_id, "transcription_failed")
+        delete_segment_objects(claim)
+        return {"audioFileId": audio_file_id, "status": "FAILED"}
+    return {"audioFileId": audio_file_id, "jobNames": job_names, "status": "IN_PROGRESS"}
+
+
+def handle_transcribe_event(event):
+    """
+    Handle an EventBridge "Transcribe Job State Change" event for a job started by this function.
+    """
+    detail = event.get("detail") or {}
+    job_name = detail.get("TranscriptionJobName", "")
+    status = detail.get("TranscriptionJobStatus")
+    if not job_name.startswith(JOB_NAME_PREFIX):
+        logger.info(f"Ignoring event for unrelated job {job_name}")
+        return {"ignored": job_name}
+
+    logger.info(f"Transcription job {job_name} changed state to {status}")
+    if job_name.startswith(SEGMENT_JOB_PREFIX):
+        return complete_segment(job_name, status)
+    return complete_transcription(job_name, status)
+
 
 def handler(event, context):
     """
-    AWS Lambda handler:
-      1. Handle CORS preflight (OPTIONS).
-      2. Extract parameters from query string.
-      3. Start a Transcribe job and poll for completion.
-      4. Fetch and parse transcript JSON.
-      5. Store transcript in RDS and notify via AppSync.
+    AWS Lambda handler, serving both stages of the transcription pipeline:
+      - API Gateway requests start a Transcribe job and return its job name immediately.
+      - EventBridge job state change events complete the job: the transcript is fetched,
+        formatted, stored in RDS and announced via AppSync.
+    With segmented=true the recording is split and transcribed in segments from an asynchronous
+    invocation, and partial transcripts are announced as segments finish.
+    """
+    try:
+        if event.get("source") == "aws.transcribe":
+            return handle_transcribe_event(event)
+        if event.get("action") == SEGMENT_ACTION:
+            return handle_segment_event(event)
+        return handle_api_request(event, context)
+    finally:
+        notifications.flush()
+
+
+def handle_api_request(event, context):
     """
-    # 1. Preflight
+    Start a transcription for an audio_to_text API request.
+    """
+    # Preflight
     if event.get("httpMethod") == "OPTIONS":
         return {"statusCode": 200, "headers": get_cors_headers(), "body": ""}
 
     try:
-        # 2. Extract query parameters
+        # Extract query parameters
         qs = event.get("queryStringParameters") or {}
         file_name = qs.get("file_name")
         audio_file_id = qs.get("audio_file_id")
         file_type = qs.get("file_type", "mp3").lower()
-        cognito_token = qs.get("cognito_token")
+        segmented = qs.get("segmented", "false").lower() == "true"
 
         # Validate required parameters
         if not file_name or not audio_file_id:
@@ -259,83 +692,66 @@ def handler(event, context):
             return {"statusCode": 400, "headers": get_cors_headers(),
                     "body": json.dumps({"error": f"Missing parameters: {missing}"})}
 
-        # Construct S3 file URI
-        media_file_uri = f"s3://{AUDIO_BUCKET}/{audio_file_id}/{file_name}.{file_type}"
-        logger.info(f"Starting transcription for: {media_file_uri}")
-
-       # 3. Start Transcription job
-        job_name = f"transcription-{audio_file_id}-{int(time.time())}-{random.randint(1000, 9999)}"
-        transcribe.start_transcription_job(
-            TranscriptionJobName=job_name,
-            Media={"MediaFileUri": media_file_uri},
-            MediaFormat=file_type,
-            LanguageCode="en-US",
-            Settings={
-                'ShowSpeakerLabels': True,
-                'MaxSpeakerLabels': 2,
-                'ShowAlternatives': False,
-            },
-            ContentRedaction={
-                'RedactionType': 'PII',
-                'RedactionOutput': 'redacted_and_unredacted',
-                'PiiEntityTypes': [
-                    'NAME', 'EMAIL', 'PHONE', 'SSN', 
-                    'CREDIT_DEBIT_NUMBER', 'BANK_ACCOUNT_NUMBER', 
-                    'ADDRESS'
-                ]
-            }
-        )
-
-        # Poll for job completion
-        transcript_uri = None
-        while True:
-            resp = transcribe.get_transcription_job(TranscriptionJobName=job_name)
-            status = resp["TranscriptionJob"]["TranscriptionJobStatus"]
-            if status == "COMPLETED":
-                transcript_uri = resp["TranscriptionJob"]["Transcript"]["RedactedTranscriptFileUri"]
-                break
-            if status == "FAILED":
-                raise Exception("Transcription job failed")
-            time.sleep(5)
-
-        # 4. Download and parse transcript
-        with urllib.request.urlopen(transcript_uri) as r:
-            data = json.loads(r.read().decode())
-
-        # Use basic formatting since speaker labels aren't supported with redaction
-        transcript_text = format_diarized_transcript(data)
-
-        # Apply custom PII markers
-        formatted_transcript = customize_pii_markers(transcript_text)
-        
-        # 5. Store transcript and notify clients
-        add_audio_to_db(audio_file_id, formatted_transcript)
-
-        # amazonq-ignore-next-line
-        logger.info(f"About to invoke event notification with audio_file_id={audio_file_id}, file_name={file_name}")
-
-
-        # This sends to AppSync → triggers `onNotify`
-        invoke_event_notification(audio_file_id, "transcription_complete", cognito_token)
+        # Segmented transcriptions are claimed under the segment job prefix, as their jobs are named later
+        job_name = new_segment_claim(audio_file_id) if segmented else new_job_name(audio_file_id)
+        claimed, existing = claim_transcription(audio_file_id, job_name)
+
+        if not claimed:
+            if existing is None:
+                return {"statusCode": 404, "headers": get_cors_headers(),
+                        "body": json.dumps({"error": "Audio file not found"})}
+
+            if existing["status"] == STATUS_COMPLETED:
+                logger.info(f"Returning stored transcript for audio_file_id {audio_file_id}")
+                return {
+                    "statusCode": 200,
+                    "headers": {"Content-Type": "application/json", **get_cors_headers()},
+                    "body": json.dumps({"audioFileId": audio_file_id, "jobName": existing["job_name"],
+                                        "status": STATUS_COMPLETED,
+                                        "audio_text": load_transcript(s3, AUDIO_BUCKET, existing["audio_text"],
+                                                                      existing["audio_text_s3_key"])})
+                }
+
+            # A claim whose job never reached Transcribe (e.g. the claimant crashed), or a segmented
+            # transcription that never finished (e.g. a segment's completion was lost), is taken over
+            if existing["job_name"].startswith(SEGMENT_JOB_PREFIX):
+                abandoned = existing["age"] is not None and existing["age"] > SEGMENT_CLAIM_TIMEOUT_SECONDS
+            else:
+                abandoned = existing["stale"] and not transcription_job_exists(existing["job_name"])
+            if not (abandoned and reclaim_transcription(audio_file_id, existing["job_name"], job_name)):
+                logger.info(f"Attaching to transcription {existing['job_name']} of audio_file_id {audio_file_id}")
+                attached = existing["job_name"]
+                return {
+                    "statusCode": 202,
+                    "headers": {"Content-Type": "application/json", **get_cors_headers()},
+                    "body": json.dumps({"audioFileId": audio_file_id,
+                                        "jobName": None if attached.startswith(SEGMENT_JOB_PREFIX) else attached,
+                                        "status": STATUS_IN_PROGRESS, "attached": True})
+                }
+            if existing["job_name"].startswith(SEGMENT_JOB_PREFIX):
+                delete_segment_objects(existing["job_name"])
 
-        # 6. Delete the audio file from S3
         try:
-            s3.delete_object(
-                Bucket=AUDIO_BUCKET,
-                Key=f"{audio_file_id}/{file_name}.{file_type}"
-            )
-            # amazonq-ignore-next-line
-            logger.info(f"Deleted file {audio_file_id}/{file_name}.{file_type} from S3")
-        except Exception as e:
-            logger.error(f"Failed to delete audio file from S3: {e}")
-
-
+            if segmented:
+                invoke_segmentation(context.invoked_function_arn, audio_file_id, file_name, file_type, job_name)
+                return {
+                    "statusCode": 202,
+                    "headers": {"Content-Type": "application/json", **get_cors_headers()},
+                    "body": json.dumps({"audioFileId": audio_file_id, "jobName": None, "status": STATUS_IN_PROGRESS,
+                                        "mode": "segmented"})
+                }
+
+            start_transcription(audio_file_id, file_name, file_type, job_name)
+        except Exception:
+            # Release the claim so the request can be retried
+            set_transcription_status(audio_file_id, STATUS_FAILED, job_name)
+            raise
 
-        # Return successful response
+        # The transcript is delivered asynchronously through the `transcription_complete` notification
         return {
-            "statusCode": 200,
+            "statusCode": 202,
             "headers": {"Content-Type": "application/json", **get_cors_headers()},
-            "body": json.dumps({"text": transcript_text, "audioFileId": audio_file_id, "jobName": job_name})
+            "body": json.dumps({"audioFileId": audio_file_id, "jobName": job_name, "status": STATUS_IN_PROGRESS})
         }
 
     except Exception as e:
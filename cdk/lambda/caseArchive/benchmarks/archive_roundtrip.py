@@ -0,0 +1,286 @@
+"""
+Check the archival job and the restore path against a local Postgres.
+
+Applies the initializer migrations to a scratch schema, seeds students with cases, summaries,
+messages, transcripts and chat history, and runs a scheduled archival with in-memory stand-ins
+for S3 and DynamoDB. It checks that only closed cases past the retention period leave the hot
+tables, that their history is given a TTL, and that restoring a sample of them brings back
+exactly the rows that were archived. It also reports the archive compression ratio and the size
+of the hot tables and their indexes before and after archiving.
+
+Usage:
+    python benchmarks/archive_roundtrip.py [dsn]   (default: $DATABASE_URL)
+"""
+import io
+import os
+import sys
+import gzip
+import time
+
+import psycopg2
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "initializer"))
+
+os.environ.setdefault("SM_DB_CREDENTIALS", "local")
+os.environ.setdefault("RDS_PROXY_ENDPOINT", "localhost")
+os.environ.setdefault("ARCHIVE_BUCKET", "archive-roundtrip")
+os.environ.setdefault("TABLE_NAME_PARAM", "/local/TableName")
+os.environ.setdefault("REGION", "us-east-1")
+
+import caseArchive  # noqa: E402
+from migrate import apply_migrations  # noqa: E402
+
+SCRATCH_SCHEMA = "archive_roundtrip"
+HISTORY_TABLE = "DynamoDB-Conversation-Table"
+HISTORY_TTL_ATTRIBUTE = caseArchive.HISTORY_TTL_ATTRIBUTE
+
+STUDENTS = 2000
+CASES = 20000
+RESTORES = 200
+
+SEED_SQL = f"""
+    INSERT INTO "users" ("cognito_id", "first_name", "roles")
+    SELECT 'instructor-' || g, 'Instructor', ARRAY['instructor'] FROM generate_series(1, 20) g;
+
+    INSERT INTO "users" ("cognito_id", "first_name", "roles")
+    SELECT 'student-' || g, 'Student', ARRAY['student'] FROM generate_series(1, {STUDENTS}) g;
+
+    -- Two thirds of the cases are from earlier terms; a fifth of all cases are archived
+    INSERT INTO "cases" ("case_hash", "case_title", "case_description", "student_notes", "user_id",
+                         "jurisdiction", "status", "last_updated")
+    SELECT md5(g::text), 'Case ' || g, repeat('The tenant was served an eviction notice. ', 40),
+           'Notes ' || g, s.user_id, ARRAY['Provincial'],
+           (ARRAY['In progress', 'Sent to Review', 'Review Feedback', 'Archived', 'Archived'])[1 + g % 5],
+           now() - (g % 720) * interval '1 day'
+    FROM generate_series(1, {CASES}) g
+    JOIN "users" s ON s.cognito_id = 'student-' || (1 + g % {STUDENTS});
+
+    INSERT INTO "summaries" ("case_id", "content", "is_read")
+    SELECT c.case_id, repeat('Summary of the interview. ', 60), n = 1
+    FROM "cases" c, generate_series(1, 2) n;
+
+    INSERT INTO "messages" ("case_id", "instructor_id", "message_content", "is_read")
+    SELECT c.case_id, i.user_id, 'Feedback on ' || c.case_title, false
+    FROM "cases" c JOIN "users" i ON i.cognito_id = 'instructor-' || (1 + abs(hashtext(c.case_id::text)) % 20);
+
+    INSERT INTO "audio_files" ("case_id", "file_title", "audio_text", "s3_file_path", "transcription_status")
+    SELECT c.case_id, 'Interview', repeat('Client: I paid the deposit. Lawyer: When? ', 200), c.case_id || '/interview.mp3', 'COMPLETED'
+    FROM "cases" c WHERE abs(hashtext(c.case_id::text)) % 2 = 0;
+
+    -- Transcripts offloaded to S3 keep only their key and search vector
+    UPDATE "audio_files" SET audio_text = NULL, audio_text_s3_key = 'stored-transcripts/' || audio_file_id || '.md.gz',
+           search_vector = transcript_search_vector('offloaded transcript about a security deposit')
+    WHERE abs(hashtext(audio_file_id::text)) % 4 = 0;
+"""
+
+SNAPSHOT_SQL = {
+    "cases": 'SELECT row_to_json(t)::jsonb - \'last_updated\' FROM "cases" t WHERE case_id = %s',
+    "summaries": 'SELECT row_to_json(t)::jsonb FROM "summaries" t WHERE case_id = %s ORDER BY summary_id',
+    "messages": 'SELECT row_to_json(t)::jsonb FROM "messages" t WHERE case_id = %s ORDER BY message_id',
+    "audio_files": 'SELECT row_to_json(t)::jsonb FROM "audio_files" t WHERE case_id = %s ORDER BY audio_file_id',
+}
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class MemoryS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+class MemoryDynamoDB:
+    class exceptions:
+        class ResourceNotFoundException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+        self.ttl = "DISABLED"
+
+    def describe_time_to_live(self, TableName):
+        return {"TimeToLiveDescription": {"TimeToLiveStatus": self.ttl}}
+
+    def update_time_to_live(self, TableName, TimeToLiveSpecification):
+        self.ttl = "ENABLED"
+
+    def get_item(self, TableName, Key, **kwargs):
+        item = self.items.get(Key["SessionId"]["S"])
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None):
+        if Item["SessionId"]["S"] in self.items:
+            raise ClientError("ConditionalCheckFailedException")
+        self.items[Item["SessionId"]["S"]] = dict(Item)
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        item = self.items.get(Key["SessionId"]["S"])
+        if item is None:
+            raise ClientError("ConditionalCheckFailedException")
+        attribute = ExpressionAttributeNames["#ttl"]
+        if UpdateExpression.startswith("SET"):
+            item[attribute] = ExpressionAttributeValues[":ttl"]
+        else:
+            item.pop(attribute, None)
+
+
+class Context:
+    def get_remaining_time_in_millis(self):
+        return 15 * 60 * 1000
+
+
+class SSM:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": HISTORY_TABLE}}
+
+
+def snapshot(cursor, case_id):
+    result = {}
+    for table, query in SNAPSHOT_SQL.items():
+        cursor.execute(query, (case_id,))
+        result[table] = [row[0] for row in cursor.fetchall()]
+    return result
+
+
+def table_sizes(cursor):
+    cursor.execute("""
+        SELECT sum(pg_table_size(c.oid)), sum(pg_indexes_size(c.oid))
+        FROM pg_class c
+        WHERE c.relnamespace = current_schema()::regnamespace
+          AND c.relname IN ('cases', 'summaries', 'messages', 'audio_files');
+    """)
+    return [v / 1024 / 1024 for v in cursor.fetchone()]
+
+
+def stats_match_rebuild(connection, cursor):
+    query = 'SELECT * FROM "student_case_stats" WHERE cases_total <> 0 ORDER BY student_id;'
+    cursor.execute(query)
+    maintained = [row[:-1] for row in cursor.fetchall()]
+    cursor.execute("SAVEPOINT rebuild;")
+    cursor.execute("SELECT refresh_student_case_stats();")
+    cursor.execute(query)
+    rebuilt = [row[:-1] for row in cursor.fetchall()]
+    cursor.execute("ROLLBACK TO SAVEPOINT rebuild;")
+    connection.commit()
+    return maintained == rebuilt
+
+
+def main(dsn):
+    connection = psycopg2.connect(dsn)
+    cursor = connection.cursor()
+    cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+    cursor.execute(f'CREATE SCHEMA "{SCRATCH_SCHEMA}";')
+    cursor.execute(f'SET search_path TO "{SCRATCH_SCHEMA}", public;')
+    connection.commit()
+
+    s3, dynamodb = MemoryS3(), MemoryDynamoDB()
+    caseArchive.s3, caseArchive.dynamodb, caseArchive.ssm_client = s3, dynamodb, SSM()
+    caseArchive.ClientError = ClientError
+    caseArchive.connection = connection
+    try:
+        apply_migrations(connection)
+        cursor.execute(SEED_SQL)
+        connection.commit()
+        cursor.execute("SELECT case_id::text FROM \"cases\";")
+        for (case_id,) in cursor.fetchall():
+            dynamodb.items[case_id] = {
+                "SessionId": {"S": case_id},
+                "History": {"L": [{"M": {"type": {"S": "human"}, "data": {"M": {"content": {"S": "Hello"}}}}}] * 6},
+            }
+        cursor.execute("ANALYZE;")
+        connection.commit()
+
+        cursor.execute("""
+            SELECT count(*) FILTER (WHERE lower(status) = 'archived' AND last_updated < now() - make_interval(days => %s)),
+                   count(*)
+            FROM "cases";
+        """, (caseArchive.ARCHIVE_AFTER_DAYS,))
+        expected, total = cursor.fetchone()
+        cursor.execute("""
+            SELECT case_id::text FROM "cases"
+            WHERE lower(status) = 'archived' AND last_updated < now() - make_interval(days => %s)
+            ORDER BY random() LIMIT %s;
+        """, (caseArchive.ARCHIVE_AFTER_DAYS, RESTORES))
+        sample = [row[0] for row in cursor.fetchall()]
+        before = {case_id: snapshot(cursor, case_id) for case_id in sample}
+        connection.commit()
+        size_before = table_sizes(cursor)
+
+        started = time.perf_counter()
+        result = caseArchive.run_archival(Context())
+        elapsed = time.perf_counter() - started
+        assert result["archived"] == expected, f"archived {result['archived']} of {expected} candidates"
+        print(f"archived {expected} of {total} cases in {elapsed:.1f}s ({elapsed / expected * 1000:.1f} ms per case)")
+
+        cursor.execute('SELECT count(*), count(history_expires_at), sum(archive_size) FROM "case_archives";')
+        catalogued, expiring, compressed = cursor.fetchone()
+        assert catalogued == expected and expiring == expected, "every archive is catalogued with a history expiry"
+        assert len(s3.objects) == expected, "one S3 object per archived case"
+        assert dynamodb.ttl == "ENABLED", "TTL enabled on the history table"
+        assert all(HISTORY_TTL_ATTRIBUTE in dynamodb.items[c] for c in sample), "archived history expires"
+        cursor.execute('SELECT count(*) FROM "cases" WHERE case_id = ANY(%s::uuid[]);', (sample,))
+        assert cursor.fetchone()[0] == 0, "archived cases leave the hot tables"
+        connection.commit()
+        assert stats_match_rebuild(connection, cursor), "stats match a rebuild after archiving"
+
+        raw = sum(len(gzip.decompress(body)) for body in s3.objects.values())
+        print(f"archives: {compressed / 1024 / 1024:.1f} MB compressed from {raw / 1024 / 1024:.1f} MB "
+              f"({raw / compressed:.1f}x)")
+
+        connection.autocommit = True
+        cursor.execute('VACUUM FULL "cases", "summaries", "messages", "audio_files";')
+        connection.autocommit = False
+        size_after = table_sizes(cursor)
+        print(f"hot tables: {size_before[0]:.1f} MB -> {size_after[0]:.1f} MB, "
+              f"indexes: {size_before[1]:.1f} MB -> {size_after[1]:.1f} MB")
+
+        # A second run finds nothing to do
+        assert caseArchive.run_archival(Context())["archived"] == 0, "archival is idempotent"
+
+        started = time.perf_counter()
+        for case_id in sample:
+            caseArchive.restore_case(connection, case_id, HISTORY_TABLE)
+        elapsed = time.perf_counter() - started
+        for case_id in sample:
+            assert snapshot(cursor, case_id) == before[case_id], f"case {case_id} restored differently"
+            assert HISTORY_TTL_ATTRIBUTE not in dynamodb.items[case_id], "restored history no longer expires"
+        connection.commit()
+        assert stats_match_rebuild(connection, cursor), "stats match a rebuild after restoring"
+        assert not caseArchive.restore_case(connection, sample[0], HISTORY_TABLE), "restoring twice is a no-op"
+        print(f"restored {len(sample)} cases identically in {elapsed / len(sample) * 1000:.1f} ms per case")
+
+        # Restored cases are not archived again by the next run
+        assert caseArchive.run_archival(Context())["archived"] == 0, "restored cases stay restored"
+
+        # History that expired while archived is written back from the archive
+        cursor.execute('SELECT case_id::text FROM "case_archives" LIMIT 1;')
+        (expired,) = cursor.fetchone()
+        connection.commit()
+        history = dynamodb.items.pop(expired)
+        caseArchive.restore_case(connection, expired, HISTORY_TABLE)
+        history.pop(HISTORY_TTL_ATTRIBUTE)
+        assert dynamodb.items[expired] == history, "expired history restored from the archive"
+        print("history is restored from the archive after its TTL has deleted it")
+    finally:
+        connection.rollback()
+        connection.autocommit = True
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+        connection.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.environ["DATABASE_URL"])
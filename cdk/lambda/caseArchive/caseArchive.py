@@ -0,0 +1,440 @@
+import os
+import json
+import gzip
+import logging
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import psycopg2
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+DB_SECRET_NAME = os.environ["SM_DB_CREDENTIALS"]
+RDS_PROXY_ENDPOINT = os.environ["RDS_PROXY_ENDPOINT"]
+ARCHIVE_BUCKET = os.environ["ARCHIVE_BUCKET"]
+TABLE_NAME_PARAM = os.environ["TABLE_NAME_PARAM"]
+REGION = os.environ["REGION"]
+
+# Cases archived by their student are moved to S3 once they have not been updated for this long
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "120"))
+# Chat history of an archived case stays in DynamoDB this long before its TTL deletes it
+HISTORY_TTL_DAYS = int(os.environ.get("HISTORY_TTL_DAYS", "30"))
+# Cases claimed per query by a scheduled run
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "100"))
+# A scheduled run stops taking new cases when less time than this is left
+REMAINING_TIME_MARGIN_MS = 60 * 1000
+
+ARCHIVE_KEY_PREFIX = "case-archives/"
+ARCHIVE_FORMAT_VERSION = 1
+# DynamoDB deletes history items once this epoch-seconds attribute has passed
+HISTORY_TTL_ATTRIBUTE = "ExpiresAt"
+
+RESTORE_RESOURCE = "/student/restore_case"
+
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+}
+
+retry_config = Config(retries={"max_attempts": 5, "mode": "standard"})
+s3 = boto3.client("s3", region_name=REGION, config=retry_config)
+dynamodb = boto3.client("dynamodb", region_name=REGION, config=retry_config)
+secrets_manager_client = boto3.client("secretsmanager", region_name=REGION)
+ssm_client = boto3.client("ssm", region_name=REGION)
+
+# Cached across invocations
+connection = None
+db_secret = None
+history_table = None
+history_ttl_checked = False
+
+
+def get_secret():
+    global db_secret
+    if db_secret is None:
+        raw = secrets_manager_client.get_secret_value(SecretId=DB_SECRET_NAME)["SecretString"]
+        db_secret = json.loads(raw)
+    return db_secret
+
+
+def connect_to_db():
+    """
+    Establish (or reuse) a connection to the RDS database via the Proxy.
+    """
+    global connection
+    if connection is None or connection.closed:
+        secret = get_secret()
+        connection = psycopg2.connect(
+            dbname=secret["dbname"],
+            user=secret["username"],
+            password=secret["password"],
+            host=RDS_PROXY_ENDPOINT,
+            port=secret["port"],
+        )
+        logger.info("Connected to the database.")
+    return connection
+
+
+def get_history_table():
+    """
+    Return the name of the chat history table, enabling TTL on it the first time it is seen.
+    The table is created by the text generation function on first use, so it may not exist yet.
+    """
+    global history_table, history_ttl_checked
+    if history_table is None:
+        history_table = ssm_client.get_parameter(Name=TABLE_NAME_PARAM)["Parameter"]["Value"]
+    if not history_ttl_checked:
+        try:
+            ttl = dynamodb.describe_time_to_live(TableName=history_table)["TimeToLiveDescription"]
+            if ttl["TimeToLiveStatus"] in ("DISABLED", "DISABLING"):
+                dynamodb.update_time_to_live(
+                    TableName=history_table,
+                    TimeToLiveSpecification={"Enabled": True, "AttributeName": HISTORY_TTL_ATTRIBUTE},
+                )
+                logger.info(f"Enabled TTL on {history_table}.{HISTORY_TTL_ATTRIBUTE}")
+            history_ttl_checked = True
+        except dynamodb.exceptions.ResourceNotFoundException:
+            logger.info(f"History table {history_table} does not exist yet")
+    return history_table
+
+
+def academic_term(timestamp):
+    """
+    Return the academic term a timestamp falls in, e.g. '2025-fall'. Archives are grouped
+    under a prefix per term, so a whole term can be listed, expired or exported at once.
+    """
+    if timestamp.month <= 4:
+        season = "winter"
+    elif timestamp.month <= 8:
+        season = "summer"
+    else:
+        season = "fall"
+    return f"{timestamp.year}-{season}"
+
+
+def archive_key(term, case_id):
+    return f"{ARCHIVE_KEY_PREFIX}{term}/{case_id}.json.gz"
+
+
+def get_history_item(table, case_id):
+    if table is None:
+        return None
+    try:
+        response = dynamodb.get_item(
+            TableName=table, Key={"SessionId": {"S": case_id}}, ConsistentRead=True
+        )
+    except dynamodb.exceptions.ResourceNotFoundException:
+        return None
+    return response.get("Item")
+
+
+def expire_history(table, case_id):
+    """
+    Give an archived case's chat history an expiry, so DynamoDB deletes it without consuming
+    write capacity. Returns the expiry time.
+    """
+    expires_at = datetime.now(timezone.utc) + timedelta(days=HISTORY_TTL_DAYS)
+    try:
+        dynamodb.update_item(
+            TableName=table,
+            Key={"SessionId": {"S": case_id}},
+            UpdateExpression="SET #ttl = :ttl",
+            ConditionExpression="attribute_exists(SessionId)",
+            ExpressionAttributeNames={"#ttl": HISTORY_TTL_ATTRIBUTE},
+            ExpressionAttributeValues={":ttl": {"N": str(int(expires_at.timestamp()))}},
+        )
+    except ClientError as e:
+        # No history was ever written for this case
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+    return expires_at.replace(tzinfo=None)
+
+
+def restore_history(table, case_id, item):
+    """
+    Make a restored case's chat history permanent again. A history item that has not expired
+    yet is kept and its expiry removed; otherwise the archived copy is written back.
+    """
+    if item is None or table is None:
+        return
+    try:
+        dynamodb.put_item(
+            TableName=table,
+            Item=item,
+            ConditionExpression="attribute_not_exists(SessionId)",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        dynamodb.update_item(
+            TableName=table,
+            Key={"SessionId": {"S": case_id}},
+            UpdateExpression="REMOVE #ttl",
+            ExpressionAttributeNames={"#ttl": HISTORY_TTL_ATTRIBUTE},
+        )
+
+
+def fetch_rows(cur, table, case_id):
+    cur.execute(
+        f'SELECT coalesce(json_agg(t), \'[]\') FROM "{table}" t WHERE t.case_id = %s;', (case_id,)
+    )
+    return cur.fetchone()[0]
+
+
+def archive_case(conn, case_id, table):
+    """
+    Move one closed case, its summaries, messages, audio file records and chat history into a
+    compressed archive in S3, then delete it from the hot tables.
+
+    The case row is locked while it is archived, so it cannot change between the export and
+    the delete. The object is written before the rows are deleted, so a catalog entry always
+    points to an existing archive. Offloaded transcripts and recordings stay where they are in
+    the bucket; the archive keeps their keys.
+
+    Returns:
+        bool: True if the case was archived, False if it no longer qualifies.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT row_to_json(c), c.last_updated FROM "cases" c
+            WHERE c.case_id = %s AND lower(c.status) = 'archived'
+            FOR UPDATE SKIP LOCKED;
+            """,
+            (case_id,),
+        )
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return False
+        case, last_updated = row
+
+        audio_files = fetch_rows(cur, "audio_files", case_id)
+        # Search vectors are rebuilt by triggers on restore, except for transcripts offloaded to S3
+        case.pop("search_vector", None)
+        for audio_file in audio_files:
+            if audio_file.get("audio_text") is not None:
+                audio_file.pop("search_vector", None)
+
+        archive = {
+            "version": ARCHIVE_FORMAT_VERSION,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+            "case": case,
+            "summaries": fetch_rows(cur, "summaries", case_id),
+            "messages": fetch_rows(cur, "messages", case_id),
+            "audio_files": audio_files,
+            "history": get_history_item(table, case_id),
+        }
+        body = gzip.compress(json.dumps(archive, default=str).encode("utf-8"), compresslevel=6)
+
+        term = academic_term(last_updated or datetime.now())
+        key = archive_key(term, case_id)
+        s3.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=body, ContentType="application/gzip")
+
+        cur.execute(
+            """
+            INSERT INTO "case_archives" (
+                case_id, user_id, case_title, case_type, status, term, last_updated,
+                archive_s3_key, archive_size, archived_at, history_expires_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, now(), NULL)
+            ON CONFLICT (case_id) DO UPDATE SET
+                user_id = EXCLUDED.user_id, case_title = EXCLUDED.case_title,
+                case_type = EXCLUDED.case_type, status = EXCLUDED.status, term = EXCLUDED.term,
+                last_updated = EXCLUDED.last_updated, archive_s3_key = EXCLUDED.archive_s3_key,
+                archive_size = EXCLUDED.archive_size, archived_at = now(), history_expires_at = NULL;
+            """,
+            (case_id, case["user_id"], case.get("case_title"), case.get("case_type"), case.get("status"),
+             term, last_updated, key, len(body)),
+        )
+        # Summaries, messages and audio file records cascade with the case
+        cur.execute('DELETE FROM "cases" WHERE case_id = %s;', (case_id,))
+    conn.commit()
+    logger.info(f"Archived case {case_id} to {key} ({len(body)} bytes)")
+
+    expire_archived_history(conn, case_id, table)
+    return True
+
+
+def expire_archived_history(conn, case_id, table):
+    """
+    Set the TTL on an archived case's chat history and record it in the catalog. Runs after the
+    archive is committed; cases whose run stopped in between are picked up by the next run.
+    """
+    if table is None:
+        return
+    expires_at = expire_history(table, case_id)
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE "case_archives" SET history_expires_at = %s WHERE case_id = %s;',
+            (expires_at, case_id),
+        )
+    conn.commit()
+
+
+def run_archival(context):
+    """
+    Archive closed cases past the retention period until none are left or time runs out.
+    """
+    conn = connect_to_db()
+    table = get_history_table()
+    out_of_time = lambda: context.get_remaining_time_in_millis() < REMAINING_TIME_MARGIN_MS
+
+    # History left without an expiry by an earlier run that stopped after archiving its case
+    if table is not None:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT case_id::text FROM "case_archives" WHERE history_expires_at IS NULL LIMIT %s;',
+                (ARCHIVE_BATCH_SIZE,),
+            )
+            pending = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        for case_id in pending:
+            if out_of_time():
+                break
+            expire_archived_history(conn, case_id, table)
+
+    archived = skipped = 0
+    while not out_of_time():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT case_id::text FROM "cases"
+                WHERE lower(status) = 'archived' AND last_updated < now() - make_interval(days => %s)
+                ORDER BY last_updated
+                LIMIT %s;
+                """,
+                (ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE),
+            )
+            batch = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        if not batch:
+            break
+        progressed = False
+        for case_id in batch:
+            if out_of_time():
+                break
+            if archive_case(conn, case_id, table):
+                archived += 1
+                progressed = True
+            else:
+                skipped += 1
+        # Everything left is locked by another run or changed status since it was selected
+        if not progressed:
+            break
+
+    logger.info(f"Archival run finished: {archived} archived, {skipped} skipped")
+    return {"archived": archived, "skipped": skipped}
+
+
+def restore_case(conn, case_id, table):
+    """
+    Restore an archived case into the hot tables from its S3 archive. The chat history is
+    restored before the rows are committed, so a failed restore can simply be retried.
+
+    Returns:
+        bool: True if the case was restored, False if it is not archived.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            'SELECT archive_s3_key FROM "case_archives" WHERE case_id = %s FOR UPDATE;', (case_id,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return False
+        key = row[0]
+
+        body = s3.get_object(Bucket=ARCHIVE_BUCKET, Key=key)["Body"]
+        try:
+            archive = json.loads(gzip.decompress(body.read()).decode("utf-8"))
+        finally:
+            body.close()
+
+        # Messages from instructors whose accounts were removed since are kept without a sender
+        instructor_ids = list({m["instructor_id"] for m in archive["messages"] if m.get("instructor_id")})
+        if instructor_ids:
+            cur.execute('SELECT user_id::text FROM "users" WHERE user_id = ANY(%s::uuid[]);', (instructor_ids,))
+            existing = {r[0] for r in cur.fetchall()}
+            for message in archive["messages"]:
+                if message.get("instructor_id") not in existing:
+                    message["instructor_id"] = None
+
+        # A restore counts as an update, so the next scheduled run does not archive the case again
+        archive["case"]["last_updated"] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+        # Columns added since the case was archived are left NULL
+        cur.execute(
+            'INSERT INTO "cases" SELECT * FROM json_populate_record(NULL::"cases", %s);',
+            (json.dumps(archive["case"]),),
+        )
+        for child in ("summaries", "messages", "audio_files"):
+            if archive[child]:
+                cur.execute(
+                    f'INSERT INTO "{child}" SELECT * FROM json_populate_recordset(NULL::"{child}", %s);',
+                    (json.dumps(archive[child]),),
+                )
+        cur.execute('DELETE FROM "case_archives" WHERE case_id = %s;', (case_id,))
+
+        restore_history(table, case_id, archive.get("history"))
+    conn.commit()
+
+    try:
+        s3.delete_object(Bucket=ARCHIVE_BUCKET, Key=key)
+    except ClientError as e:
+        logger.warning(f"Restored case {case_id} but could not delete its archive {key}: {e}")
+    logger.info(f"Restored case {case_id} from {key}")
+    return True
+
+
+def build_response(status_code, body):
+    return {"statusCode": status_code, "headers": CORS_HEADERS, "body": json.dumps(body)}
+
+
+def handle_restore(event):
+    params = event.get("queryStringParameters") or {}
+    case_id = params.get("case_id")
+    cognito_id = (event.get("requestContext") or {}).get("authorizer", {}).get("userId") or params.get("user_id")
+    if not case_id or not cognito_id:
+        return build_response(400, {"error": "case_id and user_id are required"})
+
+    conn = connect_to_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT a.case_id IS NOT NULL, c.case_id IS NOT NULL
+                FROM "users" u
+                LEFT JOIN "case_archives" a ON a.case_id = %s AND a.user_id = u.user_id
+                LEFT JOIN "cases" c ON c.case_id = %s AND c.user_id = u.user_id
+                WHERE u.cognito_id = %s;
+                """,
+                (case_id, case_id, cognito_id),
+            )
+            row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            return build_response(404, {"error": "User not found"})
+        is_archived, is_live = row
+        if is_live:
+            return build_response(200, {"case_id": case_id, "restored": False})
+        if not is_archived or not restore_case(conn, case_id, get_history_table()):
+            return build_response(404, {"error": "Archived case not found"})
+        return build_response(200, {"case_id": case_id, "restored": True})
+    except Exception as e:
+        logger.error(f"Error restoring case {case_id}: {e}")
+        conn.rollback()
+        return build_response(500, {"error": "Internal server error"})
+
+
+def lambda_handler(event, context):
+    # API Gateway: restore a case on demand
+    if event.get("resource") == RESTORE_RESOURCE:
+        return handle_restore(event)
+
+    # EventBridge schedule: archive closed cases
+    return run_archival(context)
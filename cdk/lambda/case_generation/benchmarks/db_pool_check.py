@@ -0,0 +1,174 @@
+"""
+Check the shared data-access layer (shared/helpers/db.py) against a local Postgres.
+
+Terminates the backend under a pooled connection, as the RDS proxy does when it drops a client,
+and checks that an idempotent read is retried on a new connection, that a connection which was
+dropped while idle is replaced before a write is made on it, and that a cancelled statement is not
+retried. It then compares the latency of the get_case_details lookup on a fresh connection per
+request, as the handlers used to make after a dropped connection, against the pool, with and
+without a server-side prepared statement.
+
+Usage:
+    python benchmarks/db_pool_check.py [dsn]   (default: $DATABASE_URL)
+"""
+import os
+import sys
+import time
+import uuid
+import threading
+import statistics
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "shared"))
+
+from helpers import db as dbm  # noqa: E402
+
+CASES = 20000
+LOOKUPS = 2000
+
+CASE_DETAILS = """
+    SELECT case_type, jurisdiction, case_description, statute, province FROM db_pool_check WHERE case_id = %s;
+"""
+
+
+def drop_connections(dsn):
+    """Terminate every other client connection to the database, as the proxy does when it drops them."""
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("""
+            SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+        """)
+    time.sleep(0.2)
+
+
+def cancel_later(dsn, query, seconds):
+    def cancel():
+        time.sleep(seconds)
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute("""
+                SELECT pg_cancel_backend(pid) FROM pg_stat_activity
+                WHERE state = 'active' AND query = %s AND pid <> pg_backend_pid()
+            """, (query,))
+    thread = threading.Thread(target=cancel)
+    thread.start()
+    return thread
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return f"p50 {statistics.median(timings):.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms"
+
+
+def seed(dsn):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("DROP TABLE IF EXISTS db_pool_check")
+        conn.execute("""
+            CREATE TABLE db_pool_check (
+                case_id uuid PRIMARY KEY, case_type text, jurisdiction text[], case_description text,
+                statute text, province text
+            )
+        """)
+        ids = [uuid.uuid4() for _ in range(CASES)]
+        with conn.cursor().copy("COPY db_pool_check FROM STDIN") as copy:
+            for i, case_id in enumerate(ids):
+                copy.write_row((case_id, "Criminal", ["Federal", "Provincial"], "x" * (200 + i % 800),
+                                "Criminal Code", "BC"))
+        conn.execute("ANALYZE db_pool_check")
+    return ids
+
+
+def check_recovery(dsn, db):
+    labels = []
+    db.add_hook(lambda label, duration_ms, rowcount, error: labels.append((label, error is None)))
+
+    # Both pooled connections are in use once, then dropped while idle
+    with db.connection() as first, db.connection() as second:
+        pids = {first.info.backend_pid, second.info.backend_pid}
+    drop_connections(dsn)
+    row = db.fetchone("SELECT pg_backend_pid()", label="read after drop")
+    assert row[0] not in pids, "the read was not made on a new connection"
+    assert labels[-2:] == [("read after drop", False), ("read after drop", True)], labels[-2:]
+    print("read on a dropped connection: retried on a new connection")
+
+    with db.connection() as conn:
+        pid = conn.info.backend_pid
+    drop_connections(dsn)
+    saved, dbm.LIVENESS_IDLE_SECONDS = dbm.LIVENESS_IDLE_SECONDS, 0.1
+    try:
+        with db.connection() as conn:
+            conn.execute("UPDATE db_pool_check SET statute = statute WHERE false")
+            assert conn.info.backend_pid != pid, "the dropped connection was handed out"
+    finally:
+        dbm.LIVENESS_IDLE_SECONDS = saved
+    print("write after an idle drop: the liveness check replaced the connection")
+
+    # A cancelled statement fails without closing its connection, so it is not retried
+    attempts = len(labels)
+    canceller = cancel_later(dsn, "SELECT pg_sleep(2)", 0.2)
+    try:
+        db.fetchone("SELECT pg_sleep(2)", label="cancelled")
+        raise AssertionError("the statement was not cancelled")
+    except psycopg.errors.QueryCanceled:
+        pass
+    finally:
+        canceller.join()
+    assert len(labels) - attempts == 1, "a cancelled statement was retried"
+    print("cancelled statement: not retried")
+
+
+def time_lookups(lookup, ids):
+    timings = []
+    for i in range(LOOKUPS):
+        started = time.perf_counter()
+        lookup(ids[i * 7919 % len(ids)])
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def compare_latency(dsn, db, ids):
+    def per_request(case_id):
+        with psycopg.connect(dsn) as conn:
+            return conn.execute(CASE_DETAILS, (case_id,)).fetchone()
+
+    results = {
+        "new connection per request": time_lookups(per_request, ids),
+        "pooled, unprepared": time_lookups(
+            lambda case_id: db.fetchone(CASE_DETAILS, (case_id,), prepare=False), ids),
+        "pooled, prepared": time_lookups(
+            lambda case_id: db.fetchone(CASE_DETAILS, (case_id,), label="get_case_details", prepare=True), ids),
+    }
+    with db.connection() as conn:
+        prepared = conn.execute("SELECT count(*) FROM pg_prepared_statements").fetchone()[0]
+    assert prepared >= 1, "get_case_details was not prepared on the server"
+
+    print(f"\nget_case_details, {LOOKUPS} lookups over {CASES} cases:")
+    for name, timings in results.items():
+        print(f"  {name:28} {percentiles(timings)}")
+
+
+def main():
+    dsn = sys.argv[1] if len(sys.argv) > 1 else os.environ["DATABASE_URL"]
+    params = conninfo_to_dict(dsn)
+    dbm._secrets["local"] = {
+        "dbname": params.get("dbname", "postgres"),
+        "username": params.get("user", "postgres"),
+        "password": params.get("password", ""),
+        "port": params.get("port", 5432),
+    }
+    ids = seed(dsn)
+    db = dbm.Database("local", params.get("host", "localhost"))
+    try:
+        check_recovery(dsn, db)
+        compare_latency(dsn, db, ids)
+    finally:
+        db.pool.close()
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute("DROP TABLE db_pool_check")
+
+
+if __name__ == "__main__":
+    main()
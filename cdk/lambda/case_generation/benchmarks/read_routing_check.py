@@ -0,0 +1,178 @@
+"""
+Check read/write routing in the shared data-access layer (shared/helpers/db.py) against two local
+Postgres instances, one standing in for the writer and one for the reader.
+
+Both are seeded with the same cases, then rows are written to the writer only, as a replica that
+has not caught up would see them. The script checks that reads made with reader=True are served
+by the reader, that a case missing on the reader is read from the writer, that reads go to the
+writer for READ_YOUR_WRITES_SECONDS after this container writes, and that an unreachable reader
+falls back to the writer within READER_CONNECT_TIMEOUT. It then reports how get_case_details
+lookups were split between the two.
+
+Usage:
+    python benchmarks/read_routing_check.py writer_dsn reader_dsn
+"""
+import os
+import sys
+import time
+import uuid
+import statistics
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "shared"))
+
+from helpers import db as dbm  # noqa: E402
+
+CASES = 5000
+LOOKUPS = 2000
+NEW_CASES_PER_LOOKUP = 0.05
+
+CASE_DETAILS = """
+    SELECT case_type, jurisdiction, case_description, statute, province, current_setting('read_routing_check.server')
+    FROM read_routing_check WHERE case_id = %s;
+"""
+
+NEW_CASE = "INSERT INTO read_routing_check VALUES (%s, 'Civil', '{Provincial}', 'New case', NULL, 'BC')"
+
+
+def seed(dsn, name, ids):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("DROP TABLE IF EXISTS read_routing_check")
+        conn.execute("""
+            CREATE TABLE read_routing_check (
+                case_id uuid PRIMARY KEY, case_type text, jurisdiction text[], case_description text,
+                statute text, province text
+            )
+        """)
+        with conn.cursor().copy("COPY read_routing_check FROM STDIN") as copy:
+            for case_id in ids:
+                copy.write_row((case_id, "Criminal", ["Federal"], "Seeded case", "Criminal Code", "BC"))
+        conn.execute("ANALYZE read_routing_check")
+        # Every row reports the server it was read from, through a setting of new connections
+        conn.execute(f"ALTER DATABASE {dbname(dsn)} SET read_routing_check.server = '{name}'")
+
+
+def dbname(dsn):
+    return conninfo_to_dict(dsn).get("dbname", "postgres")
+
+
+def server_of(row):
+    return row[-1]
+
+
+def make_database(writer_dsn, reader_dsn):
+    writer, reader = conninfo_to_dict(writer_dsn), conninfo_to_dict(reader_dsn)
+    assert writer.get("port", "5432") == reader.get("port", "5432"), "the secret has a single port"
+    dbm._secrets["local"] = {
+        "dbname": writer.get("dbname", "postgres"),
+        "username": writer.get("user", "postgres"),
+        "password": writer.get("password", ""),
+        "port": writer.get("port", 5432),
+    }
+    return dbm.Database("local", writer.get("host", "localhost"), reader.get("host", "localhost"))
+
+
+def insert_on_writer(db, case_id):
+    with db.connection() as conn:
+        conn.execute(NEW_CASE, (case_id,))
+
+
+def check_routing(db, ids):
+    saved, dbm.READ_YOUR_WRITES_SECONDS = dbm.READ_YOUR_WRITES_SECONDS, 0.5
+    try:
+        row = db.fetchone(CASE_DETAILS, (ids[0],), reader=True)
+        assert server_of(row) == "reader", server_of(row)
+        print("seeded case: read from the reader")
+
+        new_case = uuid.uuid4()
+        insert_on_writer(db, new_case)
+        row = db.fetchone(CASE_DETAILS, (new_case,), reader=True)
+        assert server_of(row) == "writer" and db.routes["reader_miss"] == 0, db.routes
+        print("read right after this container wrote: read from the writer without trying the reader")
+
+        time.sleep(0.6)
+        row = db.fetchone(CASE_DETAILS, (ids[1],), reader=True)
+        assert server_of(row) == "reader", server_of(row)
+        row = db.fetchone(CASE_DETAILS, (new_case,), reader=True)
+        assert server_of(row) == "writer" and db.routes["reader_miss"] == 1, db.routes
+        print("case written elsewhere and missing on the reader: found on the writer")
+
+        row = db.fetchone(CASE_DETAILS, (ids[2],))
+        assert server_of(row) == "writer", server_of(row)
+        print("read without reader=True: read from the writer")
+    finally:
+        dbm.READ_YOUR_WRITES_SECONDS = saved
+
+
+def check_unreachable_reader(writer_dsn, ids):
+    db = make_database(writer_dsn, writer_dsn)
+    db.reader_host = "10.255.255.1"
+    started = time.perf_counter()
+    row = db.fetchone(CASE_DETAILS, (ids[0],), reader=True)
+    elapsed = time.perf_counter() - started
+    assert server_of(row) == "writer", server_of(row)
+    assert elapsed < dbm.READER_CONNECT_TIMEOUT * 2, elapsed
+    started = time.perf_counter()
+    db.fetchone(CASE_DETAILS, (ids[1],), reader=True)
+    assert time.perf_counter() - started < 0.1, "the unreachable reader was tried again"
+    db.pool.close()
+    print(f"unreachable reader: read from the writer after {elapsed:.1f} s, then skipped for "
+          f"{dbm.READER_RETRY_SECONDS} s")
+
+
+def report_split(db, ids):
+    """Lookups of seeded cases and of cases just created by another function, as in a busy term."""
+    servers = {"reader": 0, "writer": 0}
+    timings = []
+    for i in range(LOOKUPS):
+        if i % int(1 / NEW_CASES_PER_LOOKUP) == 0:
+            case_id = uuid.uuid4()
+            with psycopg.connect(WRITER_DSN, autocommit=True) as conn:
+                conn.execute(NEW_CASE, (case_id,))
+        else:
+            case_id = ids[i * 7919 % len(ids)]
+        started = time.perf_counter()
+        row = db.fetchone(CASE_DETAILS, (case_id,), label="get_case_details", prepare=True, reader=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert row is not None, case_id
+        servers[server_of(row)] += 1
+
+    timings.sort()
+    print(f"\nget_case_details, {LOOKUPS} lookups, {NEW_CASES_PER_LOOKUP:.0%} of them for new cases:")
+    print(f"  served by the reader: {servers['reader']}, by the writer: {servers['writer']}")
+    print(f"  routes: {dict(db.routes)}")
+    print(f"  p50 {statistics.median(timings):.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+
+def main():
+    global WRITER_DSN
+    if len(sys.argv) < 3:
+        raise SystemExit(__doc__)
+    WRITER_DSN, reader_dsn = sys.argv[1], sys.argv[2]
+    ids = [uuid.uuid4() for _ in range(CASES)]
+    for dsn, name in ((WRITER_DSN, "writer"), (reader_dsn, "reader")):
+        seed(dsn, name, ids)
+
+    # The split is measured in a second container, which has not written anything itself
+    databases = [make_database(WRITER_DSN, reader_dsn), make_database(WRITER_DSN, reader_dsn)]
+    try:
+        check_routing(databases[0], ids)
+        check_unreachable_reader(WRITER_DSN, ids)
+        report_split(databases[1], ids)
+    finally:
+        for db in databases:
+            for pool in (db.pool, db.reader_pool):
+                if pool:
+                    pool.close()
+        for dsn in (WRITER_DSN, reader_dsn):
+            with psycopg.connect(dsn, autocommit=True) as conn:
+                conn.execute("DROP TABLE read_routing_check")
+                conn.execute(f"ALTER DATABASE {dbname(dsn)} RESET read_routing_check.server")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields accepted for each imported case
+CASE_FIELDS = ("case_title", "case_type", "jurisdiction", "case_description", "province", "statute", "student_email")
+REQUIRED_FIELDS = ("case_type", "case_description")
+
+
+def parse_cases(body: str, content_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Parse a bulk import payload into a list of case dictionaries.
+
+    Args:
+        body (str): The raw request body, either a JSON array (or {"cases": [...]}) or CSV with a header row.
+        content_type (str, optional): The request Content-Type; "text/csv" forces CSV parsing.
+
+    Returns:
+        list: One dictionary per case, restricted to CASE_FIELDS.
+    """
+    body = body or ""
+    if content_type and "csv" in content_type.lower():
+        return _parse_csv(body)
+
+    try:
+        data = json.loads(body or "[]")
+    except json.JSONDecodeError:
+        # Not JSON; treat it as CSV so clients can post a file without setting the header
+        return _parse_csv(body)
+
+    if isinstance(data, dict):
+        data = data.get("cases", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of cases")
+    return [{k: row.get(k) for k in CASE_FIELDS} if isinstance(row, dict) else {} for row in data]
+
+
+def _parse_csv(body: str) -> List[Dict[str, Any]]:
+    reader = csv.DictReader(io.StringIO(body))
+    rows = []
+    for row in reader:
+        case = {k: (row.get(k) or "").strip() or None for k in CASE_FIELDS}
+        # Multiple jurisdictions are separated by semicolons within a CSV cell
+        if case["jurisdiction"]:
+            case["jurisdiction"] = [j.strip() for j in case["jurisdiction"].split(";") if j.strip()]
+        rows.append(case)
+    return rows
+
+
+def validate_case(case: Dict[str, Any]) -> Optional[str]:
+    """
+    Validate a single case, returning an error message or None if the case is valid.
+    Jurisdiction is normalized to a list to match the varchar[] column.
+    """
+    missing = [f for f in REQUIRED_FIELDS if not case.get(f)]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+
+    jurisdiction = case.get("jurisdiction")
+    if jurisdiction is None:
+        case["jurisdiction"] = []
+    elif isinstance(jurisdiction, str):
+        case["jurisdiction"] = [jurisdiction]
+    elif not isinstance(jurisdiction, list):
+        return "jurisdiction must be a string or a list of strings"
+
+    case["province"] = case.get("province") or "N/A"
+    case["statute"] = case.get("statute") or "N/A"
+    return None
+
+
+def guardrail_text(case: Dict[str, Any]) -> str:
+    """Build the text screened by guardrails, matching single case creation."""
+    return f"{case.get('case_title')} {case.get('case_type')} {case.get('jurisdiction')} {case.get('case_description')}"
+
+
+def apply_guardrails_batched(
+    cases: List[Tuple[int, Dict[str, Any]]],
+    apply_guardrail: Callable[[List[str]], Dict[str, Any]],
+    batch_size: int = 25,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Screen cases with guardrails in batches, returning the guardrail response for each blocked row.
+
+    Each batch is checked with a single ApplyGuardrail call. A batch only needs to be split
+    when the guardrail intervenes, in which case it is bisected until the offending rows are
+    isolated, so a clean import costs one call per batch_size rows.
+
+    Args:
+        cases (list): (row_index, case) pairs to screen.
+        apply_guardrail (callable): Takes a list of texts and returns the ApplyGuardrail response.
+        batch_size (int): Number of cases screened per call.
+
+    Returns:
+        dict: Maps row_index to the guardrail response for every blocked case.
+    """
+    blocked = {}
+
+    def screen(chunk):
+        resp = apply_guardrail([guardrail_text(case) for _, case in chunk])
+        if resp.get("action") != "GUARDRAIL_INTERVENED":
+            return
+        if len(chunk) == 1:
+            blocked[chunk[0][0]] = resp
+            return
+        mid = len(chunk) // 2
+        screen(chunk[:mid])
+        screen(chunk[mid:])
+
+    for start in range(0, len(cases), batch_size):
+        screen(cases[start:start + batch_size])
+
+    logger.info(f"Guardrails blocked {len(blocked)} of {len(cases)} imported cases")
+    return blocked
@@ -2,6 +2,8 @@ import logging
 import boto3
 import re
 import json
+import time
+import hashlib
 from datetime import datetime
 from langchain_aws.chat_models.bedrock import ChatBedrockConverse
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
@@ -21,7 +23,9 @@ def get_bedrock_llm(
     bedrock_llm_id: str,
     temperature: Optional[float] = 0.7,
     max_tokens: Optional[int] = 150,
-    top_p : Optional[float] = None
+    top_p : Optional[float] = None,
+    client: Optional[Any] = None,
+    callbacks: Optional[list] = None
 ) -> ChatBedrockConverse:
     """
     Retrieve a Bedrock LLM instance configured with the given model ID and temperature.
@@ -32,6 +36,8 @@ def get_bedrock_llm(
             of generated responses (default is 0).
         max_tokens (int, optional): Sets an upper bound on how many tokens the model will generate in its response (default is None).
         top_p (float, optional): Indicates the percentage of most-likely candidates that are considered for the next token (default is None).
+        client (BedrockRuntime, optional): The container's shared Bedrock runtime client (default is a new client).
+        callbacks (list, optional): Callbacks of the LLM, such as ModelRouter.callbacks() of its route (default is None).
 
     Returns:
         ChatBedrockConverse: An instance of the Bedrock LLM corresponding to the provided model ID.
@@ -49,10 +55,64 @@ def get_bedrock_llm(
         temperature=temperature,
         # Additional kwargs: https://api.python.langchain.com/en/latest/aws/chat_models/langchain_aws.chat_models.bedrock_converse.ChatBedrockConverse.html
         max_tokens=max_tokens,
-        top_p=top_p
+        top_p=top_p,
+        client=client,
+        callbacks=callbacks
     )
 
 
+def title_cache_key(
+    case_type: Optional[str],
+    jurisdiction: Optional[Any] = None,
+    case_description: Optional[str] = None,
+    province: Optional[str] = None
+) -> str:
+    """
+    Build a deterministic cache key for a case title from the inputs that shape it.
+
+    Values are lowercased and whitespace-collapsed, and jurisdictions are sorted, so templated or
+    duplicate cases that differ only in formatting map to the same key.
+
+    Returns:
+        str: A SHA-256 hex digest of the normalized inputs.
+    """
+    def normalize(value):
+        return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+    if isinstance(jurisdiction, (list, tuple)):
+        jurisdiction = ",".join(sorted(normalize(j) for j in jurisdiction))
+
+    normalized = "\x1f".join(normalize(v) for v in (case_type, jurisdiction, province, case_description))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def emit_title_metrics(model_id: str, latency_ms: float, cache: str, usage: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Log title generation metrics in CloudWatch Embedded Metric Format so latency and token usage
+    can be compared per model and per cache outcome.
+    """
+    usage = usage or {}
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": "LegalAidTool/CaseTitles",
+                "Dimensions": [["ModelId", "Cache"]],
+                "Metrics": [
+                    {"Name": "TitleLatency", "Unit": "Milliseconds"},
+                    {"Name": "InputTokens", "Unit": "Count"},
+                    {"Name": "OutputTokens", "Unit": "Count"},
+                ],
+            }],
+        },
+        "ModelId": model_id or "none",
+        "Cache": cache,
+        "TitleLatency": round(latency_ms, 2),
+        "InputTokens": usage.get("input_tokens", 0),
+        "OutputTokens": usage.get("output_tokens", 0),
+    }))
+
+
 def get_response(
     case_type: str, 
     llm: ChatBedrockConverse,
@@ -108,7 +168,15 @@ def get_response(
     
     # Use the LLM to generate the title
     logger.info("Invoking LLM to generate case title")
-    response = llm.invoke(prompt).content
+    started = time.perf_counter()
+    message = llm.invoke(prompt)
+    emit_title_metrics(
+        getattr(llm, "model_id", None),
+        (time.perf_counter() - started) * 1000,
+        "miss",
+        getattr(message, "usage_metadata", None),
+    )
+    response = message.content
     
     # Trim the response to ensure it's not too long
     title = response.strip()[:100]
@@ -7,9 +7,16 @@ import uuid
 import time
 import boto3
 import psycopg
-from botocore.exceptions import ClientError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from helpers.chat import get_bedrock_llm, get_response
+from helpers.chat import get_bedrock_llm, get_response, title_cache_key, emit_title_metrics
+from helpers.bulk_import import parse_cases, validate_case, apply_guardrails_batched
+from helpers.notifications import NotificationDispatcher, iam_authorizer
+from helpers.db import Database, get_parameter
+from helpers.admission import AdmissionController, estimate_tokens
+from helpers.bedrock import BedrockRuntime
+from helpers.routing import ModelRouter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,19 +26,58 @@ logger = logging.getLogger(__name__)
 DB_SECRET_NAME = os.environ["SM_DB_CREDENTIALS"]
 REGION = os.environ["REGION"]
 RDS_PROXY_ENDPOINT = os.environ["RDS_PROXY_ENDPOINT"]
+DB_READER_ENDPOINT = os.environ.get("DB_READER_ENDPOINT")
 BEDROCK_LLM_PARAM = os.environ["BEDROCK_LLM_PARAM"]
 TABLE_NAME_PARAM = os.environ["TABLE_NAME_PARAM"]
+# Titles are routed to a smaller, faster model; falls back to the main model if unset
+TITLE_LLM_PARAM = os.environ.get("TITLE_LLM_PARAM", BEDROCK_LLM_PARAM)
+APPSYNC_API_URL = os.environ.get("APPSYNC_API_URL")
+
+# Async payload actions used when this function re-invokes itself to generate titles
+GENERATE_TITLE_ACTION = "generate_title"
+GENERATE_TITLES_ACTION = "generate_titles"
+
+# Bulk import limits
+BULK_IMPORT_RESOURCE = "/instructor/bulk_cases"
+MAX_BULK_CASES = int(os.environ.get("MAX_BULK_CASES", "500"))
+BULK_GUARDRAIL_BATCH_SIZE = int(os.environ.get("BULK_GUARDRAIL_BATCH_SIZE", "25"))
+BULK_TITLE_CONCURRENCY = int(os.environ.get("BULK_TITLE_CONCURRENCY", "4"))
+PLACEHOLDER_TITLE = "New Case"
+
+# Seconds of an invocation kept back from waiting for admission, to generate and store the title
+TITLE_ADMISSION_MARGIN_SECONDS = 30
+
+# Titles kept in the container, and how long a stored title is reused before it is generated again
+TITLE_CACHE_MAX_ENTRIES = int(os.environ.get("TITLE_CACHE_MAX_ENTRIES", "2048"))
+TITLE_CACHE_TTL_DAYS = int(os.environ.get("TITLE_CACHE_TTL_DAYS", "90"))
+# Expired rows of "case_title_cache" deleted by each write
+TITLE_CACHE_PRUNE_BATCH = 1000
 
 # AWS clients
-secrets_manager_client = boto3.client("secretsmanager")
-ssm_client = boto3.client("ssm", region_name=REGION)
-bedrock_runtime = boto3.client("bedrock-runtime", region_name=REGION)
+# Model calls and guardrail checks share one pooled, throttle-aware Bedrock runtime client
+bedrock_runtime = BedrockRuntime(REGION)
+lambda_client = boto3.client("lambda", region_name=REGION)
+
+# Model and token budget of each LLM call, from the routing table in SSM
+router = ModelRouter(bedrock_runtime)
+
+# AppSync notifications share the container's pooled HTTP/2 client and are signed with the function's role
+notifications = NotificationDispatcher(APPSYNC_API_URL)
+appsync_authorizer = iam_authorizer(REGION)
+
+# Pooled database connections, reused across invocations in this container
+db = Database(DB_SECRET_NAME, RDS_PROXY_ENDPOINT, DB_READER_ENDPOINT)
+
+# Token-bucket admission control in front of Bedrock, shared with the other generation functions
+admission = AdmissionController()
 
 # Globals
-connection = None
-db_secret = None
 BEDROCK_LLM_ID = None
+TITLE_LLM_ID = None
 TABLE_NAME = None
+guardrail_cache = {}
+title_cache = OrderedDict()  # title_key -> title, least recently used first, in front of the "case_title_cache" table
+user_id_cache = {}  # cognito_id -> user_id, reused across invocations in this container
 
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -40,49 +86,13 @@ class CustomJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-def get_secret(secret_name, expect_json=True):
-    global db_secret
-    if db_secret is None:
-        try:
-            response = secrets_manager_client.get_secret_value(SecretId=secret_name)["SecretString"]
-            db_secret = json.loads(response) if expect_json else response
-        except Exception as e:
-            logger.error(f"Failed to fetch secret {secret_name}: {e}")
-            raise
-    return db_secret
-
-
-def get_parameter(param_name, cached_var):
-    if cached_var is None:
-        try:
-            response = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
-            cached_var = response["Parameter"]["Value"]
-        except Exception as e:
-            logger.error(f"Error fetching parameter {param_name}: {e}")
-            raise
-    return cached_var
-
-
 def initialize_constants():
-    global BEDROCK_LLM_ID, TABLE_NAME
+    global BEDROCK_LLM_ID, TITLE_LLM_ID, TABLE_NAME
     BEDROCK_LLM_ID = get_parameter(BEDROCK_LLM_PARAM, BEDROCK_LLM_ID)
+    TITLE_LLM_ID = get_parameter(TITLE_LLM_PARAM, TITLE_LLM_ID)
     TABLE_NAME = get_parameter(TABLE_NAME_PARAM, TABLE_NAME)
 
 
-def connect_to_db():
-    global connection
-    if connection is None or connection.closed:
-        secret = get_secret(DB_SECRET_NAME)
-        conn_str = f"host={RDS_PROXY_ENDPOINT} dbname={secret['dbname']} user={secret['username']} password={secret['password']} port={secret['port']}"
-        try:
-            connection = psycopg.connect(conn_str)
-            logger.info("Connected to RDS via proxy")
-        except Exception as e:
-            logger.error(f"Database connection error: {e}")
-            raise
-    return connection
-
-
 def hash_uuid(uuid_str):
     sha = hashlib.sha256(uuid_str.encode("utf-8")).digest()
     return base64.urlsafe_b64encode(sha).decode("utf-8")[:6]
@@ -93,14 +103,10 @@ def capitalize_title(s):
 
 
 def get_case_details(case_id):
-    conn = connect_to_db()
     try:
-        cur = conn.cursor()
-        cur.execute("""
+        row = db.fetchone("""
             SELECT case_type, jurisdiction, case_description, statute, province FROM "cases" WHERE case_id = %s;
-        """, (case_id,))
-        row = cur.fetchone()
-        cur.close()
+        """, (case_id,), label="get_case_details", prepare=True, reader=True)
         return row if row else (None, None, None, None, None)
     except Exception as e:
         logger.error(f"Error fetching case details: {e}")
@@ -108,20 +114,89 @@ def get_case_details(case_id):
 
 
 def update_title(case_id, title):
-    conn = connect_to_db()
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE "cases" SET case_title = %s WHERE case_id = %s;
-        """, (title, case_id))
-        conn.commit()
-        cur.close()
+        with db.connection() as conn:
+            conn.execute("""
+                UPDATE "cases" SET case_title = %s WHERE case_id = %s;
+            """, (title, case_id))
     except Exception as e:
         logger.error(f"Error updating title: {e}")
-        conn.rollback()
+
+
+def insert_case(cognito_id, case_title, case_type, jurisdiction, case_desc, province, statute):
+    """
+    Create a case in a single round trip. The case_id and case_hash are generated here so the
+    row is complete on insert; the owning user is resolved from the container cache or, on a
+    miss, joined from "users" inside the same INSERT ... SELECT.
+
+    Returns (case_id, case_hash), or None if no user matches cognito_id.
+    """
+    case_id = uuid.uuid4()
+    case_hash = hash_uuid(str(case_id))
+    columns = (case_title, case_type, jurisdiction, case_desc, province, statute)
+
+    with db.connection() as conn:
+        user_id = user_id_cache.get(cognito_id)
+        if user_id is not None:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('''INSERT INTO "cases"(case_id, case_hash, user_id, case_title, case_type, jurisdiction, case_description, province, statute, status, last_updated)
+                                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,'In Progress',CURRENT_TIMESTAMP)''',
+                                (case_id, case_hash, user_id, *columns))
+                conn.commit()
+                return case_id, case_hash
+            except psycopg.errors.ForeignKeyViolation:
+                # The cached user no longer exists; fall back to resolving it from the table
+                conn.rollback()
+                user_id_cache.pop(cognito_id, None)
+
+        with conn.cursor() as cur:
+            cur.execute('''INSERT INTO "cases"(case_id, case_hash, user_id, case_title, case_type, jurisdiction, case_description, province, statute, status, last_updated)
+                           SELECT %s, %s, u.user_id, %s, %s, %s, %s, %s, %s, 'In Progress', CURRENT_TIMESTAMP
+                           FROM "users" u WHERE u.cognito_id = %s
+                           LIMIT 1
+                           RETURNING user_id''',
+                        (case_id, case_hash, *columns, cognito_id))
+            row = cur.fetchone()
+
+    if not row:
+        return None
+    user_id_cache[cognito_id] = row[0]
+    return case_id, case_hash
+
+
+def invoke_event_notification(case_id, message):
+    """
+    Queue a sendNotification mutation to AppSync so subscribers of this case are notified.
+    The case_id is published on the audioFileId field, which is the subscription key.
+    Bursts are coalesced and delivered when the handler returns.
+    """
+    notifications.notify(case_id, message, appsync_authorizer)
+
+
+def invoke_title_generation(function_arn, case_id, case_type, jurisdiction, case_desc, province):
+    """
+    Re-invoke this function asynchronously so the title is generated after the response is returned.
+    """
+    lambda_client.invoke(
+        FunctionName=function_arn,
+        InvocationType="Event",
+        Payload=json.dumps({
+            "action": GENERATE_TITLE_ACTION,
+            "case_id": str(case_id),
+            "case_type": case_type,
+            "jurisdiction": jurisdiction,
+            "case_description": case_desc,
+            "province": province,
+        }),
+    )
 
 
 def setup_guardrail(guardrail_name):
+    # Guardrail lookups page through every guardrail in the account, so reuse them per container
+    if guardrail_name in guardrail_cache:
+        return guardrail_cache[guardrail_name]
+
     bedrock_client = boto3.client("bedrock", region_name=REGION)
     paginator = bedrock_client.get_paginator('list_guardrails')
     guardrail_id = guardrail_version = None
@@ -163,6 +238,7 @@ def setup_guardrail(guardrail_name):
         )
         guardrail_version = ver_resp['version']
 
+    guardrail_cache[guardrail_name] = (guardrail_id, guardrail_version)
     return guardrail_id, guardrail_version
 
 
@@ -179,13 +255,17 @@ def _response(status, body):
     }
 
 
-def _handle_guardrail_error(resp):
+def _guardrail_message(resp):
     message = 'Input blocked by content guardrails.'
     for assessment in resp.get('assessments', []):
         if 'sensitiveInformationPolicy' in assessment:
             message = 'Please remove personal information.'
             break
-    return _response(400, {'error': message})
+    return message
+
+
+def _handle_guardrail_error(resp):
+    return _response(400, {'error': _guardrail_message(resp)})
 
 
 # def handler(event, context):
@@ -201,6 +281,20 @@ def _handle_guardrail_error(resp):
 
 
 def handler(event, context):
+    bedrock_runtime.set_deadline(context)
+    try:
+        if event.get("action") == GENERATE_TITLE_ACTION:
+            return handle_title_event(event, context)
+        if event.get("action") == GENERATE_TITLES_ACTION:
+            return handle_bulk_title_event(event, context)
+        if event.get("resource") == BULK_IMPORT_RESOURCE:
+            return handle_bulk_import(event, context)
+        return handle_new_case(event, context)
+    finally:
+        notifications.flush()
+
+
+def handle_new_case(event, context):
     try:
         cognito_id = event.get('queryStringParameters', {}).get('user_id')
         if not cognito_id:
@@ -225,55 +319,385 @@ def handler(event, context):
         if guard_resp.get('action') == 'GUARDRAIL_INTERVENED':
             return _handle_guardrail_error(guard_resp)
 
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute('SELECT user_id FROM "users" WHERE cognito_id=%s', (cognito_id,))
-        row = cur.fetchone()
-        if not row:
-            cur.close()
+        created = insert_case(cognito_id, case_title, case_type, jurisdiction, case_desc, province, statute)
+        if not created:
             return _response(404, {'error': 'User not found'})
-        user_id = row[0]
-
-        cur.execute('''INSERT INTO "cases"(user_id, case_title, case_type, jurisdiction, case_description, province, statute, status, last_updated)
-                       VALUES (%s,%s,%s,%s,%s,%s,%s,'In Progress',CURRENT_TIMESTAMP) RETURNING case_id''',
-                    (user_id, case_title, case_type, jurisdiction, case_desc, province, statute))
-        case_id = cur.fetchone()[0]
-
-        case_hash = hash_uuid(str(case_id))
-        cur.execute('UPDATE "cases" SET case_hash=%s WHERE case_id=%s', (case_hash, case_id))
-        conn.commit()
-        cur.close()
+        case_id, case_hash = created
 
+        # Title generation runs asynchronously so case creation does not wait on the LLM
         try:
-            case_title = handle_generate_title(case_id, case_type, jurisdiction, case_desc, province)
-            return _response(200, {'case_id': str(case_id), 'case_hash': case_hash, 'case_title': capitalize_title(case_title)})
+            invoke_title_generation(context.invoked_function_arn, case_id, case_type, jurisdiction, case_desc, province)
         except Exception as e:
-            logger.warning(f"Title generation failed: {e}", exc_info=True)
+            logger.warning(f"Failed to schedule title generation: {e}", exc_info=True)
             return _response(200, {
                 'case_id': str(case_id),
                 'case_hash': case_hash,
+                'case_title': case_title,
                 'warning': 'Case created but title generation failed.'
             })
 
+        return _response(200, {'case_id': str(case_id), 'case_hash': case_hash, 'case_title': case_title})
+
     except Exception as err:
         logger.error(f"Error in new_case: {err}", exc_info=True)
         return _response(500, {'error': 'Internal server error'})
 
 
-def handle_generate_title(case_id: str, case_type: str, jurisdiction: str, case_description: str, province: str) -> str:
-    initialize_constants()
+def admission_deadline(context):
+    """The time until which title generation may wait to be admitted within this invocation."""
+    return time.time() + context.get_remaining_time_in_millis() / 1000 - TITLE_ADMISSION_MARGIN_SECONDS
+
 
+def handle_title_event(event, context):
+    """
+    Async entry point: generate the title, store it and notify subscribers of the case.
+    """
+    case_id = event.get("case_id")
     try:
-        llm = get_bedrock_llm(BEDROCK_LLM_ID)
-        response = get_response(
-            case_type=case_type,
-            jurisdiction=jurisdiction,
-            case_description=case_description,
-            province=province,
-            llm=llm
+        title = handle_generate_title(
+            case_id,
+            event.get("case_type"),
+            event.get("jurisdiction"),
+            event.get("case_description"),
+            event.get("province"),
+            deadline=admission_deadline(context),
         )
+    except Exception as e:
+        logger.error(f"Async title generation failed for case {case_id}: {e}", exc_info=True)
+        return {"status": "failed", "case_id": case_id}
+
+    if title is None:
+        # The case keeps the title it was created with
+        logger.info(f"Title generation for case {case_id} shed under load")
+        return {"status": "shed", "case_id": case_id}
+
+    if APPSYNC_API_URL:
+        try:
+            invoke_event_notification(case_id, "title_generated")
+        except Exception as e:
+            logger.error(f"Error publishing title notification to AppSync: {e}")
+
+    return {"status": "completed", "case_id": case_id, "case_title": capitalize_title(title)}
+
+
+def get_cached_titles(keys):
+    """
+    Look up generated titles by cache key, checking the container cache before the database.
+    Returns a dict of key -> title for every hit.
+    """
+    hits = {k: title_cache[k] for k in keys if k in title_cache}
+    for key in hits:
+        title_cache.move_to_end(key)
+    missing = [k for k in keys if k not in hits]
+    if not missing:
+        return hits
+
+    try:
+        rows = dict(db.fetchall('''SELECT title_key, title FROM "case_title_cache"
+                                   WHERE title_key = ANY(%s) AND time_created > now() - make_interval(days => %s)''',
+                                (missing, TITLE_CACHE_TTL_DAYS), label="get_cached_titles"))
+    except Exception as e:
+        logger.error(f"Error reading title cache: {e}")
+        return hits
+
+    remember_titles(rows.items())
+    hits.update(rows)
+    return hits
+
+
+def remember_titles(entries):
+    """
+    Keep (key, title) pairs in the container cache, evicting the least recently used titles
+    beyond TITLE_CACHE_MAX_ENTRIES.
+    """
+    for key, title in entries:
+        title_cache[key] = title
+        title_cache.move_to_end(key)
+    while len(title_cache) > TITLE_CACHE_MAX_ENTRIES:
+        title_cache.popitem(last=False)
+
+
+def store_cached_titles(entries, model_id):
+    """
+    Persist generated titles as (key, title) pairs so duplicate or templated cases can reuse them.
+    A title older than TITLE_CACHE_TTL_DAYS is replaced, and each write deletes a batch of expired rows.
+    """
+    if not entries:
+        return
+    remember_titles(entries)
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany('''INSERT INTO "case_title_cache"(title_key, title, model_id)
+                                   VALUES (%s, %s, %s)
+                                   ON CONFLICT (title_key) DO UPDATE
+                                   SET title = EXCLUDED.title, model_id = EXCLUDED.model_id, time_created = now()
+                                   WHERE "case_title_cache".time_created <= now() - make_interval(days => %s)''',
+                                [(key, title, model_id, TITLE_CACHE_TTL_DAYS) for key, title in entries])
+                cur.execute('''DELETE FROM "case_title_cache" WHERE title_key IN (
+                                   SELECT title_key FROM "case_title_cache"
+                                   WHERE time_created <= now() - make_interval(days => %s) LIMIT %s)''',
+                            (TITLE_CACHE_TTL_DAYS, TITLE_CACHE_PRUNE_BATCH), label="prune_title_cache")
+    except Exception as e:
+        logger.error(f"Error writing title cache: {e}")
+
+
+def handle_generate_title(case_id: str, case_type: str, jurisdiction: str, case_description: str, province: str,
+                          deadline: float = None) -> str:
+    """
+    Generate and store the title of a case. Titles are the lowest priority use of Bedrock, so a
+    title that is not admitted by deadline (a time.time() value; at once if None) is skipped and
+    None returned.
+    """
+    initialize_constants()
+
+    try:
+        started = time.perf_counter()
+        key = title_cache_key(case_type, jurisdiction, case_description, province)
+        response = get_cached_titles([key]).get(key)
+        if response is not None:
+            emit_title_metrics(TITLE_LLM_ID, (time.perf_counter() - started) * 1000, "hit")
+        else:
+            tokens = estimate_tokens("title", case_type, jurisdiction, case_description, province)
+            if not admission.wait_for_admission(None, "title", tokens, deadline or time.time()):
+                return None
+            route = router.route("case_title", TITLE_LLM_ID, 150)
+            llm = get_bedrock_llm(route.model_id, temperature=0, max_tokens=route.max_tokens,
+                                  client=bedrock_runtime, callbacks=router.callbacks(route))
+            response = get_response(
+                case_type=case_type,
+                jurisdiction=jurisdiction,
+                case_description=case_description,
+                province=province,
+                llm=llm
+            )
+            store_cached_titles([(key, response)], route.model_id)
         update_title(case_id, capitalize_title(response))
         return response
     except Exception as e:
         logger.error(f"Error generating or updating title: {e}", exc_info=True)
         raise RuntimeError("LLM processing or DB update failed")
+
+
+def resolve_bulk_owners(conn, cognito_id, student_emails):
+    """
+    Resolve the importing instructor and any students named in the import.
+    Only students assigned to the instructor through instructor_students can own imported cases.
+
+    Returns (instructor_user_id, {student_email: user_id}).
+    """
+    with conn.cursor() as cur:
+        cur.execute('SELECT user_id FROM "users" WHERE cognito_id=%s LIMIT 1', (cognito_id,))
+        row = cur.fetchone()
+        if not row:
+            return None, {}
+        instructor_id = row[0]
+
+        students = {}
+        if student_emails:
+            cur.execute('''SELECT u.user_email, u.user_id FROM "users" u
+                           JOIN "instructor_students" s ON s.student_id = u.user_id
+                           WHERE s.instructor_id = %s AND u.user_email = ANY(%s)''',
+                        (instructor_id, list(student_emails)))
+            students = dict(cur.fetchall())
+    return instructor_id, students
+
+
+def bulk_insert_cases(conn, rows):
+    """
+    Insert all imported cases with a single COPY inside one transaction.
+
+    Args:
+        rows (list): Tuples of (case_id, case_hash, user_id, case_title, case_type, jurisdiction,
+            case_description, province, statute).
+    """
+    try:
+        with conn.cursor() as cur:
+            with cur.copy('''COPY "cases"(case_id, case_hash, user_id, case_title, case_type, jurisdiction,
+                                            case_description, province, statute, status)
+                             FROM STDIN''') as copy:
+                for row in rows:
+                    copy.write_row((*row, 'In Progress'))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def apply_bulk_guardrail(texts):
+    guardrail_id, guardrail_version = setup_guardrail('comprehensive-guardrails')
+    return bedrock_runtime.apply_guardrail(
+        guardrailIdentifier=guardrail_id,
+        guardrailVersion=guardrail_version,
+        source='INPUT',
+        content=[{'text': {'text': text, 'qualifiers': ['guard_content']}} for text in texts]
+    )
+
+
+def handle_bulk_import(event, context):
+    """
+    Import many cases at once from a JSON array or CSV body.
+
+    Rows are validated and screened by guardrails independently, accepted rows are written with
+    one COPY, and titles for rows without one are generated asynchronously with bounded
+    concurrency. The response reports the outcome of every row by its index in the payload.
+    """
+    started = time.perf_counter()
+    try:
+        cognito_id = (event.get('queryStringParameters') or {}).get('user_id')
+        if not cognito_id:
+            return _response(400, {'error': 'Missing user_id'})
+
+        headers = event.get('headers') or {}
+        content_type = headers.get('Content-Type') or headers.get('content-type')
+        try:
+            cases = parse_cases(event.get('body'), content_type)
+        except ValueError as e:
+            return _response(400, {'error': str(e)})
+
+        if not cases:
+            return _response(400, {'error': 'No cases provided'})
+        if len(cases) > MAX_BULK_CASES:
+            return _response(400, {'error': f'At most {MAX_BULK_CASES} cases can be imported per request'})
+
+        results = [{'index': i} for i in range(len(cases))]
+        candidates = []
+        for i, case in enumerate(cases):
+            error = validate_case(case)
+            if error:
+                results[i].update(status='invalid', error=error)
+            else:
+                candidates.append((i, case))
+
+        blocked = apply_guardrails_batched(candidates, apply_bulk_guardrail, BULK_GUARDRAIL_BATCH_SIZE)
+        for i, resp in blocked.items():
+            results[i].update(status='rejected', error=_guardrail_message(resp))
+
+        emails = {case['student_email'] for i, case in candidates if case.get('student_email')}
+        with db.connection() as conn:
+            instructor_id, students = resolve_bulk_owners(conn, cognito_id, emails)
+        if instructor_id is None:
+            return _response(404, {'error': 'User not found'})
+
+        rows, untitled = [], []
+        for i, case in candidates:
+            if i in blocked:
+                continue
+            owner_id = instructor_id
+            if case.get('student_email'):
+                owner_id = students.get(case['student_email'])
+                if owner_id is None:
+                    results[i].update(status='invalid', error='Student is not assigned to this instructor')
+                    continue
+
+            case_id = uuid.uuid4()
+            case_hash = hash_uuid(str(case_id))
+            rows.append((case_id, case_hash, owner_id, case.get('case_title') or PLACEHOLDER_TITLE, case['case_type'],
+                         case['jurisdiction'], case['case_description'], case['province'], case['statute']))
+            results[i].update(status='created', case_id=str(case_id), case_hash=case_hash)
+            if not case.get('case_title'):
+                untitled.append(str(case_id))
+                results[i]['title_status'] = 'pending'
+
+        if rows:
+            with db.connection() as conn:
+                bulk_insert_cases(conn, rows)
+
+        if untitled:
+            try:
+                lambda_client.invoke(
+                    FunctionName=context.invoked_function_arn,
+                    InvocationType="Event",
+                    Payload=json.dumps({"action": GENERATE_TITLES_ACTION, "case_ids": untitled}),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to schedule bulk title generation: {e}", exc_info=True)
+                for result in results:
+                    if result.get('title_status') == 'pending':
+                        result['title_status'] = 'failed'
+
+        elapsed = time.perf_counter() - started
+        cases_per_second = round(len(rows) / elapsed, 2) if elapsed > 0 else None
+        logger.info(f"Bulk import: {len(rows)} created of {len(cases)} in {elapsed:.3f}s ({cases_per_second} cases/s)")
+        return _response(200, {
+            'created': len(rows),
+            'failed': len(cases) - len(rows),
+            'elapsed_ms': round(elapsed * 1000),
+            'cases_per_second': cases_per_second,
+            'results': results,
+        })
+
+    except Exception as err:
+        logger.error(f"Error in bulk import: {err}", exc_info=True)
+        return _response(500, {'error': 'Internal server error'})
+
+
+def handle_bulk_title_event(event, context):
+    """
+    Async entry point for bulk imports: generate titles for the given cases with bounded
+    concurrency and write them back in one batch. Titles still waiting to be admitted when the
+    invocation runs short of time are skipped, leaving those cases with the placeholder title.
+    """
+    case_ids = event.get("case_ids") or []
+    if not case_ids:
+        return {"status": "completed", "titled": 0}
+
+    initialize_constants()
+    started = time.perf_counter()
+
+    cases = db.fetchall('''SELECT case_id, case_type, jurisdiction, case_description, province
+                           FROM "cases" WHERE case_id = ANY(%s::uuid[])''', (case_ids,), label="bulk_title_cases")
+
+    # Cases with the same normalized inputs share one cache key, so each key is generated once
+    keys = {case[0]: title_cache_key(*case[1:]) for case in cases}
+    cached = get_cached_titles(list(set(keys.values())))
+    pending = {}
+    for case in cases:
+        if keys[case[0]] not in cached:
+            pending.setdefault(keys[case[0]], case)
+
+    route = router.route("case_title", TITLE_LLM_ID, 150)
+    llm = get_bedrock_llm(route.model_id, temperature=0, max_tokens=route.max_tokens,
+                          client=bedrock_runtime, callbacks=router.callbacks(route))
+    deadline = admission_deadline(context)
+
+    def generate(case):
+        case_id, case_type, jurisdiction, case_description, province = case
+        try:
+            tokens = estimate_tokens("title", case_type, jurisdiction, case_description, province)
+            if not admission.wait_for_admission(None, "title", tokens, deadline):
+                return None
+            title = get_response(
+                case_type=case_type,
+                jurisdiction=jurisdiction,
+                case_description=case_description,
+                province=province,
+                llm=llm
+            )
+            return keys[case_id], title
+        except Exception as e:
+            logger.error(f"Title generation failed for case {case_id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=BULK_TITLE_CONCURRENCY) as executor:
+        generated = [t for t in executor.map(generate, pending.values()) if t]
+    store_cached_titles(generated, route.model_id)
+
+    resolved = {**cached, **dict(generated)}
+    titles = [(capitalize_title(resolved[keys[case[0]]]), case[0]) for case in cases if keys[case[0]] in resolved]
+    logger.info(f"Bulk titles: {len(cached)} cache hits, {len(generated)} generated, "
+                f"{len(pending) - len(generated)} failed or shed")
+
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany('UPDATE "cases" SET case_title = %s WHERE case_id = %s', titles)
+    except Exception as e:
+        logger.error(f"Error updating bulk titles: {e}")
+        return {"status": "failed", "titled": 0}
+
+    elapsed = time.perf_counter() - started
+    titles_per_second = round(len(titles) / elapsed, 2) if elapsed > 0 else None
+    logger.info(f"Bulk titles: {len(titles)} of {len(case_ids)} in {elapsed:.3f}s "
+                f"({titles_per_second} titles/s, concurrency {BULK_TITLE_CONCURRENCY})")
+    return {"status": "completed", "titled": len(titles)}
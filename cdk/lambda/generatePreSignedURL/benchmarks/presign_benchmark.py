@@ -0,0 +1,72 @@
+"""
+Benchmark presigning N audio files with N single requests against one batch request.
+
+Presigning is a local signing operation, so this runs offline with placeholder credentials.
+It measures handler time only; in Lambda each single request additionally pays invocation
+and API Gateway overhead, which the batch pays once.
+
+Usage:
+    python benchmarks/presign_benchmark.py [files_per_request ...]   (default: 1 10 100)
+"""
+import os
+import sys
+import json
+import time
+import uuid
+
+os.environ.setdefault("BUCKET", "benchmark-audio-bucket")
+os.environ.setdefault("REGION", "ca-central-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "AKIABENCHMARK")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generatePreSignedURL import lambda_handler  # noqa: E402
+
+REPEAT = 20
+
+
+class Context:
+    function_name = "benchmark"
+    memory_limit_in_mb = 128
+    invoked_function_arn = "arn:aws:lambda:ca-central-1:000000000000:function:benchmark"
+    aws_request_id = "benchmark"
+
+
+def files(count):
+    return [{"audio_file_id": str(uuid.uuid4()), "file_name": f"interview-{i}", "file_type": "wav"}
+            for i in range(count)]
+
+
+def single_requests(entries):
+    for entry in entries:
+        response = lambda_handler({"httpMethod": "GET", "queryStringParameters": entry}, Context())
+        assert response["statusCode"] == 200
+
+
+def batch_request(entries):
+    response = lambda_handler({"httpMethod": "POST", "body": json.dumps({"files": entries})}, Context())
+    assert response["statusCode"] == 200 and json.loads(response["body"])["failed"] == 0
+
+
+def best_of(fn, entries):
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(entries)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(counts):
+    print(f"{'files':>6} {'single requests':>18} {'batch request':>16} {'batch files/s':>14}")
+    for count in counts:
+        entries = files(count)
+        single = best_of(single_requests, entries)
+        batch = best_of(batch_request, entries)
+        print(f"{count:>6} {single * 1000:>14.2f} ms {batch * 1000:>13.2f} ms {count / batch:>14.0f}")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [1, 10, 100])
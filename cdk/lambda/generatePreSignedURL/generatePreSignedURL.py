@@ -1,4 +1,4 @@
-import os, json
+import os, json, math
 import boto3
 from botocore.config import Config
 from aws_lambda_powertools import Logger
@@ -15,6 +15,37 @@ s3 = boto3.client(
 )
 logger = Logger()
 
+MULTIPART_RESOURCE = "/student/multipart_upload"
+
+# Allowed audio file types for Amazon Transcribe with their corresponding MIME types
+ALLOWED_AUDIO_TYPES = {
+    "mp3": "audio/mpeg",
+    "mp4": "audio/mp4",
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "amr": "audio/amr",
+    "ogg": "audio/ogg",
+    "webm": "audio/webm",
+    "m4a": "audio/m4a"
+}
+
+# S3 multipart limits: parts of at least 5 MiB (except the last) and at most 10,000 parts
+MIN_PART_SIZE = 8 * 1024 * 1024
+MAX_PARTS = 10000
+MAX_FILE_SIZE = 5 * 1024 ** 4
+# Largest number of files presigned in one batch request
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "100"))
+
+# Part URLs outlive the single-PUT URL so slow connections can finish every part
+PART_URL_EXPIRY = int(os.environ.get("PART_URL_EXPIRY", "3600"))
+
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+}
+
 def s3_key_exists(bucket, key):
     try:
         s3.head_object(Bucket=bucket, Key=key)
@@ -22,81 +53,223 @@ def s3_key_exists(bucket, key):
     except:
         return False
 
-@logger.inject_lambda_context(log_event=True)
-def lambda_handler(event, context):
-    # Use .get() to safely extract query string parameters
-    query_params = event.get("queryStringParameters", {})
+def build_response(status_code, body):
+    return {"statusCode": status_code, "headers": CORS_HEADERS, "body": json.dumps(body)}
 
-    if not query_params:
-        return {
-            'statusCode': 400,
-            'body': json.dumps('Missing queries to generate pre-signed URL')
-        }
 
-    audio_file_id = query_params.get("audio_file_id", "")
-    file_type = query_params.get("file_type", "").lower()
-    file_name = query_params.get("file_name", "")
+def validate_upload(params):
+    """
+    Validate the parameters of one audio file and return (key, content_type, None),
+    or (None, None, error_message) if they are invalid.
+    """
+    audio_file_id = str(params.get("audio_file_id") or "")
+    file_type = str(params.get("file_type") or "").lower()
+    file_name = str(params.get("file_name") or "")
 
     if not audio_file_id:
-        return {
-            'statusCode': 400,
-            'body': json.dumps('Missing required parameter: audio_file_id')
-        }
-
+        return None, None, 'Missing required parameter: audio_file_id'
     if not file_name:
-        return {
-            'statusCode': 400,
-            'body': json.dumps('Missing required parameter: file_name')
-        }
+        return None, None, 'Missing required parameter: file_name'
+    if file_type not in ALLOWED_AUDIO_TYPES:
+        return None, None, f'Unsupported audio file type. Allowed types: {", ".join(ALLOWED_AUDIO_TYPES.keys())}'
 
-    # Allowed audio file types for Amazon Transcribe with their corresponding MIME types
-    allowed_audio_types = {
-        "mp3": "audio/mpeg",
-        "mp4": "audio/mp4",
-        "wav": "audio/wav",
-        "flac": "audio/flac",
-        "amr": "audio/amr",
-        "ogg": "audio/ogg",
-        "webm": "audio/webm",
-        "m4a": "audio/m4a"
-    }
-
-    if file_type not in allowed_audio_types:
-        return {
-            'statusCode': 400,
-            'body': json.dumps(f'Unsupported audio file type. Allowed types: {", ".join(allowed_audio_types.keys())}')
-        }
+    return f"{audio_file_id}/{file_name}.{file_type}", ALLOWED_AUDIO_TYPES[file_type], None
+
+
+def resolve_upload_key(query_params):
+    """
+    Validate the audio file parameters and return (key, content_type, None),
+    or (None, None, error_response) if they are invalid.
+    """
+    key, content_type, error = validate_upload(query_params)
+    if error:
+        return None, None, build_response(400, error)
+    return key, content_type, None
 
-    # Modified key path to remove the "audio" subdirectory
-    key = f"{audio_file_id}/{file_name}.{file_type}"
-    content_type = allowed_audio_types[file_type]
 
+def presign_put(key, content_type):
+    return s3.generate_presigned_url(
+        ClientMethod="put_object",
+        Params={
+            "Bucket": BUCKET,
+            "Key": key,
+            "ContentType": content_type,
+        },
+        ExpiresIn=300,
+        HttpMethod="PUT",
+    )
+
+
+def handle_batch(event):
+    """
+    Presign uploads for several audio files in one request. The body is a JSON list (or
+    {"files": [...]}) of {audio_file_id, file_name, file_type} entries; each entry is validated on
+    its own, so one bad entry returns an error in its slot without failing the others.
+    """
     try:
-        presigned_url = s3.generate_presigned_url(
-            ClientMethod="put_object",
-            Params={
-                "Bucket": BUCKET,
-                "Key": key,
-                "ContentType": content_type,
-            },
-            ExpiresIn=300,
-            HttpMethod="PUT",
-        )
+        files = json.loads(event.get("body") or "[]")
+    except json.JSONDecodeError:
+        return build_response(400, 'Request body must be JSON')
+    if isinstance(files, dict):
+        files = files.get("files")
+    if not isinstance(files, list) or not files:
+        return build_response(400, 'Expected a non-empty list of files')
+    if len(files) > MAX_BATCH_FILES:
+        return build_response(400, f'At most {MAX_BATCH_FILES} files can be presigned per request')
+
+    results = []
+    for entry in files:
+        if not isinstance(entry, dict):
+            results.append({"error": "Each file must be an object"})
+            continue
+        key, content_type, error = validate_upload(entry)
+        if error:
+            results.append({"audio_file_id": entry.get("audio_file_id"), "error": error})
+            continue
+        try:
+            results.append({"audio_file_id": entry["audio_file_id"], "presignedurl": presign_put(key, content_type)})
+        except Exception as e:
+            logger.error(f"Error generating presigned URL for {key}: {e}")
+            results.append({"audio_file_id": entry["audio_file_id"], "error": "Internal server error"})
+
+    failed = sum(1 for r in results if "error" in r)
+    logger.info(f"Presigned {len(results) - failed} of {len(results)} files")
+    return build_response(200, {"files": results, "succeeded": len(results) - failed, "failed": failed})
+
+
+def plan_parts(file_size):
+    """
+    Return (part_size, part_count) for a file, using MIN_PART_SIZE parts unless the file
+    needs larger ones to stay within MAX_PARTS. Part sizes are whole MiB.
+    """
+    mib = 1024 * 1024
+    part_size = max(MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS / mib) * mib)
+    return part_size, max(1, math.ceil(file_size / part_size))
+
 
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Headers": "*",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "*",
-            },
-            "body": json.dumps({"presignedurl": presigned_url}),
+def presign_parts(key, upload_id, part_numbers):
+    return [
+        {
+            "partNumber": part_number,
+            "url": s3.generate_presigned_url(
+                ClientMethod="upload_part",
+                Params={"Bucket": BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                ExpiresIn=PART_URL_EXPIRY,
+                HttpMethod="PUT",
+            ),
         }
+        for part_number in part_numbers
+    ]
 
+
+def list_uploaded_parts(key, upload_id):
+    parts = []
+    for page in s3.get_paginator("list_parts").paginate(Bucket=BUCKET, Key=key, UploadId=upload_id):
+        parts.extend(
+            {"partNumber": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]}
+            for p in page.get("Parts", [])
+        )
+    return parts
+
+
+def handle_multipart(event):
+    """
+    Multipart upload flow for large recordings, so the browser can upload parts in parallel and
+    resume after a failure instead of restarting:
+      - POST initiates an upload and returns presigned URLs for every part, sized from file_size.
+      - GET lists the parts already uploaded, with fresh URLs for the missing ones when file_size is given.
+      - PUT completes the upload from the body's parts (or the uploaded parts if none are given).
+      - DELETE aborts the upload and discards its parts.
+    """
+    method = event.get("httpMethod")
+    query_params = event.get("queryStringParameters") or {}
+    key, content_type, error = resolve_upload_key(query_params)
+    if error:
+        return error
+
+    upload_id = query_params.get("upload_id")
+    if method != "POST" and not upload_id:
+        return build_response(400, 'Missing required parameter: upload_id')
+
+    file_size = query_params.get("file_size")
+    if file_size is not None:
+        try:
+            file_size = int(file_size)
+        except ValueError:
+            return build_response(400, 'file_size must be an integer number of bytes')
+        if not 0 < file_size <= MAX_FILE_SIZE:
+            return build_response(400, 'file_size is out of range')
+
+    try:
+        if method == "POST":
+            if file_size is None:
+                return build_response(400, 'Missing required parameter: file_size')
+            part_size, part_count = plan_parts(file_size)
+            upload = s3.create_multipart_upload(Bucket=BUCKET, Key=key, ContentType=content_type)
+            logger.info(f"Initiated multipart upload of {key}: {part_count} parts of {part_size} bytes")
+            return build_response(200, {
+                "uploadId": upload["UploadId"],
+                "key": key,
+                "partSize": part_size,
+                "parts": presign_parts(key, upload["UploadId"], range(1, part_count + 1)),
+            })
+
+        if method == "GET":
+            uploaded = list_uploaded_parts(key, upload_id)
+            body = {"uploadId": upload_id, "key": key, "uploadedParts": uploaded}
+            if file_size is not None:
+                part_size, part_count = plan_parts(file_size)
+                done = {p["partNumber"] for p in uploaded}
+                body["partSize"] = part_size
+                body["parts"] = presign_parts(key, upload_id, [n for n in range(1, part_count + 1) if n not in done])
+            return build_response(200, body)
+
+        if method == "PUT":
+            body = json.loads(event.get("body") or "{}")
+            parts = body.get("parts") or list_uploaded_parts(key, upload_id)
+            s3.complete_multipart_upload(
+                Bucket=BUCKET,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(
+                    ({"PartNumber": int(p["partNumber"]), "ETag": p["etag"]} for p in parts),
+                    key=lambda p: p["PartNumber"],
+                )},
+            )
+            logger.info(f"Completed multipart upload of {key} with {len(parts)} parts")
+            return build_response(200, {"key": key, "status": "completed"})
+
+        if method == "DELETE":
+            s3.abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+            logger.info(f"Aborted multipart upload of {key}")
+            return build_response(200, {"key": key, "status": "aborted"})
+
+        return build_response(405, f'Unsupported method: {method}')
+
+    except s3.exceptions.NoSuchUpload:
+        return build_response(404, 'Upload not found')
+    except Exception as e:
+        logger.error(f"Error handling multipart upload of {key}: {e}")
+        return build_response(500, 'Internal server error')
+
+
+@logger.inject_lambda_context(log_event=True)
+def lambda_handler(event, context):
+    if event.get("resource") == MULTIPART_RESOURCE:
+        return handle_multipart(event)
+    if event.get("httpMethod") == "POST":
+        return handle_batch(event)
+
+    query_params = event.get("queryStringParameters") or {}
+    if not query_params:
+        return build_response(400, 'Missing queries to generate pre-signed URL')
+
+    key, content_type, error = resolve_upload_key(query_params)
+    if error:
+        return error
+
+    try:
+        return build_response(200, {"presignedurl": presign_put(key, content_type)})
     except Exception as e:
         logger.error(f"Error generating presigned URL: {e}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps('Internal server error')
-        }
\ No newline at end of file
+        return build_response(500, 'Internal server error')
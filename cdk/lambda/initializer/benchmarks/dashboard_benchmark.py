@@ -0,0 +1,249 @@
+"""
+Benchmark instructor dashboard queries and check the trigger-maintained student_case_stats.
+
+Applies the migrations to a scratch schema of a local Postgres and seeds it with instructors,
+students, cases, summaries and messages. It then times three ways of building one instructor's
+dashboard:
+- fan-out: the student list, then per-student count queries, as the dashboard is assembled today
+- live aggregate: one query joining and counting the base tables
+- stats table: the GET /instructor/dashboard query over student_case_stats
+
+It also checks that the trigger-maintained counts match a full rebuild, both after seeding and
+after a mix of updates and deletes, and measures the trigger overhead on inserts.
+
+Usage:
+    python benchmarks/dashboard_benchmark.py [dsn]   (default: $DATABASE_URL)
+"""
+import os
+import sys
+import time
+import random
+import statistics
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from migrate import apply_migrations  # noqa: E402
+
+SCRATCH_SCHEMA = "dashboard_benchmark"
+
+INSTRUCTORS = 1000
+STUDENTS_PER_INSTRUCTOR = 10
+CASES = 50000
+SUMMARIES_PER_CASE = 2
+MESSAGES_PER_CASE = 2
+DASHBOARDS = 200
+
+SEED_SQL = f"""
+    INSERT INTO "users" ("cognito_id", "user_email", "first_name", "last_name", "roles")
+    SELECT 'instructor-' || g, 'instructor' || g || '@example.com', 'Instructor', g::text, ARRAY['instructor']
+    FROM generate_series(1, {INSTRUCTORS}) g;
+
+    INSERT INTO "users" ("cognito_id", "user_email", "first_name", "last_name", "roles")
+    SELECT 'student-' || g, 'student' || g || '@example.com', 'Student', g::text, ARRAY['student']
+    FROM generate_series(1, {INSTRUCTORS * STUDENTS_PER_INSTRUCTOR}) g;
+
+    INSERT INTO "instructor_students" ("instructor_id", "student_id")
+    SELECT i.user_id, s.user_id
+    FROM generate_series(1, {INSTRUCTORS * STUDENTS_PER_INSTRUCTOR}) g
+    JOIN "users" s ON s.cognito_id = 'student-' || g
+    JOIN "users" i ON i.cognito_id = 'instructor-' || ((g - 1) / {STUDENTS_PER_INSTRUCTOR} + 1);
+
+    INSERT INTO "cases" ("case_hash", "case_title", "user_id", "status", "last_updated")
+    SELECT md5(g::text), 'Case ' || g, s.user_id,
+           (ARRAY['In progress', 'In Progress', 'Sent to Review', 'Review Feedback', 'Archived'])[1 + g % 5],
+           now() - (g % 1000) * interval '1 hour'
+    FROM generate_series(1, {CASES}) g
+    JOIN "users" s ON s.cognito_id = 'student-' || (1 + g % {INSTRUCTORS * STUDENTS_PER_INSTRUCTOR});
+
+    INSERT INTO "summaries" ("case_id", "content", "is_read", "time_created")
+    SELECT c.case_id, 'Summary', random() < 0.6, now() - g * interval '1 hour'
+    FROM "cases" c, generate_series(1, {SUMMARIES_PER_CASE}) g;
+
+    INSERT INTO "messages" ("case_id", "message_content", "is_read", "time_sent")
+    SELECT c.case_id, 'Feedback', random() < 0.6, now() - g * interval '1 hour'
+    FROM "cases" c, generate_series(1, {MESSAGES_PER_CASE}) g;
+"""
+
+STATS_COLUMNS = ["cases_total", "cases_in_progress", "cases_sent_to_review", "cases_review_feedback",
+                 "cases_archived", "unread_summaries", "unread_messages"]
+
+STATS_DASHBOARD = """
+    SELECT u.user_id, u.first_name, u.last_name, s.*
+    FROM "users" i
+    JOIN "instructor_students" l ON l.instructor_id = i.user_id
+    JOIN "users" u ON u.user_id = l.student_id
+    LEFT JOIN "student_case_stats" s ON s.student_id = l.student_id
+    WHERE i.cognito_id = %s
+    ORDER BY s.last_updated DESC NULLS LAST;
+"""
+
+LIVE_DASHBOARD = """
+    SELECT u.user_id, u.first_name, u.last_name,
+           count(DISTINCT c.case_id),
+           count(DISTINCT c.case_id) FILTER (WHERE case_status_bucket(c.status) = 'in_progress'),
+           count(DISTINCT c.case_id) FILTER (WHERE case_status_bucket(c.status) = 'sent_to_review'),
+           count(DISTINCT c.case_id) FILTER (WHERE case_status_bucket(c.status) = 'review_feedback'),
+           count(DISTINCT c.case_id) FILTER (WHERE case_status_bucket(c.status) = 'archived'),
+           (SELECT count(*) FROM "summaries" sm JOIN "cases" sc ON sc.case_id = sm.case_id
+            WHERE sc.user_id = u.user_id AND NOT sm.is_read),
+           (SELECT count(*) FROM "messages" m JOIN "cases" mc ON mc.case_id = m.case_id
+            WHERE mc.user_id = u.user_id AND NOT m.is_read),
+           max(c.last_updated)
+    FROM "users" i
+    JOIN "instructor_students" l ON l.instructor_id = i.user_id
+    JOIN "users" u ON u.user_id = l.student_id
+    LEFT JOIN "cases" c ON c.user_id = u.user_id
+    WHERE i.cognito_id = %s
+    GROUP BY u.user_id;
+"""
+
+
+def fan_out_dashboard(cursor, cognito_id):
+    cursor.execute('SELECT user_id FROM "users" WHERE cognito_id = %s;', (cognito_id,))
+    instructor_id = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT u.user_id, u.first_name, u.last_name FROM "instructor_students" i
+        JOIN "users" u ON i.student_id = u.user_id WHERE i.instructor_id = %s;
+    """, (instructor_id,))
+    rows = []
+    for student_id, first_name, last_name in cursor.fetchall():
+        cursor.execute('SELECT status, count(*), max(last_updated) FROM "cases" WHERE user_id = %s GROUP BY status;',
+                       (student_id,))
+        by_status = cursor.fetchall()
+        cursor.execute("""
+            SELECT count(*) FROM "summaries" s JOIN "cases" c ON c.case_id = s.case_id
+            WHERE c.user_id = %s AND NOT s.is_read;
+        """, (student_id,))
+        unread_summaries = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT count(*) FROM "messages" m JOIN "cases" c ON c.case_id = m.case_id
+            WHERE c.user_id = %s AND NOT m.is_read;
+        """, (student_id,))
+        rows.append((student_id, first_name, last_name, by_status, unread_summaries, cursor.fetchone()[0]))
+    return rows
+
+
+def timed(fn, instructors):
+    latencies = []
+    for cognito_id in instructors:
+        started = time.perf_counter()
+        fn(cognito_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def stats_snapshot(cursor):
+    cursor.execute(f'SELECT student_id, {", ".join(STATS_COLUMNS)} FROM "student_case_stats" '
+                   f'WHERE {" OR ".join(c + " <> 0" for c in STATS_COLUMNS)} ORDER BY student_id;')
+    return cursor.fetchall()
+
+
+def check_against_rebuild(connection, cursor, label):
+    maintained = stats_snapshot(cursor)
+    cursor.execute("SAVEPOINT rebuild;")
+    cursor.execute("SELECT refresh_student_case_stats();")
+    rebuilt = stats_snapshot(cursor)
+    cursor.execute("ROLLBACK TO SAVEPOINT rebuild;")
+    connection.commit()
+    assert maintained == rebuilt, f"{label}: trigger-maintained stats differ from a full rebuild"
+    print(f"{label}: trigger-maintained stats match a full rebuild ({len(rebuilt)} students)")
+
+
+def mutate(connection, cursor, rng):
+    cursor.execute('SELECT case_id FROM "cases" ORDER BY random() LIMIT 2000;')
+    case_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT user_id FROM "users" WHERE cognito_id LIKE %s ORDER BY random() LIMIT 50;', ("student-%",))
+    students = [row[0] for row in cursor.fetchall()]
+    statuses = ["In Progress", "Sent to Review", "Review Feedback", "Archived", "Closed"]
+
+    for case_id in case_ids[:500]:
+        cursor.execute('UPDATE "cases" SET status = %s, last_updated = now() WHERE case_id = %s;',
+                       (rng.choice(statuses), case_id))
+    for case_id in case_ids[500:900]:
+        cursor.execute('UPDATE "messages" SET is_read = NOT is_read WHERE case_id = %s;', (case_id,))
+        cursor.execute('UPDATE "summaries" SET is_read = true WHERE case_id = %s;', (case_id,))
+    for case_id in case_ids[900:1100]:
+        cursor.execute('INSERT INTO "messages" (case_id, message_content) VALUES (%s, %s);', (case_id, "New"))
+        cursor.execute('INSERT INTO "summaries" (case_id, content) VALUES (%s, %s);', (case_id, "New"))
+    for case_id in case_ids[1100:1300]:
+        cursor.execute('UPDATE "cases" SET user_id = %s WHERE case_id = %s;', (rng.choice(students), case_id))
+    for case_id in case_ids[1300:1600]:
+        cursor.execute('DELETE FROM "cases" WHERE case_id = %s;', (case_id,))
+    for case_id in case_ids[1600:1800]:
+        cursor.execute('DELETE FROM "messages" WHERE message_id IN '
+                       '(SELECT message_id FROM "messages" WHERE case_id = %s LIMIT 1);', (case_id,))
+    cursor.execute('DELETE FROM "users" WHERE user_id = ANY(%s::uuid[]);', (students[:10],))
+    connection.commit()
+
+
+def insert_overhead(connection, cursor, case_ids):
+    def insert_messages():
+        started = time.perf_counter()
+        for case_id in case_ids:
+            cursor.execute('INSERT INTO "messages" (case_id, message_content) VALUES (%s, %s);', (case_id, "Bench"))
+        connection.commit()
+        return (time.perf_counter() - started) * 1e6 / len(case_ids)
+
+    with_trigger = insert_messages()
+    cursor.execute('ALTER TABLE "messages" DISABLE TRIGGER "messages_stats";')
+    without_trigger = insert_messages()
+    cursor.execute('ALTER TABLE "messages" ENABLE TRIGGER "messages_stats";')
+    connection.commit()
+    print(f"message insert: {without_trigger:.0f} us without the stats trigger, {with_trigger:.0f} us with it")
+
+
+def main(dsn):
+    connection = psycopg2.connect(dsn)
+    cursor = connection.cursor()
+    cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+    cursor.execute(f'CREATE SCHEMA "{SCRATCH_SCHEMA}";')
+    cursor.execute(f'SET search_path TO "{SCRATCH_SCHEMA}", public;')
+    connection.commit()
+    try:
+        apply_migrations(connection)
+        started = time.perf_counter()
+        cursor.execute(SEED_SQL)
+        connection.commit()
+        cursor.execute("ANALYZE;")
+        connection.commit()
+        print(f"seeded {INSTRUCTORS} instructors, {INSTRUCTORS * STUDENTS_PER_INSTRUCTOR} students, "
+              f"{CASES} cases in {time.perf_counter() - started:.1f}s (triggers on)")
+
+        check_against_rebuild(connection, cursor, "after seeding")
+
+        rng = random.Random(7)
+        instructors = [f"instructor-{rng.randint(1, INSTRUCTORS)}" for _ in range(DASHBOARDS)]
+
+        def stats_dashboard(cognito_id):
+            cursor.execute(STATS_DASHBOARD, (cognito_id,))
+            return cursor.fetchall()
+
+        def live_dashboard(cognito_id):
+            cursor.execute(LIVE_DASHBOARD, (cognito_id,))
+            return cursor.fetchall()
+
+        print(f"{'dashboard query':<18} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, fn in [("fan-out", lambda c: fan_out_dashboard(cursor, c)),
+                         ("live aggregate", live_dashboard), ("stats table", stats_dashboard)]:
+            fn(instructors[0])
+            p50, p95 = timed(fn, instructors)
+            print(f"{name:<18} {p50:>8.2f} {p95:>8.2f}")
+        connection.commit()
+
+        mutate(connection, cursor, rng)
+        check_against_rebuild(connection, cursor, "after updates and deletes")
+
+        cursor.execute('SELECT case_id FROM "cases" LIMIT 5000;')
+        insert_overhead(connection, cursor, [row[0] for row in cursor.fetchall()])
+    finally:
+        connection.rollback()
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+        connection.commit()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.environ["DATABASE_URL"])
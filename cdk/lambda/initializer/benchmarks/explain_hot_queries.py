@@ -0,0 +1,140 @@
+"""
+Query-plan regression check for the hot lookups.
+
+Applies the migrations to a scratch schema of a local Postgres, seeds it with enough rows that
+the planner prefers an index where one is usable, and runs EXPLAIN on every hot query. Exits non-zero if any of them plans a sequential scan of a table.
+
+Usage:
+    python benchmarks/explain_hot_queries.py [dsn]   (default: $DATABASE_URL)
+
+The database needs the uuid-ossp extension available; the scratch schema is dropped afterwards.
+"""
+import os
+import sys
+import json
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from migrate import apply_migrations  # noqa: E402
+
+SCRATCH_SCHEMA = "explain_check"
+
+USERS = 5000
+CASES_PER_USER = 4
+MESSAGES_PER_CASE = 5
+SUMMARIES_PER_CASE = 3
+AUDIO_FILES_PER_CASE = 2
+SYSTEM_PROMPTS = 2000
+
+SEED_SQL = f"""
+    INSERT INTO "users" ("cognito_id", "user_email", "username", "roles")
+    SELECT 'cognito-' || g, 'user' || g || '@example.com', 'user' || g, ARRAY['student']
+    FROM generate_series(1, {USERS}) g;
+
+    INSERT INTO "cases" ("case_hash", "case_title", "user_id", "case_description")
+    SELECT md5(u.user_id::text || g), 'Case ' || g, u.user_id, 'Seeded case'
+    FROM "users" u, generate_series(1, {CASES_PER_USER}) g;
+
+    INSERT INTO "messages" ("message_content", "case_id", "time_sent")
+    SELECT 'Feedback ' || g, c.case_id, now() - g * interval '1 hour'
+    FROM "cases" c, generate_series(1, {MESSAGES_PER_CASE}) g;
+
+    INSERT INTO "summaries" ("case_id", "content", "time_created")
+    SELECT c.case_id, 'Summary ' || g, now() - g * interval '1 day'
+    FROM "cases" c, generate_series(1, {SUMMARIES_PER_CASE}) g;
+
+    INSERT INTO "audio_files" ("case_id", "file_title", "audio_text", "timestamp")
+    SELECT c.case_id, 'Interview ' || g, 'Transcript', now() - g * interval '1 day'
+    FROM "cases" c, generate_series(1, {AUDIO_FILES_PER_CASE}) g;
+
+    INSERT INTO "system_prompt" ("prompt", "time_created")
+    SELECT 'Prompt ' || g, now() - g * interval '1 minute'
+    FROM generate_series(1, {SYSTEM_PROMPTS}) g;
+"""
+
+# The hot queries as the handlers run them, with a seeded row standing in for each parameter
+HOT_QUERIES = {
+    "user by cognito_id": """
+        SELECT user_id FROM "users" WHERE cognito_id = 'cognito-42';
+    """,
+    "cases of a user": """
+        SELECT * FROM "cases"
+        WHERE user_id = (SELECT user_id FROM "users" WHERE cognito_id = 'cognito-42');
+    """,
+    "messages of a case": """
+        SELECT m.message_content, m.time_sent, u.first_name, u.last_name
+        FROM "messages" m
+        LEFT JOIN "users" u ON m.instructor_id = u.user_id
+        WHERE m.case_id = (SELECT case_id FROM "cases" LIMIT 1);
+    """,
+    "summaries of a case": """
+        SELECT * FROM "summaries"
+        WHERE case_id = (SELECT case_id FROM "cases" LIMIT 1)
+        ORDER BY time_created;
+    """,
+    "audio files of a case": """
+        SELECT audio_file_id, file_title, timestamp FROM "audio_files"
+        WHERE case_id = (SELECT case_id FROM "cases" LIMIT 1)
+        ORDER BY timestamp DESC;
+    """,
+    "latest system prompt": """
+        SELECT prompt FROM system_prompt ORDER BY time_created DESC LIMIT 1;
+    """,
+}
+
+
+def seq_scans(plan):
+    """
+    Yield the relations a plan reads with a sequential scan. Scans feeding a LIMIT 1 subquery
+    that only picks a sample row are not part of the query under test and are skipped.
+    """
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        if child.get("Parent Relationship") == "InitPlan" and child["Node Type"] == "Limit":
+            continue
+        yield from seq_scans(child)
+
+
+def main(dsn):
+    connection = psycopg2.connect(dsn)
+    cursor = connection.cursor()
+    failures = 0
+    try:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+        cursor.execute(f'CREATE SCHEMA "{SCRATCH_SCHEMA}";')
+        cursor.execute(f'SET search_path TO "{SCRATCH_SCHEMA}", public;')
+        connection.commit()
+        apply_migrations(connection)
+        cursor.execute(SEED_SQL)
+        connection.commit()
+
+        connection.autocommit = True
+        cursor.execute("ANALYZE;")
+        for name, query in HOT_QUERIES.items():
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+            plan = cursor.fetchone()[0][0]["Plan"]
+            scanned = sorted(set(seq_scans(plan)))
+            if scanned:
+                failures += 1
+                print(f"FAIL  {name}: sequential scan of {', '.join(scanned)}")
+                print(json.dumps(plan, indent=2))
+            else:
+                print(f"ok    {name}")
+    finally:
+        connection.rollback()
+        connection.autocommit = True
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+        cursor.close()
+        connection.close()
+
+    if failures:
+        print(f"{failures} of {len(HOT_QUERIES)} hot queries plan a sequential scan")
+        sys.exit(1)
+    print(f"All {len(HOT_QUERIES)} hot queries use an index")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.environ["DATABASE_URL"])
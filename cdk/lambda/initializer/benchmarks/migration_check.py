@@ -0,0 +1,137 @@
+"""
+Exercise the migration runner against a local Postgres.
+
+Builds a scratch schema the way the old initializer left databases (tables created, foreign keys
+added on two deploys, an index build that failed half way), then runs the migrations from two
+connections at once, and checks that:
+- exactly one run applies each migration
+- the duplicate foreign keys and the invalid index are gone
+- a later run is a no-op
+
+Usage:
+    python benchmarks/migration_check.py [dsn]   (default: $DATABASE_URL)
+"""
+import os
+import sys
+import threading
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from migrate import MIGRATIONS_DIR, apply_migrations, check_schema, load_migrations  # noqa: E402
+
+SCRATCH_SCHEMA = "migration_check"
+
+TABLES = ["users", "messages", "system_prompt", "instructor_students", "cases", "summaries",
+          "audio_files", "case_title_cache", "disclaimers", "schema_migrations"]
+
+# What every deploy of the old initializer ran after creating the tables
+LEGACY_FOREIGN_KEYS = """
+    ALTER TABLE "messages" ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "messages" ADD FOREIGN KEY ("instructor_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "cases" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "summaries" ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "disclaimers" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "instructor_students" ADD FOREIGN KEY ("instructor_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "instructor_students" ADD FOREIGN KEY ("student_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE "audio_files" ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
+"""
+
+
+def connect(dsn):
+    connection = psycopg2.connect(dsn)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SET search_path TO "{SCRATCH_SCHEMA}", public;')
+    connection.commit()
+    return connection
+
+
+def foreign_key_count(cursor):
+    cursor.execute("SELECT count(*) FROM pg_constraint WHERE contype = 'f' AND connamespace = %s::regnamespace;",
+                   (SCRATCH_SCHEMA,))
+    return cursor.fetchone()[0]
+
+
+def build_legacy_schema(connection):
+    cursor = connection.cursor()
+    with open(os.path.join(MIGRATIONS_DIR, "0001_create_tables.sql"), encoding="utf-8") as f:
+        cursor.execute(f.read())
+    cursor.execute(LEGACY_FOREIGN_KEYS)
+    cursor.execute(LEGACY_FOREIGN_KEYS)
+    cursor.execute("""INSERT INTO "users" ("cognito_id") VALUES ('duplicate'), ('duplicate');""")
+    connection.commit()
+
+    # A unique build over duplicate values fails and leaves an INVALID index under the hot index name
+    connection.autocommit = True
+    try:
+        cursor.execute('CREATE UNIQUE INDEX CONCURRENTLY "users_cognito_id_idx" ON "users" ("cognito_id");')
+    except psycopg2.errors.UniqueViolation:
+        pass
+    connection.autocommit = False
+    print(f"legacy schema: {foreign_key_count(cursor)} foreign keys, "
+          f"problems: {check_schema(connection, TABLES[:-1])}")
+    cursor.close()
+
+
+def main(dsn):
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    admin_cursor = admin.cursor()
+    admin_cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+    admin_cursor.execute(f'CREATE SCHEMA "{SCRATCH_SCHEMA}";')
+    connections = []
+    try:
+        connections.append(connect(dsn))
+        build_legacy_schema(connections[-1])
+
+        # Two deploys racing each other
+        results, errors = [], []
+
+        def deploy():
+            connection = connect(dsn)
+            try:
+                results.append(apply_migrations(connection))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deploy) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+
+        applied = sorted(version for run in results for version, _, _ in run)
+        expected = sorted(version for version, *_ in load_migrations())
+        assert applied == expected, f"migrations applied {applied}, expected each of {expected} once"
+
+        connection = connect(dsn)
+        connections.append(connection)
+        cursor = connection.cursor()
+        problems = check_schema(connection, TABLES)
+        assert not problems, problems
+        # The eight legacy keys, deduplicated, and the owner of each case archive
+        assert foreign_key_count(cursor) == 9, foreign_key_count(cursor)
+        cursor.execute("""
+            SELECT i.indisunique FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'users_cognito_id_idx' AND c.relnamespace = %s::regnamespace;
+        """, (SCRATCH_SCHEMA,))
+        assert cursor.fetchone() == (False,), "invalid index was not rebuilt"
+        cursor.execute('SELECT "version", "name", "duration_ms" FROM "schema_migrations" ORDER BY "version";')
+        for version, name, duration_ms in cursor.fetchall():
+            print(f"{version:04d}_{name}: {duration_ms} ms")
+
+        assert apply_migrations(connection) == [], "a second run applied migrations"
+        print("Migrations applied once, legacy duplicates cleaned up, reruns are no-ops")
+    finally:
+        for connection in connections:
+            connection.close()
+        admin_cursor.execute(f'DROP SCHEMA IF EXISTS "{SCRATCH_SCHEMA}" CASCADE;')
+        admin.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.environ["DATABASE_URL"])
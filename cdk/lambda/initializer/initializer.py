@@ -5,11 +5,29 @@ import psycopg2
 from psycopg2.extensions import AsIs
 import secrets
 
+from migrate import apply_migrations, check_schema
+
 DB_SECRET_NAME = os.environ["DB_SECRET_NAME"]
 DB_USER_SECRET_NAME = os.environ["DB_USER_SECRET_NAME"]
 DB_PROXY = os.environ["DB_PROXY"]
 print(psycopg2.__version__)
 
+# Tables the application expects after all migrations have run
+EXPECTED_TABLES = [
+    "users",
+    "messages",
+    "system_prompt",
+    "instructor_students",
+    "cases",
+    "summaries",
+    "audio_files",
+    "case_title_cache",
+    "disclaimers",
+    "student_case_stats",
+    "case_archives",
+    "schema_migrations",
+]
+
 # Global Secret Manager Client to avoid recreating multiple times
 sm_client = boto3.client("secretsmanager")
 
@@ -46,116 +64,13 @@ def handler(event, context):
         ## Create tables and schema
         ##
 
-        # Create tables based on the schema
-        sqlTableCreation = """
-            CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
-
-            CREATE TABLE IF NOT EXISTS "users" (
-                "user_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "cognito_id" varchar,
-                "user_email" varchar UNIQUE,
-                "username" varchar,
-                "first_name" varchar,
-                "last_name" varchar,
-                "time_account_created" timestamp,
-                "roles" varchar[],
-                "last_sign_in" timestamp DEFAULT now(),
-                "activity_counter" integer DEFAULT 0,
-                "last_activity" timestamp DEFAULT now(),
-                "accepted_disclaimer" boolean DEFAULT false
-            );
-
-            CREATE TABLE IF NOT EXISTS "messages" (
-                "message_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "instructor_id" uuid,
-                "message_content" text,
-                "case_id" uuid,
-                "time_sent" timestamp DEFAULT now(),
-                "is_read" boolean DEFAULT false
-            );
-
-            CREATE TABLE IF NOT EXISTS "system_prompt" (
-                "system_prompt_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "prompt" text,
-                "time_created" timestamp DEFAULT now()
-            );
-
-            CREATE TABLE IF NOT EXISTS "instructor_students" (
-                "instructor_id" uuid NOT NULL,
-                "student_id" uuid NOT NULL,
-                PRIMARY KEY ("instructor_id", "student_id")
-            );
-
-            CREATE TABLE IF NOT EXISTS "cases" (
-                "case_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "case_hash" varchar UNIQUE,
-                "case_title" varchar,
-                "case_type" varchar,
-                "user_id" uuid,
-                "jurisdiction" varchar[],
-                "case_description" text,
-                "province" varchar DEFAULT 'N/A',
-                "statute" varchar DEFAULT 'N/A',
-                "status" varchar DEFAULT 'In progress',
-                "last_updated" timestamp DEFAULT now(),
-                "last_viewed" timestamp DEFAULT now(),
-                "time_submitted" timestamp DEFAULT null,
-                "time_reviewed" timestamp DEFAULT null,
-                "sent_to_review" boolean,
-                "student_notes" text DEFAULT ''
-            );
-
-            CREATE TABLE IF NOT EXISTS "summaries" (
-                "summary_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "case_id" uuid,
-                "content" text,
-                "time_created" timestamp DEFAULT now(),
-                "is_read" boolean DEFAULT false
-            );
-
-            CREATE TABLE IF NOT EXISTS "audio_files" (
-                "audio_file_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "case_id" uuid,
-                "file_title" varchar,
-                "audio_text" text,
-                "s3_file_path" text,
-                timestamp timestamp DEFAULT now()
-            );
-
-            CREATE TABLE disclaimers (
-                "disclaimer_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
-                "disclaimer_text" TEXT NOT NULL,
-                "last_updated" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                "user_id" uuid 
-            );
-
-
-            -- Add foreign key constraints
-
-            ALTER TABLE "messages" ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
-            ALTER TABLE "messages" ADD FOREIGN KEY ("instructor_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
-            ALTER TABLE "cases" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
-            ALTER TABLE "summaries" ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
-            ALTER TABLE "disclaimers" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
-
-            ALTER TABLE "instructor_students" 
-            ADD FOREIGN KEY ("instructor_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
-
-            ALTER TABLE "instructor_students" 
-            ADD FOREIGN KEY ("student_id") REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE;
-
-            ALTER TABLE "audio_files" 
-            ADD FOREIGN KEY ("case_id") REFERENCES "cases" ("case_id") ON DELETE CASCADE ON UPDATE CASCADE;
-        """
+        # Apply the versioned migrations in migrations/ that have not run yet
+        apply_migrations(connection)
 
         #
         ## Create users with limited permissions on RDS
         ##
 
-        # Execute table creation
-        cursor.execute(sqlTableCreation)
-        connection.commit()
-
         # Generate 16 bytes username and password randomly
         username = secrets.token_hex(8)
         password = secrets.token_hex(16)
@@ -237,51 +152,10 @@ def handler(event, context):
         dbSecret.update(authInfo)
         sm_client.put_secret_value(SecretId=DB_USER_SECRET_NAME, SecretString=json.dumps(dbSecret))
 
-        # Print sample queries to validate data
-        sample_queries = [
-            'SELECT * FROM "users";',
-            'SELECT * FROM "instructor_students";',
-            'SELECT * FROM "messages";',
-            'SELECT * FROM "cases";',
-            'SELECT * FROM "summaries";',
-            'SELECT * FROM "system_prompt";',
-        ]
-
-        for query in sample_queries:
-            cursor.execute(query)
-            print(cursor.fetchall())
-
-        default_prompt = """
-        You are a helpful assistant for a law student. Respond with kindness and clarity, but be concise and skip conversational fluff. Use second person when referring to the student. You will be given context about legal cases the student is interviewing clients for. Your task is to:
-
-        Provide structured legal analysis from a Canadian legal perspective.
-
-        Identify key legal issues, relevant defences, and strategies the student should consider.
-
-        Highlight applicable laws and cite sources or legal sections where relevant.
-
-        Mention any legal implications or concepts the student may have missed.
-
-        Suggest follow-up questions the student should ask the client to help clarify or advance the case (these are for the student, not for the client to ask a lawyer).
-
-        Do not hallucinate. If you don’t know something, say so or ask for more info (without violating privacy). Accuracy is critical.
-
-        Purpose: Your goal is to help the student think critically about what legal/factual issues to investigate or research. Don’t try to “solve” the case—just provide helpful insights, legal frameworks, and next steps.
-
-        Examples:
-
-        In an assault case, discuss elements like force, intent, consent, and harm. Include possible defences (e.g. self-defence, consent), intoxication relevance, and key facts (e.g. who started it, level of force).
-
-        In a family law case, note rights of spouses/children, emergency court applications, and relevant community resources.
-
-        [End of examples. Student will now provide case context.]
-        """.strip()
-
-        cursor.execute(
-            'INSERT INTO "system_prompt" ("prompt") VALUES (%s);',
-            (default_prompt,)
-        )
-        connection.commit()
+        # Validate the schema from the catalogs rather than dumping table contents
+        problems = check_schema(connection, EXPECTED_TABLES)
+        for problem in problems:
+            print(f"Schema check failed: {problem}")
 
         # Close cursor and connection
         cursor.close()
@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import hashlib
+
+# Migrations are NNNN_description.sql files applied in version order
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Files starting with this line run statement by statement outside a transaction, which
+# CREATE INDEX CONCURRENTLY and similar online operations require
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# Any constant shared by every deploy; concurrent runs wait on this session advisory lock
+ADVISORY_LOCK_KEY = 7235081946
+LOCK_TIMEOUT_SECONDS = 240
+LOCK_POLL_SECONDS = 2
+
+CONCURRENT_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+"?(\w+)"?', re.IGNORECASE
+)
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS "schema_migrations" (
+        "version" integer PRIMARY KEY,
+        "name" varchar NOT NULL,
+        "checksum" varchar NOT NULL,
+        "applied_at" timestamp DEFAULT now(),
+        "duration_ms" integer
+    );
+"""
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Read the migration files in a directory.
+
+    Returns:
+        list: (version, name, sql, checksum) tuples sorted by version.
+    """
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            sql = f.read()
+        checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        migrations.append((int(match.group(1)), match.group(2), sql, checksum))
+
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    """
+    Split a no-transaction migration into statements. Statements end with a semicolon at the end
+    of a line; these files hold plain DDL, so there are no function bodies to account for.
+    """
+    statements, current = [], []
+    for line in sql.splitlines():
+        if not current and (not line.strip() or line.strip().startswith("--")):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current))
+            current = []
+    if current:
+        statements.append("\n".join(current))
+    return statements
+
+
+def acquire_lock(cursor):
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while True:
+        cursor.execute("SELECT pg_try_advisory_lock(%s);", (ADVISORY_LOCK_KEY,))
+        if cursor.fetchone()[0]:
+            return
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Timed out waiting for the migration lock after {LOCK_TIMEOUT_SECONDS}s")
+        print("Another deploy is migrating the database, waiting for the lock")
+        time.sleep(LOCK_POLL_SECONDS)
+
+
+def drop_invalid_index(cursor, statement):
+    """
+    A concurrent index build that was interrupted leaves an INVALID index that IF NOT EXISTS
+    would skip; drop it so the statement builds it again.
+    """
+    match = CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    cursor.execute(
+        """
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = %s AND NOT i.indisvalid;
+        """,
+        (match.group(1),)
+    )
+    if cursor.fetchone():
+        print(f"Dropping invalid index {match.group(1)}")
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{match.group(1)}";')
+
+
+def apply_migration(connection, cursor, version, name, sql, checksum):
+    started = time.perf_counter()
+    if sql.startswith(NO_TRANSACTION):
+        # Each statement commits on its own, so every statement must be safe to run again
+        # in case the migration is interrupted before it is recorded
+        connection.autocommit = True
+        try:
+            for statement in split_statements(sql):
+                drop_invalid_index(cursor, statement)
+                statement_started = time.perf_counter()
+                cursor.execute(statement)
+                print(f"  {statement.splitlines()[0][:100]} ({time.perf_counter() - statement_started:.2f}s)")
+        finally:
+            connection.autocommit = False
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        cursor.execute(
+            'INSERT INTO "schema_migrations" ("version", "name", "checksum", "duration_ms") VALUES (%s, %s, %s, %s);',
+            (version, name, checksum, duration_ms)
+        )
+        connection.commit()
+    else:
+        try:
+            cursor.execute(sql)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            cursor.execute(
+                'INSERT INTO "schema_migrations" ("version", "name", "checksum", "duration_ms") VALUES (%s, %s, %s, %s);',
+                (version, name, checksum, duration_ms)
+            )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    print(f"Applied migration {version:04d}_{name} in {duration_ms} ms")
+    return duration_ms
+
+
+def apply_migrations(connection, directory=MIGRATIONS_DIR):
+    """
+    Apply every migration that has not been applied yet, in version order.
+
+    A session advisory lock serializes concurrent deploys; whoever waits sees the other run's
+    migrations as applied once it gets the lock. Migrations run in a transaction together with
+    their schema_migrations row unless the file opts out with the no-transaction marker.
+    Any transaction already open on the connection is committed.
+
+    Returns:
+        list: (version, name, duration_ms) of the migrations applied by this run.
+    """
+    migrations = load_migrations(directory)
+    if connection.autocommit:
+        connection.autocommit = False
+    cursor = connection.cursor()
+    applied = []
+    try:
+        acquire_lock(cursor)
+        connection.commit()
+        try:
+            cursor.execute(SCHEMA_MIGRATIONS_DDL)
+            cursor.execute('SELECT "version", "checksum" FROM "schema_migrations";')
+            done = dict(cursor.fetchall())
+            connection.commit()
+
+            for version, name, sql, checksum in migrations:
+                if version in done:
+                    if done[version] != checksum:
+                        print(f"Warning: migration {version:04d}_{name} changed after it was applied")
+                    continue
+                applied.append((version, name, apply_migration(connection, cursor, version, name, sql, checksum)))
+        finally:
+            connection.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+            connection.commit()
+    finally:
+        cursor.close()
+
+    if not applied:
+        print("Schema is up to date")
+    return applied
+
+
+def check_schema(connection, tables):
+    """
+    Validate the schema from the system catalogs instead of reading table contents.
+
+    Checks that every expected table exists, that no foreign key is declared twice and that no
+    index was left INVALID by a failed concurrent build. Row counts are the planner's estimates,
+    so the check costs the same however large the tables are.
+
+    Returns:
+        list: Descriptions of the problems found; empty if the schema is healthy.
+    """
+    cursor = connection.cursor()
+    problems = []
+    try:
+        cursor.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p') AND c.relname = ANY(%s);
+            """,
+            (list(tables),)
+        )
+        estimates = dict(cursor.fetchall())
+        for table in tables:
+            if table not in estimates:
+                problems.append(f"missing table {table}")
+            else:
+                # reltuples is -1 until the table is first vacuumed or analyzed
+                print(f"{table}: ~{max(estimates[table], 0)} rows")
+
+        cursor.execute(
+            """
+            SELECT conrelid::regclass::text, pg_get_constraintdef(oid), count(*)
+            FROM pg_constraint
+            WHERE contype = 'f' AND connamespace = current_schema()::regnamespace
+            GROUP BY conrelid, pg_get_constraintdef(oid)
+            HAVING count(*) > 1;
+            """
+        )
+        for table, definition, count in cursor.fetchall():
+            problems.append(f"{count} copies of foreign key on {table}: {definition}")
+
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND NOT i.indisvalid;
+            """
+        )
+        for (index,) in cursor.fetchall():
+            problems.append(f"invalid index {index}")
+        connection.commit()
+    finally:
+        cursor.close()
+    return problems
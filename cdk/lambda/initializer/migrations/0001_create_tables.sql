@@ -0,0 +1,95 @@
+-- Base schema. Every statement is guarded so this also applies cleanly to databases
+-- created by the initializer before migrations were versioned.
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE TABLE IF NOT EXISTS "users" (
+    "user_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "cognito_id" varchar,
+    "user_email" varchar UNIQUE,
+    "username" varchar,
+    "first_name" varchar,
+    "last_name" varchar,
+    "time_account_created" timestamp,
+    "roles" varchar[],
+    "last_sign_in" timestamp DEFAULT now(),
+    "activity_counter" integer DEFAULT 0,
+    "last_activity" timestamp DEFAULT now(),
+    "accepted_disclaimer" boolean DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS "messages" (
+    "message_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "instructor_id" uuid,
+    "message_content" text,
+    "case_id" uuid,
+    "time_sent" timestamp DEFAULT now(),
+    "is_read" boolean DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS "system_prompt" (
+    "system_prompt_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "prompt" text,
+    "time_created" timestamp DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS "instructor_students" (
+    "instructor_id" uuid NOT NULL,
+    "student_id" uuid NOT NULL,
+    PRIMARY KEY ("instructor_id", "student_id")
+);
+
+CREATE TABLE IF NOT EXISTS "cases" (
+    "case_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "case_hash" varchar UNIQUE,
+    "case_title" varchar,
+    "case_type" varchar,
+    "user_id" uuid,
+    "jurisdiction" varchar[],
+    "case_description" text,
+    "province" varchar DEFAULT 'N/A',
+    "statute" varchar DEFAULT 'N/A',
+    "status" varchar DEFAULT 'In progress',
+    "last_updated" timestamp DEFAULT now(),
+    "last_viewed" timestamp DEFAULT now(),
+    "time_submitted" timestamp DEFAULT null,
+    "time_reviewed" timestamp DEFAULT null,
+    "sent_to_review" boolean,
+    "student_notes" text DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS "summaries" (
+    "summary_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "case_id" uuid,
+    "content" text,
+    "time_created" timestamp DEFAULT now(),
+    "is_read" boolean DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS "audio_files" (
+    "audio_file_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "case_id" uuid,
+    "file_title" varchar,
+    "audio_text" text,
+    "s3_file_path" text,
+    timestamp timestamp DEFAULT now(),
+    "transcription_status" varchar,
+    "transcription_job" varchar,
+    "transcription_started" timestamp,
+    "audio_text_s3_key" varchar,
+    "audio_text_size" integer
+);
+
+CREATE TABLE IF NOT EXISTS "case_title_cache" (
+    "title_key" varchar PRIMARY KEY,
+    "title" varchar,
+    "model_id" varchar,
+    "time_created" timestamp DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS "disclaimers" (
+    "disclaimer_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "disclaimer_text" TEXT NOT NULL,
+    "last_updated" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    "user_id" uuid
+);
@@ -0,0 +1,46 @@
+-- Foreign keys, one per column. The initializer used to add every key again on each deploy,
+-- leaving duplicate constraints that are all checked on every write; those are dropped here
+-- and the oldest constraint on each column is kept.
+
+DO $$
+DECLARE
+    fk record;
+    existing oid[];
+BEGIN
+    FOR fk IN
+        SELECT * FROM (VALUES
+            ('messages', 'case_id', 'cases', 'case_id'),
+            ('messages', 'instructor_id', 'users', 'user_id'),
+            ('cases', 'user_id', 'users', 'user_id'),
+            ('summaries', 'case_id', 'cases', 'case_id'),
+            ('disclaimers', 'user_id', 'users', 'user_id'),
+            ('instructor_students', 'instructor_id', 'users', 'user_id'),
+            ('instructor_students', 'student_id', 'users', 'user_id'),
+            ('audio_files', 'case_id', 'cases', 'case_id')
+        ) AS t (tbl, col, ref_tbl, ref_col)
+    LOOP
+        SELECT array_agg(c.oid ORDER BY c.oid) INTO existing
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f'
+          AND c.conrelid = format('%I', fk.tbl)::regclass
+          AND c.confrelid = format('%I', fk.ref_tbl)::regclass
+          AND array_length(c.conkey, 1) = 1
+          AND a.attname = fk.col;
+
+        IF existing IS NULL THEN
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I FOREIGN KEY (%I) REFERENCES %I (%I) ON DELETE CASCADE ON UPDATE CASCADE',
+                fk.tbl, fk.tbl || '_' || fk.col || '_fkey', fk.col, fk.ref_tbl, fk.ref_col
+            );
+        ELSE
+            FOR i IN 2 .. array_length(existing, 1) LOOP
+                EXECUTE format(
+                    'ALTER TABLE %I DROP CONSTRAINT %I',
+                    fk.tbl, (SELECT conname FROM pg_constraint WHERE oid = existing[i])
+                );
+            END LOOP;
+        END IF;
+    END LOOP;
+END
+$$;
@@ -0,0 +1,6 @@
+-- Transcription state, recorded so each audio file is transcribed once
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "transcription_status" varchar;
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "transcription_job" varchar;
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "transcription_started" timestamp;
+UPDATE "audio_files" SET "transcription_status" = 'COMPLETED'
+WHERE "transcription_status" IS NULL AND "audio_text" IS NOT NULL;
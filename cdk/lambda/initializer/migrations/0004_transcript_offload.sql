@@ -0,0 +1,3 @@
+-- Large transcripts are offloaded to S3; the row keeps the object key and uncompressed size
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "audio_text_s3_key" varchar;
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "audio_text_size" integer;
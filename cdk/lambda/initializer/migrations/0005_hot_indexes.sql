@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- Lookup indexes for the queries every request runs, built without blocking writes.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "users_cognito_id_idx" ON "users" ("cognito_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "cases_user_id_idx" ON "cases" ("user_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "messages_case_id_idx" ON "messages" ("case_id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "summaries_case_id_time_created_idx" ON "summaries" ("case_id", "time_created");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "audio_files_case_id_timestamp_idx" ON "audio_files" ("case_id", "timestamp" DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "system_prompt_time_created_idx" ON "system_prompt" ("time_created" DESC);
@@ -0,0 +1,191 @@
+-- Per-student dashboard aggregates, kept current by triggers on cases, summaries and messages.
+-- Triggers only add deltas, which commute, so concurrent writers never overwrite each other's
+-- counts. Instructor dashboards read one row per student instead of counting their cases.
+
+CREATE TABLE IF NOT EXISTS "student_case_stats" (
+    "student_id" uuid PRIMARY KEY,
+    "cases_total" integer NOT NULL DEFAULT 0,
+    "cases_in_progress" integer NOT NULL DEFAULT 0,
+    "cases_sent_to_review" integer NOT NULL DEFAULT 0,
+    "cases_review_feedback" integer NOT NULL DEFAULT 0,
+    "cases_archived" integer NOT NULL DEFAULT 0,
+    "unread_summaries" integer NOT NULL DEFAULT 0,
+    "unread_messages" integer NOT NULL DEFAULT 0,
+    "last_updated" timestamp
+);
+
+-- Case statuses are written with inconsistent capitalization ('In progress', 'In Progress')
+CREATE OR REPLACE FUNCTION case_status_bucket(status varchar) RETURNS text AS $$
+    SELECT CASE lower(status)
+        WHEN 'in progress' THEN 'in_progress'
+        WHEN 'sent to review' THEN 'sent_to_review'
+        WHEN 'review feedback' THEN 'review_feedback'
+        WHEN 'archived' THEN 'archived'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION bump_student_case_stats(
+    student uuid, status varchar, cases integer,
+    summaries integer, messages integer, touched timestamp
+) RETURNS void AS $$
+DECLARE
+    bucket text := case_status_bucket(status);
+BEGIN
+    IF student IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO "student_case_stats" AS s (
+        "student_id", "cases_total", "cases_in_progress", "cases_sent_to_review",
+        "cases_review_feedback", "cases_archived", "unread_summaries", "unread_messages", "last_updated"
+    ) VALUES (
+        student, cases,
+        CASE WHEN bucket = 'in_progress' THEN cases ELSE 0 END,
+        CASE WHEN bucket = 'sent_to_review' THEN cases ELSE 0 END,
+        CASE WHEN bucket = 'review_feedback' THEN cases ELSE 0 END,
+        CASE WHEN bucket = 'archived' THEN cases ELSE 0 END,
+        summaries, messages, touched
+    )
+    ON CONFLICT ("student_id") DO UPDATE SET
+        "cases_total" = s."cases_total" + EXCLUDED."cases_total",
+        "cases_in_progress" = s."cases_in_progress" + EXCLUDED."cases_in_progress",
+        "cases_sent_to_review" = s."cases_sent_to_review" + EXCLUDED."cases_sent_to_review",
+        "cases_review_feedback" = s."cases_review_feedback" + EXCLUDED."cases_review_feedback",
+        "cases_archived" = s."cases_archived" + EXCLUDED."cases_archived",
+        "unread_summaries" = s."unread_summaries" + EXCLUDED."unread_summaries",
+        "unread_messages" = s."unread_messages" + EXCLUDED."unread_messages",
+        "last_updated" = GREATEST(s."last_updated", EXCLUDED."last_updated");
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cases_stats_trigger() RETURNS trigger AS $$
+DECLARE
+    unread_summaries integer;
+    unread_messages integer;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF TG_OP = 'DELETE' OR NEW."user_id" IS DISTINCT FROM OLD."user_id" THEN
+            -- Unread summaries and messages follow their case. This runs before the delete,
+            -- while the rows that cascade with the case can still be counted.
+            SELECT count(*) INTO unread_summaries FROM "summaries"
+            WHERE "case_id" = OLD."case_id" AND NOT "is_read";
+            SELECT count(*) INTO unread_messages FROM "messages"
+            WHERE "case_id" = OLD."case_id" AND NOT "is_read";
+            PERFORM bump_student_case_stats(OLD."user_id", OLD."status", -1, -unread_summaries, -unread_messages, NULL);
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            PERFORM bump_student_case_stats(NEW."user_id", NEW."status", 1, unread_summaries, unread_messages, NEW."last_updated");
+        ELSIF case_status_bucket(NEW."status") IS DISTINCT FROM case_status_bucket(OLD."status") THEN
+            PERFORM bump_student_case_stats(OLD."user_id", OLD."status", -1, 0, 0, NULL);
+            PERFORM bump_student_case_stats(NEW."user_id", NEW."status", 1, 0, 0, NEW."last_updated");
+        ELSIF NEW."last_updated" IS DISTINCT FROM OLD."last_updated" THEN
+            PERFORM bump_student_case_stats(NEW."user_id", NEW."status", 0, 0, 0, NEW."last_updated");
+        END IF;
+        RETURN NEW;
+    END IF;
+    PERFORM bump_student_case_stats(NEW."user_id", NEW."status", 1, 0, 0, NEW."last_updated");
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Shared by summaries and messages: both have case_id and is_read
+CREATE OR REPLACE FUNCTION unread_stats_trigger() RETURNS trigger AS $$
+DECLARE
+    old_unread integer := 0;
+    new_unread integer := 0;
+    old_student uuid;
+    new_student uuid;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND NOT OLD."is_read" THEN
+        old_unread := 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NOT NEW."is_read" THEN
+        new_unread := 1;
+    END IF;
+    IF TG_OP = 'UPDATE' AND old_unread = new_unread AND NEW."case_id" IS NOT DISTINCT FROM OLD."case_id" THEN
+        RETURN NEW;
+    END IF;
+
+    -- A case deleted in the same statement is no longer found; its trigger already moved the counts
+    IF old_unread = 1 THEN
+        SELECT "user_id" INTO old_student FROM "cases" WHERE "case_id" = OLD."case_id";
+        IF TG_TABLE_NAME = 'summaries' THEN
+            PERFORM bump_student_case_stats(old_student, NULL, 0, -1, 0, NULL);
+        ELSE
+            PERFORM bump_student_case_stats(old_student, NULL, 0, 0, -1, NULL);
+        END IF;
+    END IF;
+    IF new_unread = 1 THEN
+        SELECT "user_id" INTO new_student FROM "cases" WHERE "case_id" = NEW."case_id";
+        IF TG_TABLE_NAME = 'summaries' THEN
+            PERFORM bump_student_case_stats(new_student, NULL, 0, 1, 0, NEW."time_created");
+        ELSE
+            PERFORM bump_student_case_stats(new_student, NULL, 0, 0, 1, NEW."time_sent");
+        END IF;
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "cases_stats" ON "cases";
+CREATE TRIGGER "cases_stats"
+    BEFORE INSERT OR UPDATE OR DELETE ON "cases"
+    FOR EACH ROW EXECUTE FUNCTION cases_stats_trigger();
+
+-- Runs after the cascade has deleted the user's cases, which left a row of zeroes behind
+CREATE OR REPLACE FUNCTION users_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM "student_case_stats" WHERE "student_id" = OLD."user_id";
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "users_stats" ON "users";
+CREATE TRIGGER "users_stats"
+    AFTER DELETE ON "users"
+    FOR EACH ROW EXECUTE FUNCTION users_stats_trigger();
+
+DROP TRIGGER IF EXISTS "summaries_stats" ON "summaries";
+CREATE TRIGGER "summaries_stats"
+    AFTER INSERT OR UPDATE OF "is_read", "case_id" OR DELETE ON "summaries"
+    FOR EACH ROW EXECUTE FUNCTION unread_stats_trigger();
+
+DROP TRIGGER IF EXISTS "messages_stats" ON "messages";
+CREATE TRIGGER "messages_stats"
+    AFTER INSERT OR UPDATE OF "is_read", "case_id" OR DELETE ON "messages"
+    FOR EACH ROW EXECUTE FUNCTION unread_stats_trigger();
+
+-- Full rebuild from the base tables: the backfill below, and a repair if the counts ever drift
+CREATE OR REPLACE FUNCTION refresh_student_case_stats() RETURNS void AS $$
+BEGIN
+    LOCK TABLE "student_case_stats" IN EXCLUSIVE MODE;
+    DELETE FROM "student_case_stats";
+    INSERT INTO "student_case_stats" (
+        "student_id", "cases_total", "cases_in_progress", "cases_sent_to_review",
+        "cases_review_feedback", "cases_archived", "unread_summaries", "unread_messages", "last_updated"
+    )
+    SELECT
+        c."user_id",
+        count(*),
+        count(*) FILTER (WHERE case_status_bucket(c."status") = 'in_progress'),
+        count(*) FILTER (WHERE case_status_bucket(c."status") = 'sent_to_review'),
+        count(*) FILTER (WHERE case_status_bucket(c."status") = 'review_feedback'),
+        count(*) FILTER (WHERE case_status_bucket(c."status") = 'archived'),
+        COALESCE(sum(s.unread), 0),
+        COALESCE(sum(m.unread), 0),
+        GREATEST(max(c."last_updated"), max(s.latest), max(m.latest))
+    FROM "cases" c
+    JOIN "users" u ON u."user_id" = c."user_id"
+    LEFT JOIN (
+        SELECT "case_id", count(*) FILTER (WHERE NOT "is_read") AS unread, max("time_created") FILTER (WHERE NOT "is_read") AS latest
+        FROM "summaries" GROUP BY "case_id"
+    ) s ON s."case_id" = c."case_id"
+    LEFT JOIN (
+        SELECT "case_id", count(*) FILTER (WHERE NOT "is_read") AS unread, max("time_sent") FILTER (WHERE NOT "is_read") AS latest
+        FROM "messages" GROUP BY "case_id"
+    ) m ON m."case_id" = c."case_id"
+    GROUP BY c."user_id";
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_student_case_stats();
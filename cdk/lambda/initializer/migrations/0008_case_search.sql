@@ -0,0 +1,53 @@
+-- Full-text search over cases and their transcripts. Vectors are stored columns kept current by
+-- triggers, so searches read the GIN index instead of parsing text per row.
+
+ALTER TABLE "cases" ADD COLUMN IF NOT EXISTS "search_vector" tsvector;
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "search_vector" tsvector;
+
+-- Titles rank above descriptions, descriptions above the student's notes
+CREATE OR REPLACE FUNCTION case_search_vector(title varchar, description text, notes text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(notes, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Bounded so a very long transcript cannot exceed the 1 MB tsvector limit
+CREATE OR REPLACE FUNCTION transcript_search_vector(transcript text) RETURNS tsvector AS $$
+    SELECT to_tsvector('english', left(transcript, 1000000));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION cases_search_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW."search_vector" := case_search_vector(NEW."case_title", NEW."case_description", NEW."student_notes");
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Inline transcripts are indexed here. Transcripts offloaded to S3 have no audio_text; the
+-- transcription function writes their search_vector itself, and this leaves it untouched.
+CREATE OR REPLACE FUNCTION audio_files_search_trigger() RETURNS trigger AS $$
+BEGIN
+    IF NEW."audio_text" IS NOT NULL THEN
+        NEW."search_vector" := transcript_search_vector(NEW."audio_text");
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "cases_search" ON "cases";
+CREATE TRIGGER "cases_search"
+    BEFORE INSERT OR UPDATE OF "case_title", "case_description", "student_notes" ON "cases"
+    FOR EACH ROW EXECUTE FUNCTION cases_search_trigger();
+
+DROP TRIGGER IF EXISTS "audio_files_search" ON "audio_files";
+CREATE TRIGGER "audio_files_search"
+    BEFORE INSERT OR UPDATE OF "audio_text" ON "audio_files"
+    FOR EACH ROW EXECUTE FUNCTION audio_files_search_trigger();
+
+UPDATE "cases"
+SET "search_vector" = case_search_vector("case_title", "case_description", "student_notes")
+WHERE "search_vector" IS NULL;
+
+UPDATE "audio_files"
+SET "search_vector" = transcript_search_vector("audio_text")
+WHERE "search_vector" IS NULL AND "audio_text" IS NOT NULL;
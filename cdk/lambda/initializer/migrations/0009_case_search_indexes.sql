@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- GIN indexes for the search vectors, built without blocking writes.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "cases_search_vector_idx" ON "cases" USING gin ("search_vector");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "audio_files_search_vector_idx" ON "audio_files" USING gin ("search_vector");
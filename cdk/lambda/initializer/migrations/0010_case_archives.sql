@@ -0,0 +1,24 @@
+-- Closed cases are moved out of the hot tables into gzip-compressed JSON archives in S3, one
+-- object per case under a prefix for its academic term. This catalog keeps one small row per
+-- archived case so students can list their archives and restore one on demand. Archived cases
+-- leave "cases", so they are also no longer counted in "student_case_stats".
+
+CREATE TABLE IF NOT EXISTS "case_archives" (
+    "case_id" uuid PRIMARY KEY,
+    "user_id" uuid NOT NULL REFERENCES "users" ("user_id") ON DELETE CASCADE ON UPDATE CASCADE,
+    "case_title" varchar,
+    "case_type" varchar,
+    "status" varchar,
+    "term" varchar NOT NULL,
+    "last_updated" timestamp,
+    "archive_s3_key" varchar NOT NULL,
+    "archive_size" integer,
+    "archived_at" timestamp DEFAULT now(),
+    -- Set once the chat history in DynamoDB has been given its expiry
+    "history_expires_at" timestamp
+);
+
+CREATE INDEX IF NOT EXISTS "case_archives_user_id_idx" ON "case_archives" ("user_id", "last_updated" DESC);
+
+CREATE INDEX IF NOT EXISTS "case_archives_history_pending_idx" ON "case_archives" ("archived_at")
+    WHERE "history_expires_at" IS NULL;
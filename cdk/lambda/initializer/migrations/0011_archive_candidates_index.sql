@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- Lets the archival job find closed cases past the retention period without scanning "cases".
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "cases_archive_candidates_idx" ON "cases" ("last_updated")
+    WHERE lower("status") = 'archived';
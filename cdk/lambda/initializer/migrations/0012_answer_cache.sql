@@ -0,0 +1,28 @@
+-- Answers to general legal questions, reused for near-identical questions from other cases.
+-- Entries are scoped by the jurisdiction, province and statute of the case they were answered
+-- for, and by a version hashing the system prompt and models, so a changed prompt or model never
+-- serves an old answer. Entries expire at "expires_at".
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS "answer_cache" (
+    "answer_id" uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+    "jurisdiction" varchar NOT NULL,
+    "province" varchar NOT NULL,
+    "statute" varchar NOT NULL,
+    "version" varchar NOT NULL,
+    "question" text NOT NULL,
+    -- Untyped so a change of embedding model, which changes the version, needs no migration
+    "embedding" vector NOT NULL,
+    "answer" text NOT NULL,
+    -- Time the answer took to generate, reported as the latency saved by each hit
+    "generation_ms" integer,
+    "created_at" timestamp DEFAULT now(),
+    "expires_at" timestamp NOT NULL
+);
+
+-- Lookups compare a question with every live entry of its scope, which stays small
+CREATE INDEX IF NOT EXISTS "answer_cache_scope_idx"
+    ON "answer_cache" ("jurisdiction", "province", "statute", "version", "expires_at");
+
+CREATE INDEX IF NOT EXISTS "answer_cache_expires_at_idx" ON "answer_cache" ("expires_at");
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- Lets the case generation function prune title cache entries past their TTL without scanning
+-- "case_title_cache".
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "case_title_cache_time_created_idx" ON "case_title_cache" ("time_created");
@@ -0,0 +1,3 @@
+-- Segments stitched into the stored transcript of a segmented transcription, so a partial
+-- transcript is never replaced by one that covers fewer segments
+ALTER TABLE "audio_files" ADD COLUMN IF NOT EXISTS "stitched_segments" integer;
@@ -0,0 +1,163 @@
+// Benchmark searchCases() against a seeded local Postgres.
+//
+// Applies the initializer migrations to a scratch schema, seeds 1k instructors with 10 students
+// each, 100k cases and 20k transcripts, then times student- and instructor-scoped searches for
+// rare and common terms and phrases, paging through every result to check that the cursors
+// return each match exactly once. Fails if a p95 is over the latency target.
+//
+// Usage:
+//   NODE_PATH=<dir containing postgres> node benchmarks/search_benchmark.js [connection url]
+//   (default: $DATABASE_URL, otherwise the PGHOST/PGUSER/... environment variables)
+
+const fs = require("fs");
+const path = require("path");
+const postgres = require("postgres");
+const { searchCases } = require("../caseSearch.js");
+
+const SCRATCH_SCHEMA = "search_benchmark";
+const MIGRATIONS_DIR = path.join(__dirname, "..", "..", "initializer", "migrations");
+
+const INSTRUCTORS = 1000;
+const STUDENTS_PER_INSTRUCTOR = 10;
+const CASES = 100000;
+const TRANSCRIPTS = 20000;
+const SEARCHES = 200;
+const TARGET_P95_MS = 50;
+
+const WORDS = `tenant landlord eviction notice lease deposit rent arrears repair hearing tribunal
+  assault consent injury witness police statement bail custody sentence appeal
+  employer dismissal wages overtime contract breach severance harassment discrimination
+  custody access support spouse separation divorce property pension mediation
+  immigration refugee visa permit deportation detention sponsor interview
+  debt creditor collection bankruptcy garnishment loan interest judgment
+  negligence damages insurance accident vehicle liability claim settlement
+  theft fraud mischief charge plea disclosure trial evidence defence crown
+  the a of to and in for on with was said client told asked about after before`
+  .split(/\s+/)
+  .filter(Boolean);
+
+// Skewed word choice so some terms are common and some rare, as in real text
+const textSql = (words) => `
+  (SELECT string_agg(w[1 + floor(power(random(), 2.5) * array_length(w, 1))::int], ' ')
+   FROM generate_series(1, ${words} + (g * 0)), (SELECT '{${WORDS.join(",")}}'::text[] AS w) words)`;
+
+const SEED_SQL = `
+  INSERT INTO "users" ("cognito_id", "first_name", "roles")
+  SELECT 'instructor-' || g, 'Instructor', ARRAY['instructor'] FROM generate_series(1, ${INSTRUCTORS}) g;
+
+  INSERT INTO "users" ("cognito_id", "first_name", "roles")
+  SELECT 'student-' || g, 'Student', ARRAY['student']
+  FROM generate_series(1, ${INSTRUCTORS * STUDENTS_PER_INSTRUCTOR}) g;
+
+  INSERT INTO "instructor_students" ("instructor_id", "student_id")
+  SELECT i.user_id, s.user_id
+  FROM generate_series(1, ${INSTRUCTORS * STUDENTS_PER_INSTRUCTOR}) g
+  JOIN "users" s ON s.cognito_id = 'student-' || g
+  JOIN "users" i ON i.cognito_id = 'instructor-' || ((g - 1) / ${STUDENTS_PER_INSTRUCTOR} + 1);
+
+  INSERT INTO "cases" ("case_hash", "case_title", "case_description", "student_notes", "user_id")
+  SELECT md5(g::text), ${textSql(4)}, ${textSql(80)}, ${textSql(30)}, s.user_id
+  FROM generate_series(1, ${CASES}) g
+  JOIN "users" s ON s.cognito_id = 'student-' || (1 + g % ${INSTRUCTORS * STUDENTS_PER_INSTRUCTOR});
+
+  INSERT INTO "audio_files" ("case_id", "file_title", "audio_text")
+  SELECT c.case_id, 'Interview', ${textSql(600)}
+  FROM (SELECT case_id, row_number() OVER () AS g FROM "cases" LIMIT ${TRANSCRIPTS}) c;
+`;
+
+const QUERIES = ["eviction", "tenant deposit", '"lease deposit"', "the", "refugee -visa", "sponsor or garnishment"];
+
+async function applyMigrations(sql) {
+  const files = fs.readdirSync(MIGRATIONS_DIR).filter((f) => /^\d+_\w+\.sql$/.test(f)).sort();
+  for (const file of files) {
+    const text = fs.readFileSync(path.join(MIGRATIONS_DIR, file), "utf-8");
+    if (text.startsWith("-- migrate: no-transaction")) {
+      for (const statement of text.split(/;\s*$/m).map((s) => s.trim()).filter((s) => s && !/^(--.*\n?)*$/.test(s))) {
+        await sql.unsafe(statement);
+      }
+    } else {
+      await sql.unsafe(text);
+    }
+  }
+}
+
+const percentile = (values, p) => {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))];
+};
+
+async function main(url) {
+  const options = {
+    max: 1,
+    onnotice: () => {},
+    connection: { search_path: `${SCRATCH_SCHEMA},public` },
+  };
+  const sql = url ? postgres(url, options) : postgres(options);
+  await sql.unsafe(`DROP SCHEMA IF EXISTS "${SCRATCH_SCHEMA}" CASCADE; CREATE SCHEMA "${SCRATCH_SCHEMA}";`);
+  let failed = false;
+  try {
+    await applyMigrations(sql);
+    let started = Date.now();
+    await sql.unsafe(SEED_SQL);
+    await sql.unsafe("ANALYZE");
+    console.log(`seeded ${CASES} cases and ${TRANSCRIPTS} transcripts in ${((Date.now() - started) / 1000).toFixed(1)}s`);
+
+    const students = await sql`SELECT user_id FROM "users" WHERE cognito_id LIKE 'student-%' ORDER BY random() LIMIT ${SEARCHES}`;
+    const instructors = await sql`SELECT user_id FROM "users" WHERE cognito_id LIKE 'instructor-%' ORDER BY random() LIMIT ${SEARCHES}`;
+
+    console.log(`${"scope".padEnd(11)} ${"query".padEnd(24)} ${"p50 ms".padStart(7)} ${"p95 ms".padStart(7)} ${"hits/scope".padStart(10)}`);
+    for (const [scopeName, ids, scopeOf] of [
+      ["student", students, (row) => ({ studentId: row.user_id })],
+      ["instructor", instructors, (row) => ({ instructorId: row.user_id })],
+    ]) {
+      for (const text of QUERIES) {
+        const latencies = [];
+        let hits = 0;
+        for (const row of ids) {
+          const seen = new Set();
+          let cursor = null;
+          do {
+            const t0 = process.hrtime.bigint();
+            const page = await searchCases(sql, { text, scope: scopeOf(row), cursor, limit: 20 });
+            latencies.push(Number(process.hrtime.bigint() - t0) / 1e6);
+            for (const result of page.results) {
+              if (seen.has(result.case_id)) throw new Error(`case ${result.case_id} returned twice`);
+              seen.add(result.case_id);
+            }
+            cursor = page.next_cursor;
+          } while (cursor);
+          hits += seen.size;
+        }
+        const p95 = percentile(latencies, 0.95);
+        failed = failed || p95 > TARGET_P95_MS;
+        console.log(
+          `${scopeName.padEnd(11)} ${text.padEnd(24)} ${percentile(latencies, 0.5).toFixed(2).padStart(7)} ` +
+          `${p95.toFixed(2).padStart(7)} ${(hits / ids.length).toFixed(1).padStart(10)}`
+        );
+      }
+    }
+
+    // Edits to a case and new transcripts are searchable as soon as they are written
+    const [target] = await sql`SELECT case_id, user_id FROM "cases" LIMIT 1`;
+    await sql`UPDATE "cases" SET case_title = 'Zoning variance appeal' WHERE case_id = ${target.case_id}`;
+    await sql`INSERT INTO "audio_files" (case_id, audio_text) VALUES (${target.case_id}, 'the xylophone was stolen')`;
+    for (const text of ["zoning", "xylophone"]) {
+      const found = await searchCases(sql, { text, scope: { studentId: target.user_id } });
+      if (found.results[0]?.case_id !== target.case_id) throw new Error(`"${text}" does not find the updated case`);
+    }
+    console.log("case edits and new transcripts are searchable immediately");
+  } finally {
+    await sql.unsafe(`DROP SCHEMA IF EXISTS "${SCRATCH_SCHEMA}" CASCADE`);
+    await sql.end();
+  }
+  if (failed) {
+    console.log(`p95 over the ${TARGET_P95_MS} ms target`);
+    process.exit(1);
+  }
+  console.log(`all p95 latencies under ${TARGET_P95_MS} ms`);
+}
+
+main(process.argv[2] || process.env.DATABASE_URL).catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,110 @@
+// Ranked full-text search over cases and their transcripts, shared by the student and
+// instructor functions. Matches come from the GIN indexes on "cases".search_vector and
+// "audio_files".search_vector; pages are cursored on (rank, case_id).
+
+const DEFAULT_PAGE_SIZE = 20;
+const MAX_PAGE_SIZE = 50;
+
+// A transcript match counts for less than a match in the case itself
+const TRANSCRIPT_RANK_WEIGHT = 0.5;
+
+const encodeCursor = ({ rank, case_id }) =>
+  Buffer.from(JSON.stringify([rank, case_id])).toString("base64url");
+
+const UUID_PATTERN = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+const RANK_PATTERN = /^\d+(\.\d+)?$/;
+
+// Returns null for a missing cursor and throws "Invalid cursor" on a malformed one, before any of
+// it reaches the ::numeric and ::uuid casts
+const decodeCursor = (cursor) => {
+  if (!cursor) return null;
+  let decoded;
+  try {
+    decoded = JSON.parse(Buffer.from(cursor, "base64url").toString("utf-8"));
+  } catch (err) {
+    throw new Error("Invalid cursor");
+  }
+  const [rank, caseId] = Array.isArray(decoded) ? decoded : [];
+  const validRank = (typeof rank === "string" || typeof rank === "number") && RANK_PATTERN.test(String(rank));
+  if (!validRank || typeof caseId !== "string" || !UUID_PATTERN.test(caseId)) {
+    throw new Error("Invalid cursor");
+  }
+  return { rank: String(rank), caseId };
+};
+
+const pageSize = (limit) => {
+  const size = parseInt(limit, 10);
+  if (!Number.isFinite(size) || size < 1) return DEFAULT_PAGE_SIZE;
+  return Math.min(size, MAX_PAGE_SIZE);
+};
+
+/**
+ * Search the cases visible to a student or an instructor.
+ *
+ * @param sql - postgres.js connection
+ * @param text - the search text, in websearch syntax ("quoted phrases", or, -excluded)
+ * @param scope - { studentId } for a student's own cases, or { instructorId } for the cases of
+ *                the instructor's students
+ * @param cursor - next_cursor from the previous page, if any
+ * @param limit - page size, capped at MAX_PAGE_SIZE
+ * @returns {{ results: object[], next_cursor: string|null }}
+ */
+async function searchCases(sql, { text, scope, cursor, limit }) {
+  const after = decodeCursor(cursor);
+  const size = pageSize(limit);
+
+  const inScope = scope.studentId
+    ? sql`c.user_id = ${scope.studentId}`
+    : sql`c.user_id IN (
+        SELECT student_id FROM "instructor_students" WHERE instructor_id = ${scope.instructorId}
+      )`;
+
+  const rows = await sql`
+    WITH q AS (
+      SELECT websearch_to_tsquery('english', ${text}) AS query
+    ),
+    matches AS (
+      SELECT c.case_id, ts_rank_cd(c.search_vector, q.query, 1) AS rank
+      FROM "cases" c, q
+      WHERE c.search_vector @@ q.query AND ${inScope}
+      UNION ALL
+      SELECT af.case_id, ts_rank_cd(af.search_vector, q.query, 1) * ${TRANSCRIPT_RANK_WEIGHT} AS rank
+      FROM "audio_files" af
+      JOIN "cases" c ON c.case_id = af.case_id, q
+      WHERE af.search_vector @@ q.query AND ${inScope}
+    ),
+    ranked AS (
+      SELECT case_id, round(max(rank)::numeric, 6) AS rank
+      FROM matches
+      GROUP BY case_id
+    ),
+    page AS (
+      SELECT case_id, rank
+      FROM ranked
+      ${after
+        ? sql`WHERE (rank, case_id) < (${after.rank}::numeric, ${after.caseId}::uuid)`
+        : sql``}
+      ORDER BY rank DESC, case_id DESC
+      LIMIT ${size + 1}
+    )
+    SELECT
+      c.case_id,
+      c.case_title,
+      c.case_type,
+      c.status,
+      c.last_updated,
+      c.user_id,
+      p.rank,
+      ts_headline('english', coalesce(c.case_description, ''), q.query,
+                  'MaxFragments=1, MaxWords=25, MinWords=10') AS snippet
+    FROM page p
+    JOIN "cases" c ON c.case_id = p.case_id, q
+    ORDER BY p.rank DESC, p.case_id DESC;
+  `;
+
+  const results = rows.slice(0, size);
+  const next_cursor = rows.length > size ? encodeCursor(results[results.length - 1]) : null;
+  return { results, next_cursor };
+}
+
+module.exports = { searchCases, decodeCursor, encodeCursor };
@@ -1,4 +1,5 @@
 const { initializeConnection } = require("./lib.js");
+const { searchCases } = require("./caseSearch.js");
 let { SM_DB_CREDENTIALS, RDS_PROXY_ENDPOINT, USER_POOL } = process.env;
 const {
   CognitoIdentityProviderClient,
@@ -311,6 +312,111 @@ WHERE c.user_id = ANY(${studentIds});
     response.body = JSON.stringify({ error: "cognito_id is required" });
   }
   break;
+      case "GET /instructor/search_cases":
+        if (
+          event.queryStringParameters != null &&
+          event.queryStringParameters.cognito_id &&
+          event.queryStringParameters.q
+        ) {
+          const { cognito_id, q, cursor, limit } = event.queryStringParameters;
+
+          try {
+            const userIdResult = await sqlConnection`
+              SELECT user_id FROM "users" WHERE cognito_id = ${cognito_id};
+            `;
+            const instructorId = userIdResult[0]?.user_id;
+
+            if (!instructorId) {
+              response.statusCode = 404;
+              response.body = JSON.stringify({ error: "Instructor not found" });
+              break;
+            }
+
+            // Only the cases of the instructor's own students are searched
+            let page;
+            try {
+              page = await searchCases(sqlConnection, { text: q, scope: { instructorId }, cursor, limit });
+            } catch (err) {
+              if (err.message !== "Invalid cursor") throw err;
+              response.statusCode = 400;
+              response.body = JSON.stringify({ error: "Invalid cursor" });
+              break;
+            }
+
+            response.statusCode = 200;
+            response.body = JSON.stringify(page);
+          } catch (err) {
+            console.error(err);
+            response.statusCode = 500;
+            response.body = JSON.stringify({ error: "Internal server error" });
+          }
+        } else {
+          response.statusCode = 400;
+          response.body = JSON.stringify({ error: "cognito_id and q are required" });
+        }
+        break;
+      case "GET /instructor/dashboard":
+        if (
+          event.queryStringParameters != null &&
+          event.queryStringParameters.cognito_id
+        ) {
+          const cognito_id = event.queryStringParameters.cognito_id;
+
+          try {
+            // Per-student counts come from "student_case_stats", which triggers keep current,
+            // so the dashboard is one indexed read however many cases the students have
+            const students = await sqlConnection`
+              SELECT
+                u.user_id AS student_id,
+                u.first_name,
+                u.last_name,
+                COALESCE(s.cases_total, 0) AS cases_total,
+                COALESCE(s.cases_in_progress, 0) AS cases_in_progress,
+                COALESCE(s.cases_sent_to_review, 0) AS cases_sent_to_review,
+                COALESCE(s.cases_review_feedback, 0) AS cases_review_feedback,
+                COALESCE(s.cases_archived, 0) AS cases_archived,
+                COALESCE(s.unread_summaries, 0) AS unread_summaries,
+                COALESCE(s.unread_messages, 0) AS unread_messages,
+                s.last_updated
+              FROM "users" i
+              JOIN "instructor_students" l ON l.instructor_id = i.user_id
+              JOIN "users" u ON u.user_id = l.student_id
+              LEFT JOIN "student_case_stats" s ON s.student_id = l.student_id
+              WHERE i.cognito_id = ${cognito_id}
+              ORDER BY s.last_updated DESC NULLS LAST;
+            `;
+
+            const totals = {
+              students: students.length,
+              cases_total: 0,
+              cases_in_progress: 0,
+              cases_sent_to_review: 0,
+              cases_review_feedback: 0,
+              cases_archived: 0,
+              unread_summaries: 0,
+              unread_messages: 0,
+              last_updated: students[0]?.last_updated ?? null,
+            };
+            for (const student of students) {
+              for (const key of Object.keys(totals)) {
+                if (key !== "students" && key !== "last_updated") {
+                  totals[key] += student[key];
+                }
+              }
+            }
+
+            response.statusCode = 200;
+            response.body = JSON.stringify({ totals, students });
+          } catch (err) {
+            console.error(err);
+            response.statusCode = 500;
+            response.body = JSON.stringify({ error: "Internal server error" });
+          }
+        } else {
+          response.statusCode = 400;
+          response.body = JSON.stringify({ error: "cognito_id is required" });
+        }
+        break;
       default:
         throw new Error(`Unsupported route: "${pathData}"`);
     }
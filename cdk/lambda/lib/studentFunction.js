@@ -1,10 +1,25 @@
 // const { v4: uuidv4 } = require('uuid')
 const { initializeConnection } = require("./lib.js");
-let { SM_DB_CREDENTIALS, RDS_PROXY_ENDPOINT, USER_POOL, MESSAGE_LIMIT } = process.env;
+const { searchCases } = require("./caseSearch.js");
+let { SM_DB_CREDENTIALS, RDS_PROXY_ENDPOINT, USER_POOL, MESSAGE_LIMIT, AUDIO_BUCKET } = process.env;
 const {
   CognitoIdentityProviderClient,
   AdminGetUserCommand,
 } = require("@aws-sdk/client-cognito-identity-provider");
+const { S3Client, GetObjectCommand, DeleteObjectCommand } = require("@aws-sdk/client-s3");
+const { gunzipSync } = require("zlib");
+
+const s3Client = new S3Client();
+
+// Large transcripts are stored gzip-compressed in S3 and only referenced from "audio_files"
+const loadTranscript = async ({ audio_text, audio_text_s3_key }) => {
+  if (!audio_text_s3_key) return audio_text;
+  const object = await s3Client.send(
+    new GetObjectCommand({ Bucket: AUDIO_BUCKET, Key: audio_text_s3_key })
+  );
+  const compressed = Buffer.from(await object.Body.transformToByteArray());
+  return gunzipSync(compressed).toString("utf-8");
+};
 
 // SQL conneciton from global variable at lib.js
 let sqlConnection = global.sqlConnection;
@@ -259,6 +274,75 @@ exports.handler = async (event) => {
   }
   break;
 
+  case "GET /student/search_cases":
+    if (
+      event.queryStringParameters &&
+      event.queryStringParameters.user_id &&
+      event.queryStringParameters.q
+    ) {
+      const { user_id: cognito_id, q, cursor, limit } = event.queryStringParameters;
+
+      try {
+        const user = await sqlConnection`
+          SELECT user_id FROM "users" WHERE cognito_id = ${cognito_id};
+        `;
+        const user_id = user[0]?.user_id;
+
+        if (!user_id) {
+          response.statusCode = 404;
+          response.body = JSON.stringify({ error: "User not found" });
+          break;
+        }
+
+        let page;
+        try {
+          page = await searchCases(sqlConnection, { text: q, scope: { studentId: user_id }, cursor, limit });
+        } catch (err) {
+          if (err.message !== "Invalid cursor") throw err;
+          response.statusCode = 400;
+          response.body = JSON.stringify({ error: "Invalid cursor" });
+          break;
+        }
+
+        response.statusCode = 200;
+        response.body = JSON.stringify(page);
+      } catch (err) {
+        response.statusCode = 500;
+        console.error(err);
+        response.body = JSON.stringify({ error: "Internal server error" });
+      }
+    } else {
+      response.statusCode = 400;
+      response.body = JSON.stringify({ error: "user_id and q are required" });
+    }
+    break;
+
+  case "GET /student/archived_cases":
+    if (event.queryStringParameters && event.queryStringParameters.user_id) {
+      const cognito_id = event.queryStringParameters.user_id;
+
+      try {
+        // Archived cases are restored through POST /student/restore_case
+        const data = await sqlConnection`
+          SELECT a.case_id, a.case_title, a.case_type, a.status, a.term, a.last_updated, a.archived_at
+          FROM "case_archives" a
+          JOIN "users" u ON u.user_id = a.user_id
+          WHERE u.cognito_id = ${cognito_id}
+          ORDER BY a.last_updated DESC;
+        `;
+        response.statusCode = 200;
+        response.body = JSON.stringify(data);
+      } catch (err) {
+        response.statusCode = 500;
+        console.error(err);
+        response.body = JSON.stringify({ error: "Internal server error" });
+      }
+    } else {
+      response.statusCode = 400;
+      response.body = JSON.stringify({ error: "user_id is required" });
+    }
+    break;
+
   case "GET /student/get_disclaimer":
   if (event.queryStringParameters && event.queryStringParameters.user_id) {
     const cognito_id = event.queryStringParameters.user_id;
@@ -507,7 +591,7 @@ break;
 
       // Step 4: Fetch transcription
       const data = await sqlConnection`
-        SELECT audio_text
+        SELECT audio_text, audio_text_s3_key
         FROM "audio_files"
         WHERE audio_file_id = ${audioFileId};
       `;
@@ -517,7 +601,7 @@ break;
         response.body = JSON.stringify({ message: "Transcription not found" });
       } else {
         response.statusCode = 200;
-        response.body = JSON.stringify(data[0]); // Just return the single result
+        response.body = JSON.stringify({ audio_text: await loadTranscript(data[0]) });
       }
 
     } catch (err) {
@@ -1133,10 +1217,24 @@ break;
             const caseId = event.queryStringParameters.case_id;
     
             try {
-                await sqlConnection`
-                    DELETE FROM "cases"
-                    WHERE case_id = ${caseId};
+                // Audio file rows are deleted explicitly so their offloaded transcripts can be
+                // removed from S3; everything else cascades with the case
+                const deleted = await sqlConnection`
+                    WITH deleted_audio AS (
+                        DELETE FROM "audio_files"
+                        WHERE case_id = ${caseId}
+                        RETURNING audio_text_s3_key
+                    ), deleted_case AS (
+                        DELETE FROM "cases"
+                        WHERE case_id = ${caseId}
+                    )
+                    SELECT audio_text_s3_key FROM deleted_audio
+                    WHERE audio_text_s3_key IS NOT NULL;
                 `;
+
+                await Promise.all(deleted.map(({ audio_text_s3_key }) =>
+                    s3Client.send(new DeleteObjectCommand({ Bucket: AUDIO_BUCKET, Key: audio_text_s3_key }))
+                ));
     
                 response.statusCode = 200;
                 response.body = JSON.stringify({
@@ -1191,10 +1289,17 @@ break;
             const audioFileId = event.queryStringParameters.audio_file_id;
     
             try {
-                await sqlConnection`
+                const deleted = await sqlConnection`
                     DELETE FROM "audio_files"
-                    WHERE audio_file_id = ${audioFileId};
+                    WHERE audio_file_id = ${audioFileId}
+                    RETURNING audio_text_s3_key;
                 `;
+
+                // Remove the offloaded transcript along with the row
+                const transcriptKey = deleted[0]?.audio_text_s3_key;
+                if (transcriptKey) {
+                    await s3Client.send(new DeleteObjectCommand({ Bucket: AUDIO_BUCKET, Key: transcriptKey }));
+                }
     
                 response.statusCode = 200;
                 response.body = JSON.stringify({
@@ -0,0 +1,235 @@
+import os
+import json
+import math
+import time
+import logging
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# DynamoDB table holding the token buckets; admission control is off when it is not set
+ADMISSION_TABLE = os.environ.get("ADMISSION_TABLE")
+
+# Estimated Bedrock tokens per minute admitted across all users, and for any one user. A bucket
+# holds one minute of tokens, so a quiet user or class can burst up to that much at once.
+GLOBAL_TOKENS_PER_MINUTE = float(os.environ.get("ADMISSION_GLOBAL_TOKENS_PER_MINUTE", "400000"))
+USER_TOKENS_PER_MINUTE = float(os.environ.get("ADMISSION_USER_TOKENS_PER_MINUTE", "40000"))
+
+# Priority classes, highest first. A request is only admitted if it leaves this share of the
+# global bucket for the classes above it, so under load titles are shed first and chat turns last.
+PRIORITY_RESERVE = {
+    "chat": 0.0,
+    "summary": 0.25,
+    "title": 0.5,
+}
+
+# Tokens a request of each class uses beyond the text it is admitted with: retrieved context,
+# chat history and the expected output
+OVERHEAD_TOKENS = {
+    "chat": 2500,
+    "summary": 2500,
+    "title": 200,
+}
+
+CHARS_PER_TOKEN = 4
+
+GLOBAL_BUCKET = "global"
+
+# Attempts at a bucket's conditional update when another request changes it in between
+UPDATE_ATTEMPTS = 3
+
+# Buckets refill completely within a minute, so idle ones are removed by the table's TTL
+BUCKET_TTL_SECONDS = 3600
+
+METRICS_NAMESPACE = "LegalAidTool/Admission"
+
+
+class ContendedError(Exception):
+    """A bucket changed under every attempt to take tokens from it."""
+
+
+def estimate_tokens(priority, *texts):
+    """Estimate the Bedrock tokens a request will use from its input text and its class."""
+    chars = sum(len(text) for text in texts if text)
+    return math.ceil(chars / CHARS_PER_TOKEN) + OVERHEAD_TOKENS[priority]
+
+
+def emit_admission_metrics(priority, outcome, tokens, retry_after=0.0):
+    """
+    Log admission metrics in CloudWatch Embedded Metric Format, so admitted and shed load can be
+    compared per priority class.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Priority", "Outcome"]],
+                "Metrics": [
+                    {"Name": "Requests", "Unit": "Count"},
+                    {"Name": "EstimatedTokens", "Unit": "Count"},
+                    {"Name": "RetryAfter", "Unit": "Seconds"},
+                ],
+            }],
+        },
+        "Priority": priority,
+        "Outcome": outcome,
+        "Requests": 1,
+        "EstimatedTokens": tokens,
+        "RetryAfter": round(retry_after, 2),
+    }))
+
+
+class AdmissionController:
+    """
+    Token-bucket admission control for the Bedrock-backed handlers.
+
+    Each request takes its estimated tokens from the bucket of its user and then from the global
+    bucket, both kept in DynamoDB. A bucket is stored as the time at which it will be full again
+    (FullAt): it refills continuously at its tokens per minute, so taking tokens moves that time
+    forward by tokens / rate, and it holds too few tokens while FullAt lies further ahead than its
+    capacity takes to refill. That lets every request be charged with a single conditional update
+    of an item, without reading it first, so DynamoDB serialises concurrent requests from every
+    container on the item and none of them spend the same tokens or have to retry because
+    another request got there first.
+
+    A request that a bucket cannot cover is not charged, and is shed with the time after which it
+    would be admitted, so the handler can answer at once with a 429 and Retry-After. A request
+    admitted by its user's bucket but shed by the global bucket is refunded to the user's.
+
+    If DynamoDB cannot be reached the request is admitted, so the limiter never takes the
+    service down with it.
+    """
+
+    def __init__(self, table_name=ADMISSION_TABLE, global_tokens_per_minute=GLOBAL_TOKENS_PER_MINUTE,
+                 user_tokens_per_minute=USER_TOKENS_PER_MINUTE):
+        self.table_name = table_name
+        self.global_tokens_per_minute = global_tokens_per_minute
+        self.user_tokens_per_minute = user_tokens_per_minute
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("dynamodb", region_name=os.environ.get("REGION"))
+        return self._client
+
+    def _buckets(self, user_id, priority):
+        """(key, capacity, tokens per second, tokens that must be left) for each bucket a request takes from."""
+        buckets = []
+        if user_id:
+            buckets.append((f"user#{user_id}", self.user_tokens_per_minute, self.user_tokens_per_minute / 60, 0.0))
+        buckets.append((GLOBAL_BUCKET, self.global_tokens_per_minute, self.global_tokens_per_minute / 60,
+                        PRIORITY_RESERVE[priority] * self.global_tokens_per_minute))
+        return buckets
+
+    def _update(self, key, expression, condition, values, now):
+        values = {name: {"N": f"{value:.6f}"} for name, value in values.items()}
+        values[":expires"] = {"N": str(int(now) + BUCKET_TTL_SECONDS)}
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"BucketId": {"S": key}},
+                UpdateExpression=f"{expression}, ExpiresAt = :expires",
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            item = e.response.get("Item")
+            return False, float(item["FullAt"]["N"]) if item and "FullAt" in item else None
+        return True, None
+
+    def _take(self, key, capacity, rate, reserve, tokens):
+        """
+        Take tokens from a bucket. Returns 0 if they were taken, otherwise the seconds until the
+        bucket can cover them.
+        """
+        # A request larger than a bucket could never be admitted, so it waits for a full one instead
+        cost = min(tokens, capacity - reserve) / rate
+        for _ in range(UPDATE_ATTEMPTS):
+            now = time.time()
+            # Taking the tokens must leave the reserve, i.e. the bucket must be full again by then
+            latest = now + (capacity - reserve) / rate - cost
+            # A bucket that is being drawn from refills from where it stands...
+            taken, full_at = self._update(key, "SET FullAt = FullAt + :cost",
+                                          "FullAt > :now AND FullAt <= :latest",
+                                          {":cost": cost, ":now": now, ":latest": latest}, now)
+            if taken:
+                return 0.0
+            if full_at is not None and full_at > now:
+                if full_at > latest:
+                    return full_at - latest
+                continue
+            # ...while a new or full one starts from full
+            taken, _ = self._update(key, "SET FullAt = :full_at",
+                                    "attribute_not_exists(FullAt) OR FullAt <= :now",
+                                    {":full_at": now + cost, ":now": now}, now)
+            if taken:
+                return 0.0
+        raise ContendedError(key)
+
+    def _refund(self, key, capacity, rate, reserve, tokens):
+        cost = min(tokens, capacity - reserve) / rate
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={"BucketId": {"S": key}},
+            UpdateExpression="SET FullAt = FullAt - :cost",
+            ConditionExpression="attribute_exists(FullAt)",
+            ExpressionAttributeValues={":cost": {"N": f"{cost:.6f}"}},
+        )
+
+    def admit(self, user_id, priority, tokens):
+        """
+        Take tokens from the user's and the global bucket.
+
+        Args:
+            user_id (str): The user making the request, or None to take from the global bucket only.
+            priority (str): The request's class in PRIORITY_RESERVE.
+            tokens (int): The estimated tokens of the request, as from estimate_tokens().
+
+        Returns:
+            tuple: (True, 0) if the request is admitted, otherwise (False, seconds after which
+                   it would be admitted).
+        """
+        if not self.table_name:
+            return True, 0.0
+
+        taken = []
+        try:
+            for bucket in self._buckets(user_id, priority):
+                retry_after = self._take(bucket[0], *bucket[1:], tokens)
+                if retry_after:
+                    for charged in taken:
+                        self._refund(charged[0], *charged[1:], tokens)
+                    outcome = "shed_global" if bucket[0] == GLOBAL_BUCKET else "shed_user"
+                    emit_admission_metrics(priority, outcome, tokens, retry_after)
+                    return False, retry_after
+                taken.append(bucket)
+            emit_admission_metrics(priority, "admitted", tokens)
+            return True, 0.0
+        except ContendedError:
+            # The bucket kept changing between full and drawn from; too rare to be worth shedding for
+            emit_admission_metrics(priority, "contended", tokens)
+            return True, 0.0
+        except Exception as e:
+            logger.warning(f"Admission control unavailable, admitting the request: {e}")
+            emit_admission_metrics(priority, "error", tokens)
+            return True, 0.0
+
+    def wait_for_admission(self, user_id, priority, tokens, deadline):
+        """
+        Admit background work, waiting out a shed request while time.time() stays before deadline.
+        Returns True if the request was admitted in time.
+        """
+        while True:
+            admitted, retry_after = self.admit(user_id, priority, tokens)
+            if admitted:
+                return True
+            if time.time() + retry_after >= deadline:
+                return False
+            time.sleep(retry_after)
@@ -0,0 +1,276 @@
+import os
+import json
+import math
+import time
+import random
+import bisect
+import logging
+import threading
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+logger = logging.getLogger()
+
+# Connections in the container's Bedrock runtime client, and so the most calls it has in flight
+MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", "10"))
+
+# Calls a model may have in flight before its first throttle, and the factor a throttle cuts it by
+INITIAL_CONCURRENCY = int(os.environ.get("BEDROCK_INITIAL_CONCURRENCY", "4"))
+DECREASE_FACTOR = 0.5
+
+# Attempts at a call, with full-jitter exponential backoff between them
+MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "5"))
+BASE_DELAY_SECONDS = 0.25
+MAX_DELAY_SECONDS = 8.0
+
+# Error codes worth another attempt; connection errors are retried as well
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+
+# Calls that invoke a model, and so go through the limits; everything else goes to a client with botocore's retries
+INVOKE_OPERATIONS = {"converse", "converse_stream", "invoke_model", "invoke_model_with_response_stream"}
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000]
+
+# Histograms cover the calls of the last one to two windows, so they follow a model's latency as it changes
+HISTOGRAM_WINDOW_SECONDS = 300
+
+# Expected duration of a call to a model with no latencies yet, when deciding whether a retry fits
+DEFAULT_CALL_SECONDS = 2.0
+
+METRICS_NAMESPACE = "LegalAidTool/Bedrock"
+
+
+class DeadlineExceeded(Exception):
+    """A Bedrock call could not be made before the invocation's deadline."""
+
+
+def emit_bedrock_metrics(model_id, operation, outcome, latency_ms, attempts, throttles, concurrency_limit):
+    """
+    Log a Bedrock call in CloudWatch Embedded Metric Format, so latency percentiles, retries and
+    throttles can be compared per model.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["ModelId"], ["ModelId", "Outcome"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "Attempts", "Unit": "Count"},
+                    {"Name": "Throttles", "Unit": "Count"},
+                    {"Name": "ConcurrencyLimit", "Unit": "Count"},
+                ],
+            }],
+        },
+        "ModelId": model_id,
+        "Operation": operation,
+        "Outcome": outcome,
+        "Latency": round(latency_ms, 2),
+        "Attempts": attempts,
+        "Throttles": throttles,
+        "ConcurrencyLimit": concurrency_limit,
+    }))
+
+
+class LatencyHistogram:
+    """Latencies of a model's recent calls, counted in LATENCY_BUCKETS_MS."""
+
+    def __init__(self, window_seconds=HISTOGRAM_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.previous = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.window_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        elapsed = time.monotonic() - self.window_started
+        if elapsed >= self.window_seconds:
+            self.previous = self.counts if elapsed < 2 * self.window_seconds else [0] * len(self.counts)
+            self.counts = [0] * len(self.counts)
+            self.window_started = time.monotonic()
+
+    def record(self, latency_ms):
+        with self._lock:
+            self._rotate()
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def count(self):
+        with self._lock:
+            self._rotate()
+            return sum(self.counts) + sum(self.previous)
+
+    def percentile(self, q):
+        """
+        The upper bound in milliseconds of the bucket holding the q-th quantile (0 < q <= 1) of
+        recent latencies, infinity beyond the last bucket, or None if there are none.
+        """
+        with self._lock:
+            self._rotate()
+            counts = [a + b for a, b in zip(self.counts, self.previous)]
+        total = sum(counts)
+        if not total:
+            return None
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if seen >= q * total:
+                return LATENCY_BUCKETS_MS[bucket] if bucket < len(LATENCY_BUCKETS_MS) else math.inf
+
+
+class AdaptiveConcurrency:
+    """
+    An AIMD limit on the calls to one model in flight. Each successful call made while the limit
+    is in use raises it by 1 / limit, so by one call per limit's worth of calls; a throttle cuts it
+    by DECREASE_FACTOR. Only a throttle of a call started after the last cut counts, since the
+    calls already in flight then were started under the old limit.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=MAX_POOL_CONNECTIONS):
+        self.maximum = maximum
+        self.limit = float(max(1, min(initial, maximum)))
+        self.in_flight = 0
+        self._decreases = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, deadline=None):
+        """
+        Wait for a slot until deadline (a time.time() value, or None to wait indefinitely).
+        Returns a ticket to pass to release(), or None if the deadline passed.
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    return None
+                self._condition.wait(timeout)
+            self.in_flight += 1
+            return self._decreases
+
+    def release(self, ticket, outcome):
+        """Free a slot after a call that ended in "success", "throttled" or another error."""
+        with self._condition:
+            if outcome == "throttled":
+                if ticket == self._decreases:
+                    self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+                    self._decreases += 1
+            elif outcome == "success" and self.in_flight >= int(self.limit):
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+
+class BedrockRuntime:
+    """
+    The container's Bedrock runtime client, shared by every model call and guardrail check.
+
+    Use it wherever a bedrock-runtime client is expected, such as the client= of the LangChain
+    Bedrock classes. Calls that invoke a model go through:
+
+    - an adaptive limit on the calls to each model in flight, which backs off when the model
+      throttles and creeps back up while it does not, so concurrent calls such as bulk title
+      generation settle at the rate the model's quota allows instead of throttling each other;
+    - retries of throttled and transient failures with full-jitter exponential backoff, made only
+      while the call is expected to finish before the invocation's deadline (see set_deadline());
+    - a latency histogram per model, and a metric per call (see emit_bedrock_metrics()).
+
+    botocore's own retries are turned off for these calls, since they know neither the limit nor
+    the deadline. Every other operation, such as apply_guardrail, goes to a second client that
+    keeps botocore's standard retries. Each client's connection pool holds max_pool_connections,
+    the most calls in flight at once. Streaming calls are timed to the start of the stream.
+    """
+
+    def __init__(self, region_name=None, max_pool_connections=MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+        self.client = boto3.client(
+            "bedrock-runtime",
+            region_name=region_name,
+            config=Config(max_pool_connections=max_pool_connections, retries={"total_max_attempts": 1}),
+        )
+        self.retrying_client = boto3.client(
+            "bedrock-runtime",
+            region_name=region_name,
+            config=Config(max_pool_connections=max_pool_connections,
+                          retries={"mode": "standard", "total_max_attempts": MAX_ATTEMPTS}),
+        )
+        self.deadline = None
+        self.limits = {}
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name in INVOKE_OPERATIONS:
+            attr = getattr(self.client, name)
+            return lambda **kwargs: self._call(name, attr, kwargs)
+        return getattr(self.retrying_client, name)
+
+    def set_deadline(self, context):
+        """Bound retries by the invocation's remaining time; call at the start of each invocation."""
+        self.deadline = time.time() + context.get_remaining_time_in_millis() / 1000 if context else None
+
+    def _model(self, model_id):
+        with self._lock:
+            if model_id not in self.limits:
+                self.limits[model_id] = AdaptiveConcurrency(maximum=self.max_pool_connections)
+                self.latencies[model_id] = LatencyHistogram()
+            return self.limits[model_id], self.latencies[model_id]
+
+    def percentile(self, model_id, q):
+        """The q-th quantile of the model's recent latencies in milliseconds, as from LatencyHistogram."""
+        return self._model(model_id)[1].percentile(q)
+
+    def samples(self, model_id):
+        """The number of recent calls of the model in its latency histogram."""
+        return self._model(model_id)[1].count()
+
+    def _fits(self, model_id, delay):
+        if self.deadline is None:
+            return True
+        expected = self.percentile(model_id, 0.5)
+        expected = DEFAULT_CALL_SECONDS if expected is None else expected / 1000
+        return time.time() + delay + expected < self.deadline
+
+    def _call(self, operation, call, kwargs):
+        model_id = kwargs.get("modelId", "unknown")
+        limit, latencies = self._model(model_id)
+        started = time.perf_counter()
+        throttles = 0
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            ticket = limit.acquire(self.deadline)
+            if ticket is None:
+                emit_bedrock_metrics(model_id, operation, "deadline", (time.perf_counter() - started) * 1000,
+                                     attempt - 1, throttles, int(limit.limit))
+                raise DeadlineExceeded(f"No capacity for {model_id} before the invocation's deadline")
+            attempt_started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = call(**kwargs)
+            except (ClientError, ConnectionError, HTTPClientError) as e:
+                code = e.response["Error"]["Code"] if isinstance(e, ClientError) else type(e).__name__
+                if code == "ThrottlingException":
+                    outcome = "throttled"
+                    throttles += 1
+                delay = random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** attempt))
+                retryable = code in RETRYABLE_ERRORS or not isinstance(e, ClientError)
+                if not retryable or attempt == MAX_ATTEMPTS or not self._fits(model_id, delay):
+                    emit_bedrock_metrics(model_id, operation, code, (time.perf_counter() - started) * 1000,
+                                         attempt, throttles, int(limit.limit))
+                    raise
+                logger.warning(f"Bedrock {operation} on {model_id} failed ({code}), retrying in {delay:.2f} s")
+            else:
+                outcome = "success"
+                latencies.record((time.perf_counter() - attempt_started) * 1000)
+                emit_bedrock_metrics(model_id, operation, "success", (time.perf_counter() - started) * 1000,
+                                     attempt, throttles, int(limit.limit))
+                return response
+            finally:
+                limit.release(ticket, outcome)
+            time.sleep(delay)
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import logging
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+import boto3
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+logger = logging.getLogger()
+
+# Connections idle for longer than this are pinged before they are handed out, since the RDS
+# proxy closes idle client connections and the first query on one would otherwise fail
+LIVENESS_IDLE_SECONDS = float(os.environ.get("DB_LIVENESS_IDLE_SECONDS", "30"))
+
+# Attempts at an idempotent read when the connection fails under it
+READ_ATTEMPTS = 2
+
+# Errors raised when a connection fails; a read is only retried if its connection is closed after
+CONNECTION_ERRORS = (psycopg.OperationalError, psycopg.InterfaceError)
+
+# Queries slower than this are logged with their timing
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "500"))
+
+# Reads within this many seconds of a write made by this container go to the writer, so a request
+# sees its own writes however far the reader lags
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+# Seconds to wait for the reader before falling back to the writer, and to wait before trying an
+# unreachable reader again
+READER_CONNECT_TIMEOUT = int(os.environ.get("DB_READER_CONNECT_TIMEOUT", "2"))
+READER_RETRY_SECONDS = 60
+
+_secrets = {}
+_parameters = {}
+_clients = {}
+
+
+def _client(service):
+    if service not in _clients:
+        _clients[service] = boto3.client(service, region_name=os.environ.get("REGION"))
+    return _clients[service]
+
+
+def get_secret(secret_name, expect_json=True):
+    """
+    Retrieve a secret from AWS Secrets Manager, parse JSON if requested, and cache the result.
+    """
+    if secret_name not in _secrets:
+        try:
+            raw = _client("secretsmanager").get_secret_value(SecretId=secret_name)["SecretString"]
+            _secrets[secret_name] = json.loads(raw) if expect_json else raw
+        except Exception as e:
+            logger.error(f"Error fetching secret {secret_name}: {e}")
+            raise
+    return _secrets[secret_name]
+
+
+def get_parameter(param_name, cached_var=None):
+    """
+    Retrieve a parameter from AWS Systems Manager Parameter Store and cache the result.
+    """
+    if cached_var is not None:
+        return cached_var
+    if param_name not in _parameters:
+        try:
+            response = _client("ssm").get_parameter(Name=param_name, WithDecryption=True)
+            _parameters[param_name] = response["Parameter"]["Value"]
+        except Exception as e:
+            logger.error(f"Error fetching parameter {param_name}: {e}")
+            raise
+    return _parameters[param_name]
+
+
+def query_label(query):
+    """A short, single-line label for a query, used when it has no name."""
+    text = query.as_string(None) if hasattr(query, "as_string") else str(query)
+    return " ".join(text.split())[:80]
+
+
+def log_slow_query(label, duration_ms, rowcount, error):
+    if duration_ms >= SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({duration_ms:.0f} ms, {rowcount} rows): {label}")
+
+
+class TimedCursor(psycopg.Cursor):
+    """
+    A cursor that reports the duration of every statement to its database's query hooks.
+    Pass label= to execute() to name a query in the hooks.
+    """
+    database = None
+
+    def execute(self, query, params=None, *, prepare=None, binary=None, label=None):
+        if not query:
+            # Liveness checks send an empty statement, which is not worth reporting
+            return super().execute(query, params, prepare=prepare, binary=binary)
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().execute(query, params, prepare=prepare, binary=binary)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.database.report(label or query_label(query), (time.perf_counter() - started) * 1000,
+                                 self.rowcount, error)
+
+    def executemany(self, query, params_seq, *, returning=False):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().executemany(query, params_seq, returning=returning)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.database.report(query_label(query), (time.perf_counter() - started) * 1000,
+                                 self.rowcount, error)
+
+
+class Database:
+    """
+    Pooled connections to Postgres through the RDS proxy, shared by the handlers.
+
+    Connections come from a small psycopg_pool pool that is opened on first use and kept for the
+    life of the container. A connection that has been idle for LIVENESS_IDLE_SECONDS is checked
+    before it is handed out and replaced if the proxy has dropped it. Reads made through
+    fetchone() and fetchall() are also retried once on a new connection if the connection fails
+    under them; writes are never retried.
+
+    When reader_host is set, reads made with reader=True go to a second pool on that host, such as
+    a read replica. They go to the writer instead while this container has written within
+    READ_YOUR_WRITES_SECONDS, when the reader cannot be reached, and when the reader finds no
+    rows, since a row written by another function may not have reached the replica yet. Reads
+    that must see the latest state, or that are expected to miss often, should stay on the writer.
+
+    psycopg prepares a statement on the server once it has run prepare_threshold times on a
+    connection; the hot queries that run on most invocations pass prepare=True to be prepared on
+    first use. The proxy pins a client connection to its database connection once it holds
+    prepared statements, which a container that keeps its connection anyway does not mind.
+
+    Every statement is timed, and its label, duration in milliseconds, row count and error (or
+    None) are passed to each hook in self.hooks. By default slow queries are logged. Where each
+    read was served is counted in self.routes.
+    """
+
+    def __init__(self, secret_name, host, reader_host=None, min_size=1, max_size=2):
+        self.secret_name = secret_name
+        self.host = host
+        self.reader_host = reader_host or None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self.reader_pool = None
+        self.hooks = [log_slow_query]
+        self.routes = Counter()
+        self._last_write = None
+        self._reader_down_until = 0.0
+        self._last_used = weakref.WeakKeyDictionary()
+        self._cursor_class = type("TimedCursor", (TimedCursor,), {"database": self})
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def report(self, label, duration_ms, rowcount, error):
+        for hook in self.hooks:
+            try:
+                hook(label, duration_ms, rowcount, error)
+            except Exception as e:
+                logger.warning(f"Query hook failed: {e}")
+
+    def _check(self, conn):
+        last_used = self._last_used.get(conn)
+        if last_used is not None and time.monotonic() - last_used > LIVENESS_IDLE_SECONDS:
+            ConnectionPool.check_connection(conn)
+
+    def _configure(self, conn):
+        conn.cursor_factory = self._cursor_class
+
+    def _new_pool(self, host, name, **conninfo):
+        secret = get_secret(self.secret_name)
+        return ConnectionPool(
+            make_conninfo(
+                host=host,
+                dbname=secret["dbname"],
+                user=secret["username"],
+                password=secret["password"],
+                port=secret["port"],
+                **conninfo,
+            ),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            open=False,
+            configure=self._configure,
+            check=self._check,
+            name=name,
+        )
+
+    def open(self):
+        if self.pool is None:
+            pool = self._new_pool(self.host, "rds-proxy")
+            pool.open(wait=True)
+            self.pool = pool
+            logger.info("Connected to RDS via proxy")
+        return self.pool
+
+    def open_reader(self):
+        """Return the reader pool, or None if there is no reader or it cannot be reached."""
+        if self.reader_host is None or time.monotonic() < self._reader_down_until:
+            return None
+        if self.reader_pool is None:
+            pool = self._new_pool(self.reader_host, "reader", connect_timeout=READER_CONNECT_TIMEOUT)
+            try:
+                pool.open(wait=True, timeout=READER_CONNECT_TIMEOUT)
+            except PoolTimeout as e:
+                pool.close()
+                self._reader_down_until = time.monotonic() + READER_RETRY_SECONDS
+                logger.warning(f"Reader {self.reader_host} unavailable, reading from the writer: {e}")
+                return None
+            self.reader_pool = pool
+            logger.info("Connected to the reader")
+        return self.reader_pool
+
+    @contextmanager
+    def _borrow(self, pool):
+        with pool.connection() as conn:
+            try:
+                yield conn
+            finally:
+                self._last_used[conn] = time.monotonic()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection to the writer. The transaction is committed when the block exits
+        normally and rolled back if it raises. Reads with reader=True go to the writer for
+        READ_YOUR_WRITES_SECONDS afterwards.
+        """
+        with self._borrow(self.open()) as conn:
+            yield conn
+        self._last_write = time.monotonic()
+
+    def wrote_recently(self):
+        return self._last_write is not None and time.monotonic() - self._last_write < READ_YOUR_WRITES_SECONDS
+
+    def _read_from(self, pool, query, params, label, prepare, fetch):
+        for attempt in range(1, READ_ATTEMPTS + 1):
+            conn = None
+            try:
+                with self._borrow(pool) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(query, params, prepare=prepare, label=label)
+                        return fetch(cur)
+            except CONNECTION_ERRORS as e:
+                if attempt == READ_ATTEMPTS or conn is None or not conn.closed:
+                    raise
+                logger.warning(f"Retrying {label or query_label(query)} on a new connection: {e}")
+                # The proxy usually drops every idle connection at once, so check the rest before retrying
+                pool.check()
+
+    def _read(self, query, params, label, prepare, fetch, reader):
+        if reader and not self.wrote_recently():
+            pool = self.open_reader()
+            if pool is not None:
+                try:
+                    result = self._read_from(pool, query, params, label, prepare, fetch)
+                except psycopg.errors.QueryCanceled:
+                    raise
+                except CONNECTION_ERRORS + (PoolTimeout,) as e:
+                    logger.warning(f"Reading {label or query_label(query)} from the writer: {e}")
+                    self.routes["reader_error"] += 1
+                else:
+                    if result:
+                        self.routes["reader"] += 1
+                        return result
+                    self.routes["reader_miss"] += 1
+        self.routes["writer"] += 1
+        return self._read_from(self.open(), query, params, label, prepare, fetch)
+
+    def fetchone(self, query, params=None, label=None, prepare=None, reader=False):
+        """Run an idempotent read and return its first row, or None."""
+        return self._read(query, params, label, prepare, lambda cur: cur.fetchone(), reader)
+
+    def fetchall(self, query, params=None, label=None, prepare=None, reader=False):
+        """Run an idempotent read and return all of its rows."""
+        return self._read(query, params, label, prepare, lambda cur: cur.fetchall(), reader)
@@ -0,0 +1,148 @@
+import json
+import time
+import random
+import logging
+
+import boto3
+import httpx
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+
+logger = logging.getLogger()
+
+# Connections are kept alive across warm invocations, so only a cold start pays for the TLS handshake
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=120)
+
+# Responses worth retrying; GraphQL errors come back as 200 and are not retried
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_http_client = None
+
+
+def get_http_client():
+    """
+    Return the container's pooled HTTP/2 client, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _http_client
+
+
+def iam_authorizer(region):
+    """
+    Return a function that signs an AppSync request with the function's IAM role.
+    """
+    session = boto3.Session()
+
+    def authorize(url, payload):
+        request = AWSRequest(method="POST", url=url, data=payload, headers={"Content-Type": "application/json"})
+        SigV4Auth(session.get_credentials(), "appsync", region).add_auth(request)
+        return dict(request.headers)
+
+    return authorize
+
+
+def build_mutation(notifications):
+    """
+    Build one GraphQL request carrying a sendNotification field per (audio_file_id, message) pair.
+    Every field triggers the onNotify subscription on its own, so subscribers see separate events.
+    """
+    definitions, fields, variables = [], [], {}
+    for i, (audio_file_id, message) in enumerate(notifications):
+        definitions.append(f"$message{i}: String!, $audioFileId{i}: String!")
+        fields.append(
+            f"n{i}: sendNotification(message: $message{i}, audioFileId: $audioFileId{i}) "
+            "{ message audioFileId }"
+        )
+        variables[f"message{i}"] = message
+        variables[f"audioFileId{i}"] = str(audio_file_id)
+    query = f"mutation sendNotifications({', '.join(definitions)}) {{ {' '.join(fields)} }}"
+    return {"query": query, "variables": variables}
+
+
+def coalesce(notifications):
+    """
+    Collapse repeated (audio_file_id, message) pairs, keeping each at its last position.
+    Notifications tell clients to refetch, so the latest of a burst carries everything the earlier ones did.
+    """
+    last = {pair: i for i, pair in enumerate(notifications)}
+    return [pair for i, pair in enumerate(notifications) if last[pair] == i]
+
+
+class NotificationDispatcher:
+    """
+    Buffers AppSync notifications and sends them as batched mutations over the pooled client.
+
+    Notifications queued within `window` seconds of each other are coalesced and sent in one
+    request per authorizer. Failed requests are retried with jittered exponential backoff.
+    Call flush() before the invocation returns so nothing is left in the buffer.
+    """
+
+    def __init__(self, url, window=0.25, max_batch=20, max_attempts=4, base_delay=0.2):
+        self.url = url
+        self.window = window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.pending = {}
+        self.authorizers = {}
+        self.oldest = None
+
+    def notify(self, audio_file_id, message, authorize, key=None):
+        """
+        Queue a notification for the subscribers of audio_file_id (or a case_id).
+
+        Args:
+            audio_file_id (str): The subscription key.
+            message (str): The notification message.
+            authorize (callable): Returns request headers for (url, payload).
+            key (str, optional): Groups notifications that share an authorizer; defaults to the authorizer itself.
+        """
+        key = key or authorize
+        self.authorizers[key] = authorize
+        self.pending.setdefault(key, []).append((str(audio_file_id), message))
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        if len(self.pending[key]) >= self.max_batch or time.monotonic() - self.oldest >= self.window:
+            self.flush()
+
+    def flush(self):
+        """
+        Send everything queued. Returns the number of notifications that could not be delivered.
+        """
+        pending, self.pending, self.oldest = self.pending, {}, None
+        failed = 0
+        for key, notifications in pending.items():
+            notifications = coalesce(notifications)
+            for start in range(0, len(notifications), self.max_batch):
+                batch = notifications[start:start + self.max_batch]
+                if not self._send(batch, self.authorizers[key]):
+                    failed += len(batch)
+        self.authorizers = {}
+        return failed
+
+    def _send(self, batch, authorize):
+        payload = json.dumps(build_mutation(batch))
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = get_http_client().post(self.url, headers=authorize(self.url, payload), content=payload)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    data = response.json()
+                    if response.status_code != 200 or "errors" in data:
+                        logger.error(f"AppSync rejected {len(batch)} notifications: {data}")
+                        return False
+                    logger.info(f"Sent {len(batch)} notifications to AppSync")
+                    return True
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                reason = str(e)
+
+            if attempt < self.max_attempts:
+                delay = random.uniform(0, self.base_delay * 2 ** attempt)
+                logger.warning(f"AppSync notification attempt {attempt} failed ({reason}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        logger.error(f"Giving up on {len(batch)} notifications after {self.max_attempts} attempts: {reason}")
+        return False
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+
+import boto3
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger()
+
+# SSM parameter holding the routing table, a JSON object keyed by call site, e.g.
+#   {"question_rewrite": {"model": "...", "fallback": "...", "max_tokens": 256, "latency_budget_ms": 2000}}
+# Call sites missing from the table use the model and token budget of the caller's defaults.
+MODEL_ROUTING_PARAM = os.environ.get("MODEL_ROUTING_PARAM")
+
+# Seconds between reloads of the routing table, so changes reach warm containers
+ROUTING_REFRESH_SECONDS = 300
+
+# Calls of a model needed in its latency histogram before its p95 is trusted
+MIN_SAMPLES = 10
+
+METRICS_NAMESPACE = "LegalAidTool/Routing"
+
+
+def emit_routing_metrics(route, latency_ms, outcome):
+    """
+    Log a routed call in CloudWatch Embedded Metric Format, recording the model that served the
+    call site and whether the call met its latency budget.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["CallSite"], ["CallSite", "ModelId"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "WithinBudget", "Unit": "Count"},
+                    {"Name": "Fallback", "Unit": "Count"},
+                ],
+            }],
+        },
+        "CallSite": route.call_site,
+        "ModelId": route.model_id,
+        "Outcome": outcome,
+        "Latency": round(latency_ms, 2),
+        "LatencyBudget": route.latency_budget_ms,
+        "WithinBudget": int(route.latency_budget_ms is None or latency_ms <= route.latency_budget_ms),
+        "Fallback": int(route.fallback),
+    }))
+
+
+class Route:
+    """The model and token budget chosen for one call site."""
+
+    def __init__(self, call_site, model_id, max_tokens, latency_budget_ms, fallback=False):
+        self.call_site = call_site
+        self.model_id = model_id
+        self.max_tokens = max_tokens
+        self.latency_budget_ms = latency_budget_ms
+        self.fallback = fallback
+
+    def __repr__(self):
+        return (f"Route({self.call_site!r}, {self.model_id!r}, max_tokens={self.max_tokens}, "
+                f"latency_budget_ms={self.latency_budget_ms}, fallback={self.fallback})")
+
+
+class RoutingCallback(BaseCallbackHandler):
+    """Times each call of an LLM built for a route and records it with emit_routing_metrics()."""
+
+    def __init__(self, route):
+        self.route = route
+        self._started = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id, outcome):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            emit_routing_metrics(self.route, (time.perf_counter() - started) * 1000, outcome)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "success")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, type(error).__name__)
+
+
+class ModelRouter:
+    """
+    Chooses the model and token budget of each LLM call site from the routing table in SSM.
+
+    Each entry names a call site's model, its max_tokens and its latency_budget_ms, the latency
+    objective of a call, and optionally a faster fallback model. A call site is routed to its
+    fallback while the model's p95 latency in this container (from the shared Bedrock client's
+    histograms) is over the budget, and the fallback's own p95, if known, is lower. Once the
+    model stops being called its histogram empties within two windows, so it is tried again.
+    Call sites without a fallback, such as the chat answer, always get their model.
+
+    Pass callbacks(route) to the LLM built for a route to record the model that served each
+    call, its latency and whether it met the budget.
+    """
+
+    def __init__(self, runtime, param_name=MODEL_ROUTING_PARAM):
+        self.runtime = runtime
+        self.param_name = param_name
+        self.table = {}
+        self._loaded_at = None
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("ssm", region_name=os.environ.get("REGION"))
+        return self._client
+
+    def load(self):
+        """Return the routing table, reloading it every ROUTING_REFRESH_SECONDS."""
+        if not self.param_name:
+            return self.table
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < ROUTING_REFRESH_SECONDS:
+            return self.table
+        try:
+            raw = self.client.get_parameter(Name=self.param_name)["Parameter"]["Value"]
+            self.table = json.loads(raw)
+        except Exception as e:
+            # Keep routing with the last table, or the callers' defaults, until the next reload
+            logger.error(f"Error loading routing table {self.param_name}: {e}")
+        self._loaded_at = time.monotonic()
+        return self.table
+
+    def _p95(self, model_id):
+        if self.runtime.samples(model_id) < MIN_SAMPLES:
+            return None
+        return self.runtime.percentile(model_id, 0.95)
+
+    def route(self, call_site, default_model, default_max_tokens=None):
+        """Return the Route of a call site, given the model and max_tokens it uses without an entry."""
+        entry = self.load().get(call_site) or {}
+        model_id = entry.get("model") or default_model
+        max_tokens = entry.get("max_tokens", default_max_tokens)
+        budget = entry.get("latency_budget_ms")
+        fallback = entry.get("fallback")
+
+        if fallback and budget is not None:
+            p95 = self._p95(model_id)
+            if p95 is not None and p95 > budget:
+                fallback_p95 = self._p95(fallback)
+                if fallback_p95 is None or fallback_p95 < p95:
+                    logger.info(f"Routing {call_site} to {fallback}: {model_id} p95 {p95} ms over its {budget} ms budget")
+                    return Route(call_site, fallback, entry.get("fallback_max_tokens", max_tokens), budget, True)
+        return Route(call_site, model_id, max_tokens, budget)
+
+    def callbacks(self, route):
+        return [RoutingCallback(route)]
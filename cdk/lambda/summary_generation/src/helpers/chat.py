@@ -17,11 +17,13 @@ logger = logging.getLogger(__name__)
 
 # AWS Clients
 dynamodb = boto3.client('dynamodb')
-bedrock_runtime = boto3.client('bedrock-runtime')
 
 def get_bedrock_llm(
     bedrock_llm_id: str , 
-    temperature: float = 0.3
+    temperature: float = 0.3,
+    max_tokens: int = 2048,
+    client=None,
+    callbacks=None
 ) -> ChatBedrockConverse:
     """
     Initialize a Bedrock LLM with specified parameters.
@@ -29,6 +31,9 @@ def get_bedrock_llm(
     Args:
         bedrock_llm_id (str): The model ID for the Bedrock LLM.
         temperature (float): Controls the randomness of the output.
+        max_tokens (int): Upper bound on the tokens of the summary.
+        client (BedrockRuntime, optional): The container's shared Bedrock runtime client.
+        callbacks (list, optional): Callbacks of the LLM, such as ModelRouter.callbacks() of its route.
     
     Returns:
         ChatBedrockConverse: Configured Bedrock LLM instance.
@@ -36,7 +41,9 @@ def get_bedrock_llm(
     return ChatBedrockConverse(
         model=bedrock_llm_id,
         temperature=temperature,
-        max_tokens=2048
+        max_tokens=max_tokens,
+        client=client,
+        callbacks=callbacks
     )
 
 def retrieve_dynamodb_history(table_name: str, session_id: str) -> list:
@@ -2,15 +2,19 @@ import os
 import json
 import boto3
 import logging
+import math
 import hashlib
 import uuid
 from datetime import datetime
-import psycopg
 import boto3
 from botocore.exceptions import ClientError
 from langchain_aws import ChatBedrockConverse
 from langchain_core.prompts import ChatPromptTemplate
 from helpers.chat import get_bedrock_llm, generate_lawyer_summary, retrieve_dynamodb_history
+from helpers.db import Database, get_parameter
+from helpers.admission import AdmissionController, estimate_tokens
+from helpers.bedrock import BedrockRuntime
+from helpers.routing import ModelRouter
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -20,49 +24,28 @@ logger = logging.getLogger(__name__)
 DB_SECRET_NAME = os.environ["SM_DB_CREDENTIALS"]
 REGION = os.environ["REGION"]
 RDS_PROXY_ENDPOINT = os.environ["RDS_PROXY_ENDPOINT"]
+DB_READER_ENDPOINT = os.environ.get("DB_READER_ENDPOINT")
 BEDROCK_LLM_PARAM = os.environ["BEDROCK_LLM_PARAM"]
 TABLE_NAME_PARAM = os.environ["TABLE_NAME_PARAM"]
 TABLE_NAME = os.environ["TABLE_NAME"]
 # AWS Clients
-secrets_manager_client = boto3.client("secretsmanager")
-ssm_client = boto3.client("ssm", region_name=REGION)
-bedrock_runtime = boto3.client("bedrock-runtime", region_name=REGION)
+# Model calls share one pooled, throttle-aware Bedrock runtime client
+bedrock_runtime = BedrockRuntime(REGION)
 
-# Cached resources
-connection = None
-db_secret = None
-BEDROCK_LLM_ID = None
+# Model and token budget of each LLM call, from the routing table in SSM
+router = ModelRouter(bedrock_runtime)
 
+# Pooled database connections, reused across invocations in this container
+db = Database(DB_SECRET_NAME, RDS_PROXY_ENDPOINT, DB_READER_ENDPOINT)
 
+# Token-bucket admission control in front of Bedrock, shared with the other generation functions
+admission = AdmissionController()
 
+# Cached resources
+BEDROCK_LLM_ID = None
 
-def get_secret(secret_name, expect_json=True):
-    global db_secret
-    if db_secret is None:
-        try:
-            response = secrets_manager_client.get_secret_value(SecretId=secret_name)["SecretString"]
-            db_secret = json.loads(response) if expect_json else response
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON for secret {secret_name}: {e}")
-            raise ValueError(f"Secret {secret_name} is not properly formatted as JSON.")
-        except Exception as e:
-            logger.error(f"Error fetching secret {secret_name}: {e}")
-            raise
-    return db_secret
 
 
-def get_parameter(param_name, cached_var):
-    """
-    Fetch a parameter value from Systems Manager Parameter Store.
-    """
-    if cached_var is None:
-        try:
-            response = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
-            cached_var = response["Parameter"]["Value"]
-        except Exception as e:
-            logger.error(f"Error fetching parameter {param_name}: {e}")
-            raise
-    return cached_var
 
 def initialize_constants():
     global BEDROCK_LLM_ID
@@ -71,53 +54,15 @@ def initialize_constants():
 
     
 
-def connect_to_db():
-    global connection
-    if connection is None or connection.closed:
-        try:
-            secret = get_secret(DB_SECRET_NAME)
-            connection_params = {
-                'dbname': secret["dbname"],
-                'user': secret["username"],
-                'password': secret["password"],
-                'host': RDS_PROXY_ENDPOINT,
-                'port': secret["port"]
-            }
-            connection_string = " ".join([f"{key}={value}" for key, value in connection_params.items()])
-            connection = psycopg.connect(connection_string)
-            logger.info("Connected to the database!")
-        except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
-            raise
-    return connection
-
-
 def get_case_details(case_id):
-    connection = connect_to_db()
-    if connection is None:
-        logger.error("No database connection available.")
-        return {
-            "statusCode": 500,
-            "body": json.dumps("Database connection failed.")
-        }
-    
     try:
-        cur = connection.cursor()
-        logger.info("Connected to RDS instance!")
-        cur.execute("""
+        result = db.fetchone("""
             SELECT case_title, case_type, jurisdiction, case_description
             FROM "cases"
             WHERE case_id = %s;
-        """, (case_id,))
-
-        result = cur.fetchone()
+        """, (case_id,), label="get_case_details", prepare=True, reader=True)
         logger.info(f"Query result: {result}")
 
-        cur.close()
-
         if result:
             case_title, case_type, jurisdiction, case_description = result
             logger.info(f"client details found for case_id {case_id}: "
@@ -129,9 +74,6 @@ def get_case_details(case_id):
 
     except Exception as e:
         logger.error(f"Error fetching case details: {e}")
-        if cur:
-            cur.close()
-        connection.rollback()
         return None, None, None, None
 
 def update_summaries(case_id, summary):
@@ -147,31 +89,18 @@ def update_summaries(case_id, summary):
         bool: True if successful, False otherwise.
     """
     logger.info(f"Adding new summary for case_id {case_id}")
-    connection = connect_to_db()
-    if connection is None:
-        logger.error("No database connection available.")
-        return False
-    
     try:
-        cur = connection.cursor()
-        logger.info("Connected to RDS instance!")
-        
-        # Always insert a new summary with current timestamp
-        cur.execute("""
-            INSERT INTO summaries (case_id, content, time_created)
-            VALUES (%s, %s, CURRENT_TIMESTAMP)
-        """, (case_id, summary))
-            
-        connection.commit()
-        cur.close()
+        with db.connection() as conn:
+            # Always insert a new summary with current timestamp
+            conn.execute("""
+                INSERT INTO summaries (case_id, content, time_created)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+            """, (case_id, summary))
         logger.info(f"Successfully added new summary for case_id {case_id}")
         return True
 
     except Exception as e:
         logger.error(f"Error adding summary: {e}")
-        if cur:
-            cur.close()
-        connection.rollback()
         return False
 
 def handler(event, context):
@@ -189,6 +118,7 @@ def handler(event, context):
     """
     logger.info("Title Generation Lambda function is called!")
     initialize_constants()
+    bedrock_runtime.set_deadline(context)
 
     query_params = event.get("queryStringParameters", {})
     case_id = query_params.get("case_id", "")
@@ -223,7 +153,9 @@ def handler(event, context):
     
     try:
         logger.info("Creating Bedrock LLM instance.")
-        llm = get_bedrock_llm(BEDROCK_LLM_ID)
+        route = router.route("summary", BEDROCK_LLM_ID, 2048)
+        llm = get_bedrock_llm(route.model_id, max_tokens=route.max_tokens,
+                              client=bedrock_runtime, callbacks=router.callbacks(route))
     except Exception as e:
         logger.error(f"Error getting LLM from Bedrock: {e}")
         return {
@@ -253,6 +185,28 @@ def handler(event, context):
             },
             'body': json.dumps('Error retrieving dynamo history')
         }
+
+    # Summaries give way to chat turns when the service is near its token rate
+    user_id = (event.get("requestContext") or {}).get("authorizer", {}).get("userId")
+    admitted, retry_after = admission.admit(
+        user_id, "summary",
+        estimate_tokens("summary", case_description, *(message["content"] for message in messages))
+    )
+    if not admitted:
+        logger.info(f"Shedding summary for case {case_id}, retry after {retry_after:.1f} s")
+        return {
+            'statusCode': 429,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Headers": "*",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "*",
+                "Access-Control-Expose-Headers": "Retry-After",
+                "Retry-After": str(math.ceil(retry_after)),
+            },
+            'body': json.dumps({"error": "Too many requests, please try again shortly."})
+        }
+
     try:
         logger.info("Generating response from the LLM.")
         response = generate_lawyer_summary(
@@ -0,0 +1,129 @@
+"""
+Load test for admission control (shared/helpers/admission.py) against a DynamoDB endpoint.
+
+Creates a scratch bucket table and runs a class at once: every student sends chat turns as fast
+as they are admitted, from their own thread with their own controller, as from separate
+containers, while summaries and case titles compete for the same global bucket. It checks that
+the admitted tokens never exceed what the global bucket allows over the run, however many
+requests race for it, and reports admitted and shed load per priority class, how shed load was
+split between the user and global buckets, and the latency of an admission decision.
+
+Usage:
+    AWS_ENDPOINT_URL=http://localhost:8000 python benchmarks/admission_check.py
+    (any DynamoDB endpoint, such as DynamoDB Local; uses the default region and credentials.
+    Decision latency is only meaningful against DynamoDB itself, since local emulators serve the
+    clients' requests one at a time.)
+"""
+import os
+import sys
+import time
+import uuid
+import threading
+import statistics
+from collections import Counter, defaultdict
+
+import boto3
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "shared"))
+
+from helpers import admission  # noqa: E402
+
+STUDENTS = 40
+SUMMARY_THREADS = 4
+TITLE_THREADS = 4
+DURATION_SECONDS = 20
+
+# Limits scaled down so the run saturates the global bucket within seconds
+GLOBAL_TOKENS_PER_MINUTE = 120000
+USER_TOKENS_PER_MINUTE = 12000
+
+CHAT_MESSAGE = "What are the elements of negligence, and which of them are in dispute here? " * 3
+SUMMARY_HISTORY = "Student and assistant discuss the facts of the case. " * 40
+TITLE_DESCRIPTION = "Tenant disputes an eviction notice served without the required notice period. " * 2
+
+
+def create_table(client, name):
+    client.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "BucketId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "BucketId", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=name)
+
+
+def run_client(table, priority, user_id, text, deadline, results, lock):
+    controller = admission.AdmissionController(table, GLOBAL_TOKENS_PER_MINUTE, USER_TOKENS_PER_MINUTE)
+    tokens = admission.estimate_tokens(priority, text)
+    while time.time() < deadline:
+        started = time.perf_counter()
+        admitted, retry_after = controller.admit(user_id, priority, tokens)
+        latency_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            results["latency"].append(latency_ms)
+            results[priority]["admitted" if admitted else "shed"] += 1
+            if admitted:
+                results[priority]["tokens"] += tokens
+        if not admitted:
+            # Clients honour Retry-After, capped so the run sees every class come back
+            time.sleep(min(retry_after, 2.0))
+
+
+def main():
+    client = boto3.client("dynamodb")
+    table = f"admission-check-{uuid.uuid4().hex[:8]}"
+    create_table(client, table)
+
+    results = defaultdict(Counter)
+    results["latency"] = []
+    lock = threading.Lock()
+    outcomes = Counter()
+    emit = admission.emit_admission_metrics
+
+    def count_outcome(priority, outcome, tokens, retry_after=0.0):
+        with lock:
+            outcomes[(priority, outcome)] += 1
+
+    admission.emit_admission_metrics = count_outcome
+    started = time.time()
+    deadline = started + DURATION_SECONDS
+    threads = [threading.Thread(target=run_client, args=(table, "chat", f"student-{i}", CHAT_MESSAGE,
+                                                         deadline, results, lock)) for i in range(STUDENTS)]
+    threads += [threading.Thread(target=run_client, args=(table, "summary", f"student-{i}", SUMMARY_HISTORY,
+                                                          deadline, results, lock)) for i in range(SUMMARY_THREADS)]
+    threads += [threading.Thread(target=run_client, args=(table, "title", None, TITLE_DESCRIPTION,
+                                                          deadline, results, lock)) for i in range(TITLE_THREADS)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+    finally:
+        admission.emit_admission_metrics = emit
+        client.delete_table(TableName=table)
+
+    admitted_tokens = sum(results[p]["tokens"] for p in admission.PRIORITY_RESERVE)
+    allowed = GLOBAL_TOKENS_PER_MINUTE + GLOBAL_TOKENS_PER_MINUTE / 60 * elapsed
+    print(f"{STUDENTS} students, {SUMMARY_THREADS} summary and {TITLE_THREADS} title clients for {elapsed:.1f} s, "
+          f"global {GLOBAL_TOKENS_PER_MINUTE}/min, per user {USER_TOKENS_PER_MINUTE}/min")
+    print(f"admitted {admitted_tokens} estimated tokens of {allowed:.0f} allowed "
+          f"(a full bucket plus {elapsed:.1f} s of refill)")
+    for priority in admission.PRIORITY_RESERVE:
+        counts = results[priority]
+        total = counts["admitted"] + counts["shed"]
+        print(f"  {priority:8} admitted {counts['admitted']:5}, shed {counts['shed']:5} "
+              f"({counts['shed'] / max(total, 1):.0%}), {counts['tokens'] / elapsed:7.0f} tokens/s")
+    for (priority, outcome), count in sorted(outcomes.items()):
+        if outcome not in ("admitted",):
+            print(f"  {priority:8} {outcome}: {count}")
+    latency = sorted(results["latency"])
+    print(f"decision latency: p50 {statistics.median(latency):.1f} ms, "
+          f"p99 {latency[int(len(latency) * 0.99)]:.1f} ms over {len(latency)} decisions")
+    assert admitted_tokens <= allowed, "the global bucket was overspent"
+
+
+if __name__ == "__main__":
+    main()
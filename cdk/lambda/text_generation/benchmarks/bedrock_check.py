@@ -0,0 +1,144 @@
+"""
+Check the shared Bedrock client (shared/helpers/bedrock.py) against a simulated model.
+
+The simulated model serves MODEL_CAPACITY calls at once and throttles any beyond that, as a model
+at its quota does. WORKERS threads call it as fast as they can for DURATION_SECONDS, as bulk title
+generation does, first straight through a client that retries immediately on a throttle (as the
+handlers did with botocore's default retries) and then through BedrockRuntime. The script reports
+throughput, the share of attempts throttled and the latency of successful calls for each, checks
+that the adaptive limit settled near the model's capacity, and checks that a call to a model that
+throttles every attempt gives up before the invocation's deadline.
+
+Usage:
+    python benchmarks/bedrock_check.py
+"""
+import os
+import sys
+import time
+import random
+import threading
+import statistics
+
+from botocore.exceptions import ClientError
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "shared"))
+
+from helpers import bedrock  # noqa: E402
+
+MODEL_ID = "simulated-model"
+MODEL_CAPACITY = 6
+WORKERS = 24
+DURATION_SECONDS = 10
+CALL_SECONDS = 0.2
+DEADLINE_SECONDS = 3
+
+
+class SimulatedModel:
+    """A bedrock-runtime client whose converse() throttles calls beyond its capacity."""
+
+    def __init__(self, capacity):
+        self.slots = threading.Semaphore(capacity)
+        self.attempts = 0
+        self.throttles = 0
+        self.lock = threading.Lock()
+
+    def converse(self, **kwargs):
+        with self.lock:
+            self.attempts += 1
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.throttles += 1
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, "Converse")
+        try:
+            time.sleep(random.uniform(0.5, 1.5) * CALL_SECONDS)
+            return {"output": {"message": {"role": "assistant", "content": [{"text": "Title"}]}}}
+        finally:
+            self.slots.release()
+
+
+def converse_retrying(model):
+    """Retry throttles at once, up to botocore's default of four retries."""
+    for attempt in range(5):
+        try:
+            return model.converse(modelId=MODEL_ID, messages=[])
+        except ClientError:
+            if attempt == 4:
+                raise
+
+
+def run(name, converse, model):
+    deadline = time.time() + DURATION_SECONDS
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+
+    def worker():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                converse()
+            except ClientError:
+                with lock:
+                    failures[0] += 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  {len(latencies) / DURATION_SECONDS:.1f} calls/s, {failures[0]} failed, "
+          f"{model.throttles / max(model.attempts, 1):.0%} of {model.attempts} attempts throttled")
+    print(f"  latency p50 {statistics.median(latencies):.0f} ms, p95 {latencies[int(len(latencies) * 0.95)]:.0f} ms")
+    return len(latencies)
+
+
+def check_deadline():
+    runtime = bedrock.BedrockRuntime("us-east-1")
+    runtime.client = SimulatedModel(0)
+    runtime.deadline = time.time() + DEADLINE_SECONDS
+    started = time.time()
+    try:
+        runtime.converse(modelId=MODEL_ID, messages=[])
+    except ClientError:
+        pass
+    else:
+        raise AssertionError("a model that always throttles returned")
+    elapsed = time.time() - started
+    assert elapsed < DEADLINE_SECONDS, elapsed
+    print(f"model throttling every attempt: gave up after {elapsed:.2f} s of a {DEADLINE_SECONDS} s deadline, "
+          f"{runtime.client.attempts} attempts")
+
+
+def main():
+    emit = bedrock.emit_bedrock_metrics
+    bedrock.emit_bedrock_metrics = lambda *args: None
+    logger = bedrock.logger
+    logger.disabled = True
+    try:
+        model = SimulatedModel(MODEL_CAPACITY)
+        print(f"{WORKERS} workers, model capacity {MODEL_CAPACITY} calls, {DURATION_SECONDS} s each\n")
+        run("immediate retries", lambda: converse_retrying(model), model)
+
+        runtime = bedrock.BedrockRuntime("us-east-1", max_pool_connections=WORKERS)
+        runtime.client = model = SimulatedModel(MODEL_CAPACITY)
+        run("BedrockRuntime", lambda: runtime.converse(modelId=MODEL_ID, messages=[]), model)
+        limit = runtime.limits[MODEL_ID].limit
+        print(f"  adaptive limit settled at {limit:.1f} calls, histogram p50 "
+              f"{runtime.percentile(MODEL_ID, 0.5)} ms, p95 {runtime.percentile(MODEL_ID, 0.95)} ms\n")
+        assert MODEL_CAPACITY / 2 <= limit <= MODEL_CAPACITY * 2, limit
+
+        check_deadline()
+    finally:
+        bedrock.emit_bedrock_metrics = emit
+        logger.disabled = False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Check latency-budgeted model routing (shared/helpers/routing.py) against simulated models.
+
+Chat turns are simulated as in the handler: a question rewrite and an answer, each made by an
+LLM built for its route, through the shared Bedrock client. The primary model slows down for
+the middle third of the run, as a model under load does, while the fallback model stays fast.
+The question rewrite has a latency budget and a fallback; the answer has neither.
+The script checks that:
+- the rewrite moves to the fallback while the primary's p95 is over the budget, and back once it
+  recovers;
+- the answer is always served by the primary;
+- every call is recorded with the model that served it.
+For each third of the run it reports which models served the rewrite, its p95 and the share of
+rewrites within the budget.
+
+Usage:
+    python benchmarks/routing_check.py
+"""
+import os
+import sys
+import time
+import random
+from collections import Counter
+
+from langchain_aws import ChatBedrockConverse
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "shared"))
+
+from helpers import bedrock, routing  # noqa: E402
+
+PRIMARY = "simulated-large"
+FALLBACK = "simulated-small"
+TURNS = 240
+REWRITE_BUDGET_MS = 300
+HISTOGRAM_WINDOW_SECONDS = 6
+
+ROUTING_TABLE = {
+    "question_rewrite": {"model": PRIMARY, "fallback": FALLBACK, "max_tokens": 256,
+                         "latency_budget_ms": REWRITE_BUDGET_MS},
+    "answer": {"model": PRIMARY, "max_tokens": 4096},
+}
+
+
+class SimulatedModels:
+    """A bedrock-runtime client whose primary model is slow while self.slow is set."""
+
+    def __init__(self):
+        self.slow = False
+
+    def converse(self, **kwargs):
+        if kwargs["modelId"] == PRIMARY:
+            latency = random.uniform(0.4, 0.9) if self.slow else random.uniform(0.05, 0.2)
+        else:
+            latency = random.uniform(0.03, 0.08)
+        time.sleep(latency)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 10, "outputTokens": 2, "totalTokens": 12},
+            "metrics": {"latencyMs": int(latency * 1000)},
+        }
+
+
+def llm_for(router, runtime, route):
+    return ChatBedrockConverse(model=route.model_id, max_tokens=route.max_tokens, client=runtime,
+                               region_name="us-east-1", callbacks=router.callbacks(route))
+
+
+def main():
+    runtime = bedrock.BedrockRuntime("us-east-1")
+    runtime.client = models = SimulatedModels()
+    router = routing.ModelRouter(runtime, param_name=None)
+    router.table = ROUTING_TABLE
+    for model_id in (PRIMARY, FALLBACK):
+        runtime._model(model_id)[1].window_seconds = HISTOGRAM_WINDOW_SECONDS
+
+    served = []
+    emit_bedrock, emit_routing = bedrock.emit_bedrock_metrics, routing.emit_routing_metrics
+    bedrock.emit_bedrock_metrics = lambda *args: None
+    routing.emit_routing_metrics = lambda route, latency_ms, outcome: served.append((route, latency_ms))
+    try:
+        phases = []
+        for turn in range(TURNS):
+            phase = turn * 3 // TURNS
+            models.slow = phase == 1
+            rewrite = router.route("question_rewrite", PRIMARY)
+            answer = router.route("answer", PRIMARY)
+            llm_for(router, runtime, rewrite).invoke("Rewrite the question")
+            llm_for(router, runtime, answer).invoke("Answer the question")
+            phases.append(phase)
+    finally:
+        bedrock.emit_bedrock_metrics, routing.emit_routing_metrics = emit_bedrock, emit_routing
+
+    rewrites = [(phase, route, ms) for phase, (route, ms) in zip(phases, served[0::2])]
+    answers = [route for route, _ in served[1::2]]
+    assert len(served) == 2 * TURNS, "a call was not recorded"
+    assert all(route.model_id == PRIMARY and not route.fallback for route in answers), "the answer was rerouted"
+
+    print(f"{TURNS} chat turns, question rewrite budget {REWRITE_BUDGET_MS} ms, primary slow in the middle third\n")
+    for phase, name in enumerate(("primary fast", "primary slow", "primary recovered")):
+        routes = [route for p, route, _ in rewrites if p == phase]
+        latencies = sorted(ms for p, _, ms in rewrites if p == phase)
+        models_used = Counter(route.model_id for route in routes)
+        within = sum(ms <= REWRITE_BUDGET_MS for ms in latencies) / len(latencies)
+        print(f"  {name:18} rewrite served by {dict(models_used)}, p95 {latencies[int(len(latencies) * 0.95)]:.0f} ms, "
+              f"{within:.0%} within budget")
+    slow = [route for p, route, _ in rewrites if p == 1]
+    recovered = [route for p, route, _ in rewrites if p == 2]
+    assert sum(route.fallback for route in slow) > len(slow) / 2, "the rewrite did not fall back"
+    assert not recovered[-1].fallback, "the rewrite did not return to the primary"
+    print(f"  answer served by {dict(Counter(route.model_id for route in answers))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger()
+
+# The cache is opt-in per deployment
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+
+# Cosine similarity a cached question must reach to answer a new one, and how long answers are kept
+SIMILARITY_THRESHOLD = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.92"))
+TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Shorter questions are usually follow-ups that only make sense with the chat history
+MIN_QUESTION_WORDS = 4
+
+# Phrases that tie a question or an answer to the case it was asked about
+CASE_REFERENCE = re.compile(
+    r"\b(?:my|our|the|this|that|your)\s+(?:client|clients|case|matter|file|facts|situation|story|"
+    r"landlord|tenant|employer|employee|spouse|partner|defendant|plaintiff|accused|complainant)\b"
+    r"|\b(?:he|she|him|her|his|hers|they|them|their)\b"
+    r"|\b(?:above|earlier|previous|mentioned|described)\b",
+    re.IGNORECASE,
+)
+
+# Names, places and figures from a case description, which a general answer would not mention;
+# capitalized words that start a sentence are usually not names
+CASE_TERM = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]{2,}\b|\b\d[\d,.]*\d\b")
+
+# Words and figures of a question or answer, to compare with the case terms
+TERM = re.compile(r"\b[A-Za-z]{3,}\b|\b\d[\d,.]*\d\b")
+
+METRICS_NAMESPACE = "LegalAidTool/AnswerCache"
+
+LOOKUP_QUERY = """
+    SELECT "answer", 1 - ("embedding" <=> %(embedding)s::vector) AS "similarity", "generation_ms"
+    FROM "answer_cache"
+    WHERE "jurisdiction" = %(jurisdiction)s AND "province" = %(province)s AND "statute" = %(statute)s
+      AND "version" = %(version)s AND "expires_at" > now()
+    ORDER BY "embedding" <=> %(embedding)s::vector
+    LIMIT 1;
+"""
+
+# Entries of the scope that expired or belong to an older system prompt or model are removed
+# whenever the scope is written to
+PRUNE_QUERY = """
+    DELETE FROM "answer_cache"
+    WHERE "jurisdiction" = %(jurisdiction)s AND "province" = %(province)s AND "statute" = %(statute)s
+      AND ("version" <> %(version)s OR "expires_at" <= now());
+"""
+
+STORE_QUERY = """
+    INSERT INTO "answer_cache" ("jurisdiction", "province", "statute", "version", "question", "embedding",
+                                "answer", "generation_ms", "expires_at")
+    VALUES (%(jurisdiction)s, %(province)s, %(statute)s, %(version)s, %(question)s, %(embedding)s::vector,
+            %(answer)s, %(generation_ms)s, now() + make_interval(secs => %(ttl)s));
+"""
+
+
+def cache_version(system_prompt, model_id, embedding_model_id):
+    """Hash of what an answer depends on besides the question, so a change of any of them invalidates it."""
+    return hashlib.sha256("\x1f".join(str(v) for v in (system_prompt, model_id, embedding_model_id)).encode()).hexdigest()
+
+
+def cache_scope(jurisdiction, province, statute):
+    """The (jurisdiction, province, statute) of a case, normalized so equivalent cases share cached answers."""
+    if isinstance(jurisdiction, (list, tuple)):
+        jurisdiction = ",".join(sorted(str(j).strip().lower() for j in jurisdiction))
+    statute = (statute or "").strip()
+    if statute.upper() == "N/A":
+        statute = ""
+    return (str(jurisdiction or "").strip().lower(), (province or "").strip().lower(), statute.lower())
+
+
+def is_case_independent(text, case_description, scope):
+    """
+    Whether a question or answer stands on its own, without the case it was asked about: it does
+    not refer to the client or the case, and mentions none of the names, places or figures of the
+    case description other than those of its scope.
+    """
+    if not text or CASE_REFERENCE.search(text):
+        return False
+    scope_words = " ".join(scope).lower()
+    case_terms = {term.lower() for term in CASE_TERM.findall(case_description or "")} - set(scope_words.split())
+    return not (case_terms & {term.lower() for term in TERM.findall(text)})
+
+
+def emit_answer_cache_metrics(outcome, lookup_ms, saved_ms=0.0):
+    """
+    Log an answer cache lookup in CloudWatch Embedded Metric Format, so the hit rate and the
+    latency saved by hits can be followed.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Outcome"]],
+                "Metrics": [
+                    {"Name": "Requests", "Unit": "Count"},
+                    {"Name": "LookupLatency", "Unit": "Milliseconds"},
+                    {"Name": "LatencySaved", "Unit": "Milliseconds"},
+                ],
+            }],
+        },
+        "Outcome": outcome,
+        "Requests": 1,
+        "LookupLatency": round(lookup_ms, 2),
+        "LatencySaved": round(saved_ms, 2),
+    }))
+
+
+class AnswerCache:
+    """
+    Semantic cache of answers to general legal questions, in the "answer_cache" table.
+
+    A question is only looked up, and its answer only stored, when both are case-independent
+    (see is_case_independent()), since an answer is generated with the details of one case and
+    must not carry them to another. Answers are shared between cases of the same jurisdiction,
+    province and statute, for questions whose embeddings reach SIMILARITY_THRESHOLD, until
+    TTL_SECONDS have passed or the system prompt or models change (see cache_version()).
+
+    Failures of the cache are logged and treated as misses.
+    """
+
+    def __init__(self, db, enabled=ANSWER_CACHE_ENABLED, threshold=SIMILARITY_THRESHOLD, ttl_seconds=TTL_SECONDS):
+        self.db = db
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+
+    def accepts(self, question, case_description, scope):
+        """Whether the question may be answered from, and its answer stored in, the cache."""
+        return (self.enabled and len((question or "").split()) >= MIN_QUESTION_WORDS
+                and is_case_independent(question, case_description, scope))
+
+    def lookup(self, embedding, scope, version):
+        """
+        Return the cached answer to the question with this embedding, or None. Every lookup is
+        reported with emit_answer_cache_metrics().
+        """
+        started = time.perf_counter()
+        try:
+            row = self.db.fetchone(LOOKUP_QUERY, {
+                "embedding": embedding,
+                "jurisdiction": scope[0],
+                "province": scope[1],
+                "statute": scope[2],
+                "version": version,
+            }, label="answer_cache_lookup")
+        except Exception as e:
+            logger.error(f"Error reading answer cache: {e}")
+            emit_answer_cache_metrics("error", (time.perf_counter() - started) * 1000)
+            return None
+
+        lookup_ms = (time.perf_counter() - started) * 1000
+        if row is None or row[1] < self.threshold:
+            emit_answer_cache_metrics("miss", lookup_ms)
+            return None
+        answer, similarity, generation_ms = row
+        logger.info(f"Answer cache hit (similarity {similarity:.3f})")
+        emit_answer_cache_metrics("hit", lookup_ms, max(0.0, (generation_ms or 0) - lookup_ms))
+        return answer
+
+    def store(self, question, embedding, answer, case_description, scope, version, generation_ms):
+        """Store an answer, if it is case-independent, pruning the scope's stale entries."""
+        if not is_case_independent(answer, case_description, scope):
+            logger.info("Answer refers to the case, not caching it")
+            return False
+        params = {
+            "jurisdiction": scope[0],
+            "province": scope[1],
+            "statute": scope[2],
+            "version": version,
+            "question": question,
+            "embedding": embedding,
+            "answer": answer,
+            "generation_ms": int(generation_ms),
+            "ttl": self.ttl_seconds,
+        }
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(PRUNE_QUERY, params, label="answer_cache_prune")
+                    cur.execute(STORE_QUERY, params, label="answer_cache_store")
+        except Exception as e:
+            logger.error(f"Error writing answer cache: {e}")
+            return False
+        return True
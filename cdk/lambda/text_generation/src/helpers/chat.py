@@ -6,6 +6,7 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import DynamoDBChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.pydantic_v1 import BaseModel, Field
 
 class LLM_evaluation(BaseModel):
@@ -61,6 +62,8 @@ def get_bedrock_llm(
     bedrock_llm_id: str,
     temperature: float = 0,
     max_tokens: int = 4096,
+    client=None,
+    callbacks=None,
 ) -> ChatBedrock:
     """
     Retrieve a Bedrock LLM instance based on the provided model ID.
@@ -69,6 +72,8 @@ def get_bedrock_llm(
     bedrock_llm_id (str): The unique identifier for the Bedrock LLM model.
     temperature (float, optional): The temperature parameter for the LLM, controlling 
     the randomness of the generated responses. Defaults to 0.
+    client (BedrockRuntime, optional): The container's shared Bedrock runtime client.
+    callbacks (list, optional): Callbacks of the LLM, such as ModelRouter.callbacks() of its route.
 
     Returns:
     ChatBedrock: An instance of the Bedrock LLM corresponding to the provided model ID.
@@ -76,6 +81,8 @@ def get_bedrock_llm(
     return ChatBedrock(
         model_id=bedrock_llm_id,
         model_kwargs=dict(temperature=temperature, max_tokens=max_tokens),
+        client=client,
+        callbacks=callbacks,
     )
 
 def get_student_query(raw_query: str) -> str:
@@ -237,6 +244,24 @@ def get_llm_output(response: str) -> dict:
         llm_output=response
     )
 
+def add_cached_response(table_name: str, case_id: str, query: str, answer: str) -> dict:
+    """
+    Records a question answered from the answer cache in the chat history, as the RAG chain
+    would have, so later turns of the session see it.
+
+    Args:
+    table_name (str): The DynamoDB table name where the conversation history is stored.
+    case_id (str): The unique identifier for the chat session.
+    query (str): The student's query string, as passed to get_response.
+    answer (str): The cached answer.
+
+    Returns:
+    dict: A dictionary containing the answer, as returned by get_response.
+    """
+    history = DynamoDBChatMessageHistory(table_name=table_name, session_id=case_id)
+    history.add_messages([HumanMessage(content=query), AIMessage(content=answer)])
+    return get_llm_output(answer)
+
 def split_into_sentences(paragraph: str) -> list[str]:
     """
     Splits a given paragraph into individual sentences using a regular expression to detect sentence boundaries.
@@ -256,7 +281,7 @@ def split_into_sentences(paragraph: str) -> list[str]:
     sentences = re.split(sentence_endings, paragraph)
     return sentences
 
-def update_session_name(table_name: str, session_id: str, bedrock_llm_id: str) -> str:
+def update_session_name(table_name: str, session_id: str, bedrock_llm_id: str, client=None) -> str:
     """
     Check if both the LLM and the student have exchanged exactly one message each.
     If so, generate and return a session name using the content of the student's first message
@@ -319,7 +344,8 @@ def update_session_name(table_name: str, session_id: str, bedrock_llm_id: str) -
     llm_message = ai_messages[0].get('M', {}).get('data', {}).get('M', {}).get('content', {}).get('S', "")
     
     llm = BedrockLLM(
-                        model_id = bedrock_llm_id
+                        model_id = bedrock_llm_id,
+                        client = client
                     )
     
     title_system_prompt = """
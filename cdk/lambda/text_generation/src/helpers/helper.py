@@ -16,7 +16,9 @@ def get_vectorstore(
     user: str, 
     password: str, 
     host: str, 
-    port: int
+    port: int,
+    create_extension: bool = True,
+    connect_timeout: Optional[int] = None
 ) -> Optional[PGVector]:
     """
     Initialize and return a PGVector instance.
@@ -29,6 +31,8 @@ def get_vectorstore(
     password (str): The database password.
     host (str): The database host.
     port (int): The database port.
+    create_extension (bool): Whether to create the vector extension, which a read replica cannot do.
+    connect_timeout (Optional[int]): Seconds to wait for a connection before giving up.
     
     Returns:
     Optional[PGVector]: The initialized PGVector instance, or None if an error occurred.
@@ -37,13 +41,16 @@ def get_vectorstore(
         connection_string = (
             f"postgresql+psycopg://{user}:{password}@{host}:{port}/{dbname}"
         )
+        if connect_timeout is not None:
+            connection_string += f"?connect_timeout={connect_timeout}"
 
         logger.info("Initializing the VectorStore")
         vectorstore = PGVector(
             embeddings=embeddings,
             collection_name=collection_name,
             connection=connection_string,
-            use_jsonb=True
+            use_jsonb=True,
+            create_extension=create_extension
         )
 
         logger.info("VectorStore initialized")
@@ -5,6 +5,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_history_aware_retriever
 
 from helpers.helper import get_vectorstore
+from helpers.db import READER_CONNECT_TIMEOUT
 
 def get_vectorstore_retriever(
     llm,
@@ -16,21 +17,41 @@ def get_vectorstore_retriever(
 
     Args:
     llm: The language model instance used to generate the response.
-    vectorstore_config_dict (Dict[str, str]): The configuration dictionary for the vectorstore, including parameters like collection name, database name, user, password, host, and port.
+    vectorstore_config_dict (Dict[str, str]): The configuration dictionary for the vectorstore, including parameters like collection name, database name, user, password, host, port and an optional reader_host.
     embeddings (BedrockEmbeddings): The embeddings instance used to process the documents.
 
     Returns:
     VectorStoreRetriever: A history-aware retriever instance.
     """
-    vectorstore, _ = get_vectorstore(
-        collection_name=vectorstore_config_dict['collection_name'],
-        embeddings=embeddings,
-        dbname=vectorstore_config_dict['dbname'],
-        user=vectorstore_config_dict['user'],
-        password=vectorstore_config_dict['password'],
-        host=vectorstore_config_dict['host'],
-        port=int(vectorstore_config_dict['port'])
-    )
+    vectorstore = None
+    reader_host = vectorstore_config_dict.get('reader_host')
+    if reader_host:
+        # Similarity search only reads, so it runs on the reader. A collection that has not
+        # reached the reader yet cannot be created there, so it falls back to the writer.
+        result = get_vectorstore(
+            collection_name=vectorstore_config_dict['collection_name'],
+            embeddings=embeddings,
+            dbname=vectorstore_config_dict['dbname'],
+            user=vectorstore_config_dict['user'],
+            password=vectorstore_config_dict['password'],
+            host=reader_host,
+            port=int(vectorstore_config_dict['port']),
+            create_extension=False,
+            connect_timeout=READER_CONNECT_TIMEOUT
+        )
+        if result is not None:
+            vectorstore, _ = result
+
+    if vectorstore is None:
+        vectorstore, _ = get_vectorstore(
+            collection_name=vectorstore_config_dict['collection_name'],
+            embeddings=embeddings,
+            dbname=vectorstore_config_dict['dbname'],
+            user=vectorstore_config_dict['user'],
+            password=vectorstore_config_dict['password'],
+            host=vectorstore_config_dict['host'],
+            port=int(vectorstore_config_dict['port'])
+        )
 
     retriever = vectorstore.as_retriever()
 
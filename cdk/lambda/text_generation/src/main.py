@@ -3,13 +3,18 @@ import json
 import boto3
 import botocore
 import logging
-import psycopg
+import math
 import time
 import uuid
 from langchain_aws import BedrockEmbeddings
 
 from helpers.vectorstore import get_vectorstore_retriever
-from helpers.chat import get_bedrock_llm, get_initial_student_query, get_student_query, create_dynamodb_history_table, get_response
+from helpers.chat import get_bedrock_llm, get_initial_student_query, get_student_query, create_dynamodb_history_table, get_response, add_cached_response
+from helpers.db import Database, get_parameter, get_secret
+from helpers.admission import AdmissionController, estimate_tokens
+from helpers.bedrock import BedrockRuntime
+from helpers.routing import ModelRouter
+from helpers.answer_cache import AnswerCache, cache_scope, cache_version
 # # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
@@ -18,17 +23,28 @@ logger = logging.getLogger()
 DB_SECRET_NAME = os.environ["SM_DB_CREDENTIALS"]
 REGION = os.environ["REGION"]
 RDS_PROXY_ENDPOINT = os.environ["RDS_PROXY_ENDPOINT"]
+DB_READER_ENDPOINT = os.environ.get("DB_READER_ENDPOINT")
 BEDROCK_LLM_PARAM = os.environ["BEDROCK_LLM_PARAM"]
 EMBEDDING_MODEL_PARAM = os.environ["EMBEDDING_MODEL_PARAM"]
 TABLE_NAME_PARAM = os.environ["TABLE_NAME_PARAM"]
 # AWS Clients
-secrets_manager_client = boto3.client("secretsmanager")
-ssm_client = boto3.client("ssm", region_name=REGION)
-bedrock_runtime = boto3.client("bedrock-runtime", region_name=REGION)
+# Model calls and guardrail checks share one pooled, throttle-aware Bedrock runtime client
+bedrock_runtime = BedrockRuntime(REGION)
+
+# Model and token budget of each LLM call, from the routing table in SSM
+router = ModelRouter(bedrock_runtime)
+
+# Pooled database connections, reused across invocations in this container
+db = Database(DB_SECRET_NAME, RDS_PROXY_ENDPOINT, DB_READER_ENDPOINT)
+
+# Token-bucket admission control in front of Bedrock, shared with the other generation functions
+admission = AdmissionController()
+
+# Semantic cache of answers to general questions, shared by cases of the same jurisdiction, province
+# and statute; off unless ANSWER_CACHE_ENABLED is set
+answer_cache = AnswerCache(db)
 
 # Cached resources
-connection = None
-db_secret = None
 BEDROCK_LLM_ID = None
 EMBEDDING_MODEL_ID = None
 TABLE_NAME = None
@@ -38,34 +54,6 @@ embeddings = None
 
 
 
-def get_secret(secret_name, expect_json=True):
-    global db_secret
-    if db_secret is None:
-        try:
-            response = secrets_manager_client.get_secret_value(SecretId=secret_name)["SecretString"]
-            db_secret = json.loads(response) if expect_json else response
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON for secret : {e}")
-            raise ValueError(f"Secret is not properly formatted as JSON.")
-        except Exception as e:
-            logger.error("Error fetching secret. Please check the system logs for more details.")
-            raise
-    return db_secret
-
-
-def get_parameter(param_name, cached_var):
-    """
-    Fetch a parameter value from Systems Manager Parameter Store.
-    """
-    if cached_var is None:
-        try:
-            response = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
-            cached_var = response["Parameter"]["Value"]
-        except Exception as e:
-            logger.error(f"Error fetching parameter {param_name}: {e}")
-            raise
-    return cached_var
-
 def initialize_constants():
     global BEDROCK_LLM_ID, EMBEDDING_MODEL_ID, TABLE_NAME, embeddings
     BEDROCK_LLM_ID = get_parameter(BEDROCK_LLM_PARAM, BEDROCK_LLM_ID)
@@ -81,29 +69,6 @@ def initialize_constants():
     
     create_dynamodb_history_table(TABLE_NAME)
 
-def connect_to_db():
-    global connection
-    if connection is None or connection.closed:
-        try:
-            secret = get_secret(DB_SECRET_NAME)
-            connection_params = {
-                'dbname': secret["dbname"],
-                'user': secret["username"],
-                'password': secret["password"],
-                'host': RDS_PROXY_ENDPOINT,
-                'port': secret["port"]
-            }
-            connection_string = " ".join([f"{key}={value}" for key, value in connection_params.items()])
-            connection = psycopg.connect(connection_string)
-            logger.info("Connected to the database!")
-        except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
-            raise
-    return connection
-
 def setup_guardrail(guardrail_name: str) -> tuple[str, str]:
     """
     Ensure a guardrail with a given name is created and published if it doesn't exist.
@@ -188,25 +153,14 @@ You are NOT allowed to hallucinate, informational accuracy and being up-to-date
 Do not indent your text.'''
 
 def get_system_prompt():
-    # Connect to the database
-    connection = connect_to_db()
-    if connection is None:
-        raise ValueError("Database connection failed")
-
     try:
-        cur = connection.cursor()
-        logger.info("Connected to RDS instance!")
-
         # Query to get the latest system prompt based on the time_created
-        cur.execute("""
+        result = db.fetchone("""
             SELECT prompt
             FROM system_prompt
             ORDER BY time_created DESC
             LIMIT 1;
-        """)
-        
-        result = cur.fetchone()
-        cur.close()
+        """, label="get_system_prompt", prepare=True, reader=True)
 
         if result:
             # Extract the prompt from the query result
@@ -218,31 +172,16 @@ def get_system_prompt():
             return None
     except Exception as e:
         logger.error(f"Error fetching system prompt: {e}")
-        if cur:
-            cur.close()
-        connection.rollback()
         return None
 
 def get_audio_details(case_id):
-    connection = connect_to_db()
-    if connection is None:
-        logger.error("No database connection available.")
-        return {
-            "statusCode": 500,
-            "body": json.dumps("Database connection failed.")
-        }
-    
     try:
-        cur = connection.cursor()
-        logger.info("Connected to RDS instance!")
-        cur.execute("""
+        result = db.fetchone("""
             SELECT case_description
             FROM "cases"
             WHERE case_id = %s;
-        """, (case_id,))        
-        result = cur.fetchone()
-        logger.info(f"Query result: {result}")        
-        cur.close()
+        """, (case_id,), label="get_audio_details", reader=True)
+        logger.info(f"Query result: {result}")
         if result:
             audio_description = result[0]
             logger.info(f"Audio description found for case_id {case_id}: {audio_description}")
@@ -252,34 +191,17 @@ def get_audio_details(case_id):
             return None
     except Exception as e:
         logger.error(f"Error fetching audio description: {e}")
-        if cur:
-            cur.close()
-        connection.rollback()
         return None
 
 def get_case_details(case_id):
-    connection = connect_to_db()
-    if connection is None:
-        logger.error("No database connection available.")
-        return {
-            "statusCode": 500,
-            "body": json.dumps("Database connection failed.")
-        }
-    
     try:
-        cur = connection.cursor()
-        logger.info("Connected to RDS instance!")
-        cur.execute("""
+        result = db.fetchone("""
             SELECT case_title, case_type, jurisdiction, case_description, province, statute
             FROM "cases"
             WHERE case_id = %s;
-        """, (case_id,))
-
-        result = cur.fetchone()
+        """, (case_id,), label="get_case_details", prepare=True, reader=True)
         logger.info(f"Query result: {result}")
 
-        cur.close()
-
         if result:
             case_title, case_type, jurisdiction, case_description, province, statute = result
             logger.info(f"Case details found for case_id {case_id}: "
@@ -291,15 +213,13 @@ def get_case_details(case_id):
 
     except Exception as e:
         logger.error(f"Error fetching case details: {e}")
-        if cur:
-            cur.close()
-        connection.rollback()
         return None, None, None, None
 
 
 def handler(event, context):
     logger.info("Text Generation Lambda function is called!")
     initialize_constants()
+    bedrock_runtime.set_deadline(context)
     
     query_params = event.get("queryStringParameters", {})
     case_id = query_params.get("case_id", "")
@@ -337,8 +257,26 @@ def handler(event, context):
     body = {} if event.get("body") is None else json.loads(event.get("body"))
     question = body.get("message_content", "")
 
-    
-    
+    # Shed the turn before any Bedrock call if the student or the service is over its token rate
+    user_id = (event.get("requestContext") or {}).get("authorizer", {}).get("userId")
+    admitted, retry_after = admission.admit(
+        user_id, "chat", estimate_tokens("chat", system_prompt, case_description, question)
+    )
+    if not admitted:
+        logger.info(f"Shedding chat turn for case {case_id}, retry after {retry_after:.1f} s")
+        return {
+            'statusCode': 429,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Headers": "*",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "*",
+                "Access-Control-Expose-Headers": "Retry-After",
+                "Retry-After": str(math.ceil(retry_after)),
+            },
+            'body': json.dumps({"error": "Too many requests, please try again shortly."})
+        }
+
     if not question:
         logger.info(f"Start of conversation. Creating conversation history table in DynamoDB.")
         student_query = get_initial_student_query(case_type, jurisdiction, case_description)
@@ -381,8 +319,14 @@ def handler(event, context):
                 "body": json.dumps({"error": error_message})
             }
     try:
-        logger.info("Creating Bedrock LLM instance.")
-        llm = get_bedrock_llm(BEDROCK_LLM_ID)
+        logger.info("Creating Bedrock LLM instances.")
+        # Rewriting the question for retrieval may move to a faster model; the answer keeps its model
+        rewrite_route = router.route("question_rewrite", BEDROCK_LLM_ID, 4096)
+        rewrite_llm = get_bedrock_llm(rewrite_route.model_id, max_tokens=rewrite_route.max_tokens,
+                                      client=bedrock_runtime, callbacks=router.callbacks(rewrite_route))
+        answer_route = router.route("answer", BEDROCK_LLM_ID, 4096)
+        llm = get_bedrock_llm(answer_route.model_id, max_tokens=answer_route.max_tokens,
+                              client=bedrock_runtime, callbacks=router.callbacks(answer_route))
     except Exception as e:
         logger.error(f"Error getting LLM from Bedrock: {e}")
         return {
@@ -396,6 +340,34 @@ def handler(event, context):
             'body': json.dumps('Error getting LLM from Bedrock')
         }
 
+    # A general question asked before in another case of the same scope is answered from the cache
+    cache_entry = None
+    if question:
+        scope = cache_scope(jurisdiction, province, statute)
+        if answer_cache.accepts(question, case_description, scope):
+            try:
+                question_embedding = embeddings.embed_query(question)
+                version = cache_version(system_prompt, answer_route.model_id, EMBEDDING_MODEL_ID)
+                answer = answer_cache.lookup(question_embedding, scope, version)
+                if answer is not None:
+                    response = add_cached_response(TABLE_NAME, case_id, student_query, answer)
+                    logger.info("Returning the cached response.")
+                    return {
+                        "statusCode": 200,
+                        "headers": {
+                            "Content-Type": "application/json",
+                            "Access-Control-Allow-Headers": "*",
+                            "Access-Control-Allow-Origin": "*",
+                            "Access-Control-Allow-Methods": "*",
+                        },
+                        "body": json.dumps({
+                            "llm_output": response
+                        })
+                    }
+                cache_entry = (scope, question_embedding, version)
+            except Exception as e:
+                logger.error(f"Error answering from the answer cache: {e}")
+
     try:
         logger.info("Retrieving vectorstore config.")
         db_secret = get_secret(DB_SECRET_NAME)
@@ -405,6 +377,7 @@ def handler(event, context):
             'user': db_secret["username"],
             'password': db_secret["password"],
             'host': RDS_PROXY_ENDPOINT,
+            'reader_host': DB_READER_ENDPOINT,
             'port': db_secret["port"]
         }
     except Exception as e:
@@ -424,7 +397,7 @@ def handler(event, context):
         logger.info("Creating history-aware retriever.")
 
         history_aware_retriever = get_vectorstore_retriever(
-            llm=llm,
+            llm=rewrite_llm,
             vectorstore_config_dict=vectorstore_config_dict,
             embeddings=embeddings
         )
@@ -443,7 +416,7 @@ def handler(event, context):
 
     try:
         logger.info("Generating response from the LLM.")
-        
+        generation_started = time.perf_counter()
         response = get_response(
                 query=student_query,
                 province=province,
@@ -457,6 +430,11 @@ def handler(event, context):
                 jurisdiction=jurisdiction,
                 case_description=case_description  ) 
         print("response: ", response)
+
+        if cache_entry is not None:
+            scope, question_embedding, version = cache_entry
+            answer_cache.store(question, question_embedding, response["llm_output"], case_description, scope, version,
+                               (time.perf_counter() - generation_started) * 1000)
         
     except Exception as e:
         logger.error(f"Error getting response from AI: {e}")
@@ -0,0 +1,322 @@
+"""
+Build the Python Lambda layers from the import graph of the handlers that use them.
+
+For each layer, the pinned requirements are installed for the Lambda platform into a staging
+directory. The script then follows the imports of each handler that uses the layer, through the
+handler's own modules and into the installed packages, and keeps only the distributions that are
+actually imported. From those it strips tests, type stubs, C sources and documentation that
+nothing imports, and precompiles every module to .pyc. Layers are mounted read-only under /opt,
+so without precompiled bytecode every cold start compiles the layer's modules again.
+
+For each layer it reports the zipped and unpacked size, and for each handler the import time of
+its third-party modules in a fresh interpreter, with and without the precompiled bytecode.
+
+Must be run with the same Python minor version as the Lambda runtime, since .pyc files are
+version specific.
+
+Usage:
+    python layers/build_layers.py [layer ...] [--find-links DIR]
+    (run from cdk/; builds every layer when none is named)
+"""
+import os
+import ast
+import sys
+import shutil
+import zipfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+import compileall
+import py_compile
+
+LAYERS_DIR = os.path.dirname(os.path.abspath(__file__))
+CDK_DIR = os.path.dirname(LAYERS_DIR)
+
+RUNTIME_VERSION = (3, 11)
+PLATFORM = "manylinux2014_x86_64"
+SITE_PACKAGES = f"python/lib/python{RUNTIME_VERSION[0]}.{RUNTIME_VERSION[1]}/site-packages"
+
+# Layers built by this script: the pinned requirements, the handlers that use the layer (relative
+# to cdk/), and any modules they import dynamically, which the import graph cannot see
+LAYERS = {
+    "psycopg2": {
+        "requirements": ["psycopg2-binary==2.9.10"],
+        "handlers": [
+            "lambda/initializer/initializer.py",
+            "lambda/caseArchive/caseArchive.py",
+        ],
+        "dynamic_imports": [],
+    },
+}
+
+# Already in the Lambda Python runtime, so never vendored
+RUNTIME_PROVIDED = {"boto3", "botocore", "s3transfer", "jmespath", "urllib3", "dateutil", "six"}
+
+# Files that are not needed at runtime unless something imports them
+STRIP_DIRS = {"tests", "test", "testing", "docs", "doc", "examples", "benchmarks", "__pycache__"}
+STRIP_SUFFIXES = {".pyi", ".pyx", ".pxd", ".c", ".h", ".cpp", ".md", ".rst", ".pyc", ".typed"}
+
+# Fixed timestamp for zip entries, so an unchanged layer keeps its asset hash and is not redeployed
+ZIP_DATE_TIME = (2020, 1, 1, 0, 0, 0)
+
+IMPORT_TIMING_RUNS = 5
+
+
+def install(requirements, target, find_links=None):
+    command = [
+        sys.executable, "-m", "pip", "install", "--quiet", "--target", target,
+        "--platform", PLATFORM, "--implementation", "cp",
+        "--python-version", f"{RUNTIME_VERSION[0]}.{RUNTIME_VERSION[1]}",
+        "--only-binary=:all:", "--no-compile",
+    ]
+    if find_links:
+        command += ["--no-index", "--find-links", find_links]
+    subprocess.run(command + requirements, check=True)
+
+
+def imported_modules(path, package=None):
+    """
+    Return the absolute names of the modules a source file imports, resolving relative imports
+    against its package. For "from a import b" both a and a.b are returned, since b may be a
+    submodule.
+    """
+    with open(path, "rb") as f:
+        try:
+            tree = ast.parse(f.read(), path)
+        except SyntaxError:
+            return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if not package:
+                    continue
+                parts = package.split(".")
+                base = ".".join(parts[: len(parts) - node.level + 1])
+                module = f"{base}.{node.module}" if node.module else base
+            else:
+                module = node.module
+            names.add(module)
+            names.update(f"{module}.{alias.name}" for alias in node.names if alias.name != "*")
+    return names
+
+
+def find_module(root, name):
+    """Return the file that defines a module under root, or None."""
+    base = os.path.join(root, *name.split("."))
+    if os.path.isfile(os.path.join(base, "__init__.py")):
+        return os.path.join(base, "__init__.py")
+    if os.path.isfile(base + ".py"):
+        return base + ".py"
+    directory, stem = os.path.split(base)
+    if os.path.isdir(directory):
+        for file_name in os.listdir(directory):
+            if file_name.startswith(stem + ".") and file_name.endswith(".so"):
+                return os.path.join(directory, file_name)
+    return None
+
+
+def import_closure(handlers, site_packages, dynamic_imports):
+    """
+    Follow the imports of the handlers through their own modules and the installed packages.
+
+    Returns:
+        tuple: (set of installed files that are imported, set of third-party top-level modules
+                the handlers import directly)
+    """
+    visited = set()
+    roots = set()
+    queue = []
+    for handler in handlers:
+        queue.append((os.path.join(CDK_DIR, handler), None, os.path.dirname(os.path.join(CDK_DIR, handler))))
+    queue += [(None, name, None) for name in dynamic_imports]
+
+    while queue:
+        path, name, local_dir = queue.pop()
+        if path is None:
+            path = find_module(site_packages, name)
+            if path is None or path in visited:
+                continue
+        elif path in visited:
+            continue
+        visited.add(path)
+        if not path.endswith(".py"):
+            continue
+
+        if local_dir:
+            package = None
+        else:
+            relative = os.path.relpath(path, site_packages)[: -len(".py")].replace(os.sep, ".")
+            package = relative[: -len(".__init__")] if relative.endswith(".__init__") else relative.rpartition(".")[0]
+
+        for module in imported_modules(path, package):
+            top = module.split(".")[0]
+            if top in sys.stdlib_module_names or top in RUNTIME_PROVIDED:
+                continue
+            if local_dir:
+                if find_module(local_dir, top):
+                    local = find_module(local_dir, module)
+                    if local:
+                        queue.append((local, None, local_dir))
+                    continue
+                roots.add(top)
+            # Every package on the way to a module is imported with it
+            parts = module.split(".")
+            for i in range(1, len(parts) + 1):
+                queue.append((None, ".".join(parts[:i]), None))
+
+    return {p for p in visited if p.startswith(site_packages)}, roots
+
+
+def distribution_files(site_packages):
+    """Map each installed distribution's .dist-info directory to the files listed in its RECORD."""
+    distributions = {}
+    for entry in os.listdir(site_packages):
+        if not entry.endswith(".dist-info"):
+            continue
+        files = set()
+        with open(os.path.join(site_packages, entry, "RECORD"), encoding="utf-8") as record:
+            for line in record:
+                path = line.rsplit(",", 2)[0]
+                if path:
+                    files.add(os.path.normpath(os.path.join(site_packages, path)))
+        distributions[entry] = files
+    return distributions
+
+
+def prune(site_packages, used_files):
+    """
+    Delete the distributions none of whose files are imported, then strip the files of the
+    remaining ones that are not needed at runtime. Shared libraries are always kept, since
+    extension modules load them without an import.
+    """
+    removed = []
+    for dist_info, files in distribution_files(site_packages).items():
+        if files & used_files:
+            continue
+        for path in files:
+            if os.path.isfile(path):
+                os.remove(path)
+        shutil.rmtree(os.path.join(site_packages, dist_info), ignore_errors=True)
+        removed.append(dist_info)
+
+    for directory, subdirectories, file_names in os.walk(site_packages, topdown=False):
+        if os.path.basename(directory) in STRIP_DIRS and directory != site_packages:
+            if not any(p.startswith(directory + os.sep) for p in used_files):
+                shutil.rmtree(directory)
+                continue
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            if os.path.splitext(file_name)[1] in STRIP_SUFFIXES and path not in used_files:
+                os.remove(path)
+        if not os.listdir(directory) and directory != site_packages:
+            os.rmdir(directory)
+    return removed
+
+
+def precompile(site_packages):
+    """
+    Compile every module to .pyc. Unchecked hashes mean the interpreter loads them without
+    comparing source timestamps, which zip extraction does not preserve.
+    """
+    if not compileall.compile_dir(
+        site_packages, quiet=1, workers=0,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    ):
+        raise RuntimeError(f"Could not compile every module in {site_packages}")
+
+
+def write_zip(build_dir, zip_path):
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for directory, subdirectories, file_names in os.walk(build_dir):
+            subdirectories.sort()
+            for file_name in sorted(file_names):
+                path = os.path.join(directory, file_name)
+                info = zipfile.ZipInfo(os.path.relpath(path, build_dir), ZIP_DATE_TIME)
+                info.external_attr = (os.stat(path).st_mode & 0o777) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, "rb") as f:
+                    archive.writestr(info, f.read())
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def import_time_ms(site_packages, modules, bytecode):
+    """
+    Median time to import modules in a fresh interpreter, as on a cold start. Without bytecode,
+    writing .pyc files is disabled, as it is on the read-only layer mount.
+    """
+    script = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); t = time.perf_counter(); "
+        + "; ".join(f"import {m}" for m in sorted(modules))
+        + "; print(time.perf_counter() - t)"
+    )
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    timings = []
+    for _ in range(IMPORT_TIMING_RUNS):
+        if not bytecode:
+            for directory, subdirectories, _ in os.walk(site_packages):
+                if "__pycache__" in subdirectories:
+                    os.replace(os.path.join(directory, "__pycache__"), os.path.join(directory, "__pycache__.off"))
+        try:
+            out = subprocess.run([sys.executable, "-S", "-c", script, site_packages],
+                                 check=True, capture_output=True, text=True, env=env).stdout
+        finally:
+            if not bytecode:
+                for directory, subdirectories, _ in os.walk(site_packages):
+                    if "__pycache__.off" in subdirectories:
+                        os.replace(os.path.join(directory, "__pycache__.off"), os.path.join(directory, "__pycache__"))
+        timings.append(float(out) * 1000)
+    return statistics.median(timings)
+
+
+def build_layer(name, spec, find_links=None):
+    with tempfile.TemporaryDirectory() as build_dir:
+        site_packages = os.path.join(build_dir, SITE_PACKAGES)
+        install(spec["requirements"], site_packages, find_links)
+        installed_size = directory_size(build_dir)
+
+        used_files, roots = import_closure(spec["handlers"], site_packages, spec["dynamic_imports"])
+        removed = prune(site_packages, used_files)
+        precompile(site_packages)
+
+        zip_path = os.path.join(LAYERS_DIR, f"{name}.zip")
+        write_zip(build_dir, zip_path)
+
+        print(f"{name}: {os.path.getsize(zip_path) / 1e6:.1f} MB zipped, {directory_size(build_dir) / 1e6:.1f} MB "
+              f"unpacked ({installed_size / 1e6:.1f} MB as installed)")
+        if removed:
+            print(f"  not imported, removed: {', '.join(sorted(removed))}")
+        for handler in spec["handlers"]:
+            _, handler_roots = import_closure([handler], site_packages, [])
+            if not handler_roots:
+                print(f"  {handler}: imports nothing from this layer")
+                continue
+            cold = import_time_ms(site_packages, handler_roots, bytecode=False)
+            warm = import_time_ms(site_packages, handler_roots, bytecode=True)
+            print(f"  {handler}: import {', '.join(sorted(handler_roots))} in {warm:.1f} ms "
+                  f"({cold:.1f} ms without bytecode)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("layers", nargs="*", help=f"layers to build: {', '.join(LAYERS)} (default: all)")
+    parser.add_argument("--find-links", help="install from this directory of wheels instead of the index")
+    args = parser.parse_args()
+
+    if sys.version_info[:2] != RUNTIME_VERSION:
+        raise SystemExit(f"Run with Python {RUNTIME_VERSION[0]}.{RUNTIME_VERSION[1]} to match the Lambda runtime")
+    unknown = set(args.layers) - set(LAYERS)
+    if unknown:
+        parser.error(f"unknown layers: {', '.join(sorted(unknown))}")
+    for name in args.layers or LAYERS:
+        build_layer(name, LAYERS[name], args.find_links)
+
+
+if __name__ == "__main__":
+    main()
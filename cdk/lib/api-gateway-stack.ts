@@ -19,8 +19,11 @@ import { Asset } from "aws-cdk-lib/aws-s3-assets";
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as secretsmanager from "aws-cdk-lib/aws-secretsmanager";
 import * as ssm from "aws-cdk-lib/aws-ssm";
+import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
 import * as logs from "aws-cdk-lib/aws-logs";
 import * as codebuild from "aws-cdk-lib/aws-codebuild";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
 // At the top of your file with other imports
 import * as ecr from 'aws-cdk-lib/aws-ecr';
 import { Stack, StackProps } from "aws-cdk-lib";
@@ -75,6 +78,22 @@ export class ApiGatewayStack extends cdk.Stack {
               s3.HttpMethods.DELETE,
             ],
             allowedOrigins: ["*"],
+            // Browsers need the ETag of each uploaded part to complete multipart uploads
+            exposedHeaders: ["ETag"],
+          },
+        ],
+        // Discard the parts of multipart uploads that were never completed or aborted
+        lifecycleRules: [
+          { abortIncompleteMultipartUploadAfter: cdk.Duration.days(1) },
+          // Archived cases are rarely read; Glacier Instant Retrieval still restores them in milliseconds
+          {
+            prefix: "case-archives/",
+            transitions: [
+              {
+                storageClass: s3.StorageClass.GLACIER_INSTANT_RETRIEVAL,
+                transitionAfter: cdk.Duration.days(30),
+              },
+            ],
           },
         ],
         // When deleting the stack, the bucket will be deleted as well
@@ -601,9 +620,58 @@ export class ApiGatewayStack extends cdk.Stack {
 
 
 
+    // The student function gets its own role, so its conversation table and transcript grants are
+    // not shared with the functions that use lambdaRole
+    const studentFunctionRole = new iam.Role(this, `${id}-studentFunctionRole-${this.region}`, {
+      roleName: `${id}-studentFunctionRole-${this.region}`,
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+
+    // Grant access to the database credentials
+    db.secretPathUser.grantRead(studentFunctionRole);
+
+    // Grant access to EC2
+    studentFunctionRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          "ec2:CreateNetworkInterface",
+          "ec2:DescribeNetworkInterfaces",
+          "ec2:DeleteNetworkInterface",
+          "ec2:AssignPrivateIpAddresses",
+          "ec2:UnassignPrivateIpAddresses",
+        ],
+        resources: ["*"], // must be *
+      })
+    );
+
+    // Grant access to log
+    studentFunctionRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents",
+        ],
+        resources: ["arn:aws:logs:*:*:*"],
+      })
+    );
+
+    // Look up the signed in user's email
+    studentFunctionRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["cognito-idp:AdminGetUser"],
+        resources: [
+          `arn:aws:cognito-idp:${this.region}:${this.account}:userpool/${this.userPool.userPoolId}`,
+        ],
+      })
+    );
+
     const lambdaStudentFunction = new lambda.Function(this, `${id}-studentFunction`, {
       runtime: lambda.Runtime.NODEJS_20_X,
-      code: lambda.Code.fromAsset("lambda/lib"),
+      code: lambda.Code.fromAsset("lambda/lib", { exclude: ["benchmarks"] }),
       handler: "studentFunction.handler",
       timeout: Duration.seconds(300),
       vpc: vpcStack.vpc,
@@ -612,11 +680,12 @@ export class ApiGatewayStack extends cdk.Stack {
         RDS_PROXY_ENDPOINT: db.rdsProxyEndpoint,
         USER_POOL: this.userPool.userPoolId,
         MESSAGE_LIMIT: messageLimitParameter.parameterName,
+        AUDIO_BUCKET: audioStorageBucket.bucketName,
       },
       functionName: `${id}-studentFunction`,
       memorySize: 512,
       layers: [postgres],
-      role: lambdaRole,
+      role: studentFunctionRole,
     });
 
     // Allow access to DynamoDB Table for reading chat history
@@ -630,6 +699,15 @@ export class ApiGatewayStack extends cdk.Stack {
       })
     );
 
+    // Read and delete transcripts offloaded to S3 by the audio to text function
+    lambdaStudentFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["s3:GetObject", "s3:DeleteObject"],
+        resources: [`${audioStorageBucket.bucketArn}/stored-transcripts/*`],
+        effect: iam.Effect.ALLOW
+      })
+    );
+
     // Add the permission to the Lambda function's policy to allow API Gateway access
     lambdaStudentFunction.addPermission("AllowApiGatewayInvoke", {
       principal: new iam.ServicePrincipal("apigateway.amazonaws.com"),
@@ -655,7 +733,7 @@ export class ApiGatewayStack extends cdk.Stack {
       `${id}-instructorFunction`,
       {
         runtime: lambda.Runtime.NODEJS_20_X,
-        code: lambda.Code.fromAsset("lambda/lib"),
+        code: lambda.Code.fromAsset("lambda/lib", { exclude: ["benchmarks"] }),
         handler: "instructorFunction.handler",
         timeout: Duration.seconds(300),
         vpc: vpcStack.vpc,
@@ -794,8 +872,11 @@ export class ApiGatewayStack extends cdk.Stack {
             userPool: this.userPool,
             defaultAction: appsync.UserPoolDefaultAction.ALLOW
           }
-        }
-        // No additional authorization modes needed
+        },
+        // IAM lets backend functions publish notifications without a user token
+        additionalAuthorizationModes: [
+          { authorizationType: appsync.AuthorizationType.IAM },
+        ],
       },
       xrayEnabled: true,
     });
@@ -897,7 +978,7 @@ export class ApiGatewayStack extends cdk.Stack {
 
     const AutoSignupLambda = new lambda.Function(this, `${id}-addStudentOnSignUp`, {
       runtime: lambda.Runtime.NODEJS_20_X,
-      code: lambda.Code.fromAsset("lambda/lib"),
+      code: lambda.Code.fromAsset("lambda/lib", { exclude: ["benchmarks"] }),
       handler: "addStudentOnSignUp.handler",
       timeout: Duration.seconds(300),
       environment: {
@@ -921,8 +1002,10 @@ export class ApiGatewayStack extends cdk.Stack {
             tagOrDigest: "latest",      // or whatever tag you're using
           }
         ),
-        memorySize: 512,
-        timeout: cdk.Duration.seconds(300),
+        // Segmented mode decodes the whole recording to find silences and stages segments in /tmp
+        memorySize: 1024,
+        timeout: cdk.Duration.seconds(900),
+        ephemeralStorageSize: cdk.Size.gibibytes(2),
         vpc: vpcStack.vpc,
         functionName: `${id}-audioToTextFunc`,
         environment: {
@@ -931,10 +1014,26 @@ export class ApiGatewayStack extends cdk.Stack {
           RDS_PROXY_ENDPOINT: db.rdsProxyEndpoint,
           APPSYNC_API_URL: this.eventApi.graphqlUrl,
           REGION: this.region,
+          SEGMENT_SECONDS: "600",
+          SEGMENT_OVERLAP_SECONDS: "15",
+          SEGMENT_CLAIM_TIMEOUT_SECONDS: "10800",
+          // Transcripts larger than this are stored gzip-compressed in S3 instead of in Postgres
+          TRANSCRIPT_INLINE_MAX_BYTES: "65536",
         },
       }
     );
 
+    // Segmented transcriptions are prepared in an asynchronous invocation of the same function
+    audioToTextFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["lambda:InvokeFunction"],
+        resources: [
+          `arn:aws:lambda:${this.region}:${this.account}:function:${id}-audioToTextFunc`,
+        ],
+      })
+    );
+
 
     // textToLlmQueue.grantSendMessages(audioToTextFunction);
 
@@ -954,6 +1053,7 @@ export class ApiGatewayStack extends cdk.Stack {
       })
     );
 
+    // Transcribe writes job output under transcripts/ in this bucket with the caller's permissions
     audioToTextFunction.addToRolePolicy(
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
@@ -1003,9 +1103,33 @@ export class ApiGatewayStack extends cdk.Stack {
       })
     );
 
+    // Complete transcriptions when Transcribe reports the job state change, instead of polling
+    new events.Rule(this, `${id}-TranscribeJobStateRule`, {
+      eventPattern: {
+        source: ["aws.transcribe"],
+        detailType: ["Transcribe Job State Change"],
+        detail: {
+          TranscriptionJobStatus: ["COMPLETED", "FAILED"],
+          TranscriptionJobName: [{ prefix: "transcription-" }],
+        },
+      },
+      targets: [new targets.LambdaFunction(audioToTextFunction)],
+    });
+
+    // Allow the completion stage to publish notifications with IAM auth
+    audioToTextFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["appsync:GraphQL"],
+        resources: [
+          `arn:aws:appsync:${this.region}:${this.account}:apis/${this.eventApi.apiId}/types/Mutation/fields/sendNotification`,
+        ],
+      })
+    );
+
     const adjustUserRoles = new lambda.Function(this, `${id}-adjustUserRoles`, {
       runtime: lambda.Runtime.NODEJS_20_X,
-      code: lambda.Code.fromAsset("lambda/lib"),
+      code: lambda.Code.fromAsset("lambda/lib", { exclude: ["benchmarks"] }),
       handler: "adjustUserRoles.handler",
       timeout: Duration.seconds(300),
       environment: {
@@ -1042,7 +1166,7 @@ export class ApiGatewayStack extends cdk.Stack {
 
     const preSignupLambda = new lambda.Function(this, `preSignupLambda`, {
       runtime: lambda.Runtime.NODEJS_20_X,
-      code: lambda.Code.fromAsset("lambda/lib"),
+      code: lambda.Code.fromAsset("lambda/lib", { exclude: ["benchmarks"] }),
       handler: "preSignup.handler",
       timeout: Duration.seconds(300),
       environment: {
@@ -1168,6 +1292,12 @@ export class ApiGatewayStack extends cdk.Stack {
       stringValue: "meta.llama3-70b-instruct-v1:0",
     });
 
+    const titleLLMParameter = new ssm.StringParameter(this, "TitleLLMParameter", {
+      parameterName: `/${id}/LAT/TitleLLMId`,
+      description: "Parameter containing the smaller Bedrock LLM ID used for case titles",
+      stringValue: "meta.llama3-8b-instruct-v1:0",
+    });
+
     const embeddingModelParameter = new ssm.StringParameter(this, "EmbeddingModelParameter", {
       parameterName: `/${id}/LAT/EmbeddingModelId`,
       description: "Parameter containing the Embedding Model ID",
@@ -1180,6 +1310,38 @@ export class ApiGatewayStack extends cdk.Stack {
       stringValue: "DynamoDB-Conversation-Table",
     });
 
+    // Model, token budget and latency budget of each LLM call site. A site without a model uses
+    // the Bedrock or title LLM parameter; one with a fallback moves to it while its model is slow.
+    const modelRoutingParameter = new ssm.StringParameter(this, "ModelRoutingParameter", {
+      parameterName: `/${id}/LAT/ModelRouting`,
+      description: "Parameter containing the routing table of the LLM call sites",
+      stringValue: JSON.stringify({
+        question_rewrite: {
+          fallback: "meta.llama3-8b-instruct-v1:0",
+          max_tokens: 256,
+          latency_budget_ms: 2000,
+        },
+        answer: { max_tokens: 4096, latency_budget_ms: 20000 },
+        session_name: { max_tokens: 30, latency_budget_ms: 2000 },
+        case_title: { max_tokens: 150, latency_budget_ms: 3000 },
+        summary: { max_tokens: 2048, latency_budget_ms: 30000 },
+      }),
+    });
+
+    // Per-user and global token buckets for admission control in front of Bedrock
+    const admissionTable = new dynamodb.Table(this, `${id}-AdmissionTable`, {
+      partitionKey: { name: "BucketId", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: "ExpiresAt",
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    /**
+     * Optional semantic cache of answers to general questions, enabled with -c answerCache=true.
+     */
+    const answerCacheContext = this.node.tryGetContext("answerCache");
+    const answerCacheEnabled = answerCacheContext === true || answerCacheContext === "true";
+
     /**
      *
      * Create Lambda with container image for text generation workflow in RAG pipeline
@@ -1201,11 +1363,15 @@ export class ApiGatewayStack extends cdk.Stack {
         environment: {
           SM_DB_CREDENTIALS: db.secretPathAdminName,
           RDS_PROXY_ENDPOINT: db.rdsProxyEndpointAdmin,
+          DB_READER_ENDPOINT: db.readerEndpoint,
           REGION: this.region,
           BEDROCK_LLM_PARAM: bedrockLLMParameter.parameterName,
           EMBEDDING_MODEL_PARAM: embeddingModelParameter.parameterName,
           TABLE_NAME_PARAM: tableNameParameter.parameterName,
           TABLE_NAME: "DynamoDB-Conversation-Table",
+          ADMISSION_TABLE: admissionTable.tableName,
+          MODEL_ROUTING_PARAM: modelRoutingParameter.parameterName,
+          ANSWER_CACHE_ENABLED: String(answerCacheEnabled),
         },
       }
     );
@@ -1262,6 +1428,7 @@ export class ApiGatewayStack extends cdk.Stack {
       resources: [
         `arn:aws:bedrock:${this.region}::foundation-model/meta.llama3-70b-instruct-v1`,
         `arn:aws:bedrock:${this.region}::foundation-model/meta.llama3-70b-instruct-v1:0`,  // Explicitly add the versioned model
+        `arn:aws:bedrock:${this.region}::foundation-model/meta.llama3-8b-instruct-v1:0`,  // Case title model
         `arn:aws:bedrock:${this.region}::foundation-model/amazon.titan-embed-text-v2:0`,  // If using Titan
       ],
     });
@@ -1308,6 +1475,7 @@ export class ApiGatewayStack extends cdk.Stack {
           bedrockLLMParameter.parameterArn,
           embeddingModelParameter.parameterArn,
           tableNameParameter.parameterArn,
+          modelRoutingParameter.parameterArn,
         ],
       })
     );
@@ -1331,11 +1499,16 @@ export class ApiGatewayStack extends cdk.Stack {
         environment: {
           SM_DB_CREDENTIALS: db.secretPathAdminName,
           RDS_PROXY_ENDPOINT: db.rdsProxyEndpointAdmin,
+          DB_READER_ENDPOINT: db.readerEndpoint,
           REGION: this.region,
           BEDROCK_LLM_PARAM: bedrockLLMParameter.parameterName,
           EMBEDDING_MODEL_PARAM: embeddingModelParameter.parameterName,
           TABLE_NAME_PARAM: tableNameParameter.parameterName,
           TABLE_NAME: "DynamoDB-Conversation-Table",
+          TITLE_LLM_PARAM: titleLLMParameter.parameterName,
+          APPSYNC_API_URL: this.eventApi.graphqlUrl,
+          ADMISSION_TABLE: admissionTable.tableName,
+          MODEL_ROUTING_PARAM: modelRoutingParameter.parameterName,
         },
       }
     );
@@ -1352,10 +1525,28 @@ export class ApiGatewayStack extends cdk.Stack {
       sourceArn: `arn:aws:execute-api:${this.region}:${this.account}:${this.api.restApiId}/*/*/student*`,
     });
 
+    // Instructors reach the same function through the bulk case import endpoint
+    caseGenLambdaDockerFunc.addPermission("AllowApiGatewayInvokeInstructor", {
+      principal: new iam.ServicePrincipal("apigateway.amazonaws.com"),
+      action: "lambda:InvokeFunction",
+      sourceArn: `arn:aws:execute-api:${this.region}:${this.account}:${this.api.restApiId}/*/*/instructor/bulk_cases`,
+    });
+
 
     // Attach the corrected Bedrock policy to Lambda
     caseGenLambdaDockerFunc.addToRolePolicy(bedrockPolicyStatement);
 
+    // Allow the function to re-invoke itself asynchronously for title generation
+    caseGenLambdaDockerFunc.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["lambda:InvokeFunction"],
+        resources: [
+          `arn:aws:lambda:${this.region}:${this.account}:function:${id}-CaseLambdaDockerFunction`,
+        ],
+      })
+    );
+
     caseGenLambdaDockerFunc.addToRolePolicy(
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
@@ -1385,6 +1576,17 @@ export class ApiGatewayStack extends cdk.Stack {
       })
     );
 
+    // Allow the async title stage to publish notifications with IAM auth
+    caseGenLambdaDockerFunc.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["appsync:GraphQL"],
+        resources: [
+          `arn:aws:appsync:${this.region}:${this.account}:apis/${this.eventApi.apiId}/types/Mutation/fields/sendNotification`,
+        ],
+      })
+    );
+
     // Grant access to SSM Parameter Store for specific parameters
     caseGenLambdaDockerFunc.addToRolePolicy(
       new iam.PolicyStatement({
@@ -1394,6 +1596,8 @@ export class ApiGatewayStack extends cdk.Stack {
           bedrockLLMParameter.parameterArn,
           embeddingModelParameter.parameterArn,
           tableNameParameter.parameterArn,
+          titleLLMParameter.parameterArn,
+          modelRoutingParameter.parameterArn,
         ],
       })
     );
@@ -1416,11 +1620,14 @@ export class ApiGatewayStack extends cdk.Stack {
         environment: {
           SM_DB_CREDENTIALS: db.secretPathAdminName,
           RDS_PROXY_ENDPOINT: db.rdsProxyEndpointAdmin,
+          DB_READER_ENDPOINT: db.readerEndpoint,
           REGION: this.region,
           BEDROCK_LLM_PARAM: bedrockLLMParameter.parameterName,
           EMBEDDING_MODEL_PARAM: embeddingModelParameter.parameterName,
           TABLE_NAME_PARAM: tableNameParameter.parameterName,
           TABLE_NAME: "DynamoDB-Conversation-Table",
+          ADMISSION_TABLE: admissionTable.tableName,
+          MODEL_ROUTING_PARAM: modelRoutingParameter.parameterName,
         },
       }
     );
@@ -1472,23 +1679,33 @@ export class ApiGatewayStack extends cdk.Stack {
           bedrockLLMParameter.parameterArn,
           embeddingModelParameter.parameterArn,
           tableNameParameter.parameterArn,
+          modelRoutingParameter.parameterArn,
         ],
       })
     );
 
+    // Admission control takes tokens from the shared buckets before each Bedrock call
+    admissionTable.grantReadWriteData(textGenLambdaDockerFunc);
+    admissionTable.grantReadWriteData(caseGenLambdaDockerFunc);
+    admissionTable.grantReadWriteData(summaryLambdaDockerFunc);
+
     // Create the Lambda function for generating presigned URLs
     const generatePreSignedURL = new lambda.Function(
       this,
       `${id}-GeneratePreSignedURLFunction`,
       {
         runtime: lambda.Runtime.PYTHON_3_11,
-        code: lambda.Code.fromAsset("lambda/generatePreSignedURL"),
+        code: lambda.Code.fromAsset("lambda/generatePreSignedURL", {
+          exclude: ["benchmarks"],
+        }),
         handler: "generatePreSignedURL.lambda_handler",
         timeout: Duration.seconds(300),
         memorySize: 128,
         environment: {
           BUCKET: audioStorageBucket.bucketName,
           REGION: this.region,
+          PART_URL_EXPIRY: "3600",
+          MAX_BATCH_FILES: "100",
         },
         functionName: `${id}-GeneratePreSignedURLFunction`,
         layers: [powertoolsLayer],
@@ -1521,6 +1738,116 @@ export class ApiGatewayStack extends cdk.Stack {
 
 
 
+    // The archive function gets its own role, so its S3 and DynamoDB grants are not shared with the
+    // functions that use lambdaRole
+    const caseArchiveRole = new iam.Role(this, `${id}-caseArchiveRole-${this.region}`, {
+      roleName: `${id}-caseArchiveRole-${this.region}`,
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+
+    // Grant access to the database credentials
+    db.secretPathUser.grantRead(caseArchiveRole);
+
+    // Grant access to EC2
+    caseArchiveRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          "ec2:CreateNetworkInterface",
+          "ec2:DescribeNetworkInterfaces",
+          "ec2:DeleteNetworkInterface",
+          "ec2:AssignPrivateIpAddresses",
+          "ec2:UnassignPrivateIpAddresses",
+        ],
+        resources: ["*"], // must be *
+      })
+    );
+
+    // Grant access to log
+    caseArchiveRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents",
+        ],
+        resources: ["arn:aws:logs:*:*:*"],
+      })
+    );
+
+    // Moves closed cases and their chat history to compressed S3 archives, and restores them on demand
+    const caseArchiveFunction = new lambda.Function(
+      this,
+      `${id}-CaseArchiveFunction`,
+      {
+        runtime: lambda.Runtime.PYTHON_3_11,
+        code: lambda.Code.fromAsset("lambda/caseArchive", {
+          exclude: ["benchmarks"],
+        }),
+        handler: "caseArchive.lambda_handler",
+        timeout: Duration.seconds(900),
+        memorySize: 512,
+        vpc: vpcStack.vpc,
+        environment: {
+          SM_DB_CREDENTIALS: db.secretPathUser.secretName,
+          RDS_PROXY_ENDPOINT: db.rdsProxyEndpoint,
+          ARCHIVE_BUCKET: audioStorageBucket.bucketName,
+          TABLE_NAME_PARAM: tableNameParameter.parameterName,
+          REGION: this.region,
+          ARCHIVE_AFTER_DAYS: "120",
+          HISTORY_TTL_DAYS: "30",
+        },
+        functionName: `${id}-CaseArchiveFunction`,
+        layers: [psycopgLayer],
+        role: caseArchiveRole,
+      }
+    );
+
+    // Override the Logical ID of the Lambda Function to get ARN in OpenAPI
+    const cfnCaseArchiveFunction = caseArchiveFunction.node
+      .defaultChild as lambda.CfnFunction;
+    cfnCaseArchiveFunction.overrideLogicalId("caseArchiveFunction");
+
+    caseArchiveFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["s3:PutObject", "s3:GetObject", "s3:DeleteObject"],
+        resources: [`${audioStorageBucket.bucketArn}/case-archives/*`],
+      })
+    );
+
+    caseArchiveFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:DescribeTimeToLive",
+          "dynamodb:UpdateTimeToLive",
+        ],
+        resources: [
+          `arn:aws:dynamodb:${this.region}:${this.account}:table/DynamoDB-Conversation-Table`
+        ],
+      })
+    );
+
+    tableNameParameter.grantRead(caseArchiveFunction);
+
+    // Archive once a day, outside of teaching hours
+    new events.Rule(this, `${id}-CaseArchiveSchedule`, {
+      schedule: events.Schedule.cron({ minute: "0", hour: "8" }),
+      targets: [new targets.LambdaFunction(caseArchiveFunction)],
+    });
+
+    // Add the permission to the Lambda function's policy to allow API Gateway access
+    caseArchiveFunction.addPermission("AllowApiGatewayInvoke", {
+      principal: new iam.ServicePrincipal("apigateway.amazonaws.com"),
+      action: "lambda:InvokeFunction",
+      sourceArn: `arn:aws:execute-api:${this.region}:${this.account}:${this.api.restApiId}/*/*/student*`,
+    });
+
     // Get Log Group for dataIngestLambdaDockerFunc
     // let logGroup: logs.ILogGroup;
     // try {
@@ -24,6 +24,8 @@ interface CICDStackProps extends cdk.StackProps {
   environmentName?: string;
   lambdaFunctions: LambdaConfig[];
   pathFilters?: string[];
+  buildContext: string;   // Docker build context, holding every sourceDir and the shared code
+  sharedDirs?: string[];  // Code shared by the images; a change to it rebuilds every image
 }
 
 export class CICDStack extends cdk.Stack {
@@ -143,7 +145,7 @@ export class CICDStack extends cdk.Stack {
             type: codebuild.BuildEnvironmentVariableType.SECRETS_MANAGER,
             value: 'github-personal-access-token:my-github-token'
           },
-          PATH_FILTER: { value: lambda.sourceDir || 'unknown' },
+          PATH_FILTER: { value: [lambda.sourceDir, ...(props.sharedDirs ?? [])].join('|') },
         },
         buildSpec: codebuild.BuildSpec.fromObject({
           version: '0.2',
@@ -167,7 +169,7 @@ export class CICDStack extends cdk.Stack {
                 'echo "CHANGED_FILES=\\$(git diff --name-only \\$PREV_COMMIT HEAD)" >> check_and_build.sh',
                 'echo "echo \\"Changed files:\\"" >> check_and_build.sh',
                 'echo "echo \\"\\$CHANGED_FILES\\"" >> check_and_build.sh',
-                'echo "if ! echo \\"\\$CHANGED_FILES\\" | grep -q \\"^$PATH_FILTER/\\"; then" >> check_and_build.sh',
+                'echo "if ! echo \\"\\$CHANGED_FILES\\" | grep -qE \\"^($PATH_FILTER)/\\"; then" >> check_and_build.sh',
                 'echo "  echo \\"No changes in $PATH_FILTER — skipping build.\\"" >> check_and_build.sh',
                 'echo "  exit 1" >> check_and_build.sh',
                 'echo "fi" >> check_and_build.sh',
@@ -182,7 +184,7 @@ export class CICDStack extends cdk.Stack {
             build: {
               commands: [
                 'echo "Building Docker image..."',
-                `docker build -t $REPOSITORY_URI:$IMAGE_TAG $CODEBUILD_SRC_DIR/${lambda.sourceDir} -f $CODEBUILD_SRC_DIR/${lambda.sourceDir}/Dockerfile`
+                `docker build -t $REPOSITORY_URI:$IMAGE_TAG $CODEBUILD_SRC_DIR/${props.buildContext} -f $CODEBUILD_SRC_DIR/${lambda.sourceDir}/Dockerfile`
               ]
             },
             post_build: {
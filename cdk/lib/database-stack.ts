@@ -20,6 +20,7 @@ export class DatabaseStack extends Stack {
     public readonly rdsProxyEndpoint: string;
     public readonly rdsProxyEndpointTableCreator: string;
     public readonly rdsProxyEndpointAdmin: string;
+    public readonly readerEndpoint: string;
 
     constructor(scope: Construct, id: string, vpcStack: VpcStack, props?: StackProps) {
         super(scope, id, props);
@@ -208,5 +209,33 @@ export class DatabaseStack extends Stack {
 
         this.rdsProxyEndpointTableCreator = rdsProxyTableCreator.endpoint;
         this.rdsProxyEndpointAdmin = rdsProxyAdmin.endpoint;
+
+        /**
+         * Optional read replica for read-only queries, deployed with -c dbReadReplica=true.
+         * RDS Proxy cannot front a Postgres read replica, so clients connect to it directly.
+         */
+        const readReplicaContext = this.node.tryGetContext("dbReadReplica");
+        if (readReplicaContext === true || readReplicaContext === "true") {
+            const readReplica = new rds.DatabaseInstanceReadReplica(this, `${id}-readReplica`, {
+                sourceDatabaseInstance: this.dbInstance,
+                vpc: vpcStack.vpc,
+                vpcSubnets: {
+                    subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+                },
+                instanceType: ec2.InstanceType.of(
+                    ec2.InstanceClass.BURSTABLE4_GRAVITON,
+                    ec2.InstanceSize.MEDIUM
+                ),
+                securityGroups: this.dbInstance.connections.securityGroups,
+                parameterGroup: parameterGroup,
+                autoMinorVersionUpgrade: true,
+                deletionProtection: true,
+                publiclyAccessible: false,
+                monitoringInterval: Duration.seconds(60),
+            });
+            this.readerEndpoint = readReplica.dbInstanceEndpointAddress;
+        } else {
+            this.readerEndpoint = "";
+        }
     }
 }
\ No newline at end of file
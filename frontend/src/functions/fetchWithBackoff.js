@@ -0,0 +1,26 @@
+// The generation endpoints shed requests over the token rate with a 429 and a Retry-After header
+// (in seconds). Short waits are retried here; anything longer is left to the caller, which should
+// ask the user to try again shortly.
+
+const MAX_RETRIES = 2;
+const MAX_WAIT_SECONDS = 10;
+
+export const TRY_AGAIN_MESSAGE =
+  "The assistant is busy right now. Please try again in a few moments.";
+
+const retryAfterSeconds = (response, attempt) => {
+  const seconds = Number(response.headers.get("Retry-After"));
+  return Number.isFinite(seconds) && seconds > 0 ? seconds : 2 ** attempt;
+};
+
+export async function fetchWithBackoff(url, options, retries = MAX_RETRIES) {
+  for (let attempt = 0; ; attempt++) {
+    const response = await fetch(url, options);
+    if (response.status !== 429 || attempt >= retries) return response;
+
+    const seconds = retryAfterSeconds(response, attempt);
+    if (seconds > MAX_WAIT_SECONDS) return response;
+    // Jitter keeps clients shed together from coming back together
+    await new Promise((resolve) => setTimeout(resolve, seconds * 1000 + Math.random() * 500));
+  }
+}
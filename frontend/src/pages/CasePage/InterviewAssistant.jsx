@@ -29,7 +29,17 @@ import Snackbar from "@mui/material/Snackbar";
 import Alert from "@mui/material/Alert";
 import CheckIcon from "@mui/icons-material/Check";
 import MessageCopyButton from "../../components/MessageCopyButton";
-
+import { fetchWithBackoff, TRY_AGAIN_MESSAGE } from "../../functions/fetchWithBackoff";
+
+const constructCaseWebSocketUrl = (cognitoToken) => {
+  const tempUrl = import.meta.env.VITE_GRAPHQL_WS_URL;
+  const apiUrl = tempUrl.replace("https://", "wss://");
+  const urlObj = new URL(apiUrl);
+  urlObj.hostname = urlObj.hostname.replace("appsync-api", "appsync-realtime-api");
+  const header = { host: new URL(tempUrl).hostname, Authorization: cognitoToken };
+  const encodedHeader = btoa(JSON.stringify(header));
+  return `${urlObj.toString()}?header=${encodedHeader}&payload=e30=`;
+};
 
 const InterviewAssistant = () => {
   const { caseId } = useParams();
@@ -178,6 +188,69 @@ const InterviewAssistant = () => {
     fetchMessages();
   }, [caseId]);
 
+  // The case title is generated asynchronously after creation; refresh it when it lands
+  useEffect(() => {
+    let ws;
+    const subscribeToTitle = async () => {
+      const session = await fetchAuthSession();
+      const token = session.tokens.idToken;
+      const cognitoToken = token.toString();
+      const cognito_id = token.payload.sub;
+
+      ws = new WebSocket(constructCaseWebSocketUrl(cognitoToken), "graphql-ws");
+      ws.onopen = () => {
+        ws.send(JSON.stringify({ type: "connection_init" }));
+      };
+      ws.onmessage = async ({ data }) => {
+        const msg = JSON.parse(data);
+        if (msg.type === "connection_ack") {
+          ws.send(JSON.stringify({
+            id: caseId,
+            type: "start",
+            payload: {
+              data: JSON.stringify({
+                query: `subscription OnNotify($audioFileId: String!) {
+                  onNotify(audioFileId: $audioFileId) {
+                    message
+                    audioFileId
+                  }
+                }`,
+                variables: { audioFileId: caseId }
+              }),
+              extensions: {
+                authorization: {
+                  Authorization: cognitoToken,
+                  host: new URL(import.meta.env.VITE_GRAPHQL_WS_URL).hostname
+                }
+              }
+            }
+          }));
+        } else if (msg.type === "data" && msg.payload?.data?.onNotify?.message === "title_generated") {
+          ws.close();
+          const response = await fetch(
+            `${import.meta.env.VITE_API_ENDPOINT}student/case_page?case_id=${caseId}&cognito_id=${cognito_id}`,
+            {
+              method: "GET",
+              headers: { Authorization: token, "Content-Type": "application/json" },
+            }
+          );
+          if (response.ok) {
+            const data = await response.json();
+            setCaseData((prev) => ({ ...prev, case_title: data.caseData.case_title }));
+          }
+        }
+      };
+      ws.onerror = (err) => {
+        console.error("Case notification WebSocket error:", err);
+      };
+    };
+
+    subscribeToTitle();
+    return () => {
+      if (ws) ws.close();
+    };
+  }, [caseId]);
+
   useEffect(() => {
     const fetchMessageCounter = async () => {
       const session = await fetchAuthSession();
@@ -294,7 +367,7 @@ const InterviewAssistant = () => {
         severity: "warning",
       });
 
-      const response = await fetch(
+      const response = await fetchWithBackoff(
         `${import.meta.env.VITE_API_ENDPOINT}student/summary_generation?case_id=${caseId}`,
         {
           method: "POST",
@@ -305,6 +378,15 @@ const InterviewAssistant = () => {
         }
       );
 
+      if (response.status === 429) {
+        setSnackbar({
+          open: true,
+          message: TRY_AGAIN_MESSAGE,
+          severity: "warning",
+        });
+        return;
+      }
+
       setSnackbar({
         open: true, 
         message: "Summary generated successfully!",
@@ -324,7 +406,7 @@ const InterviewAssistant = () => {
 
     async function getFetchBody() {
       try {
-        const response = await fetch(
+        const response = await fetchWithBackoff(
           `${import.meta.env.VITE_API_ENDPOINT}student/text_generation?case_id=${caseId}`,
           {
             method: "POST",
@@ -338,6 +420,12 @@ const InterviewAssistant = () => {
           }
         );
 
+        // Shed while the assistant is over its rate, after the short waits were retried
+        if (response.status === 429) {
+          setIsAItyping(false);
+          return TRY_AGAIN_MESSAGE;
+        }
+
         const data = await response.json();
 
         // Check if guardrails were triggered
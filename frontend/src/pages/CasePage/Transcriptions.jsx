@@ -19,6 +19,14 @@ import { v4 as uuidv4 } from "uuid";
 import SideMenu from "./SideMenu";
 import NotFound from "../NotFound";
 
+// Recordings at least this long are transcribed in segments
+const SEGMENTED_MIN_SECONDS = 20 * 60;
+
+// Files at least this large are uploaded in parallel parts
+const MULTIPART_MIN_BYTES = 50 * 1024 * 1024;
+const MULTIPART_CONCURRENCY = 4;
+const PART_ATTEMPTS = 3;
+
 const constructTranscriptionWebSocketUrl = (cognitoToken, audioFileId) => {
   const tempUrl = import.meta.env.VITE_GRAPHQL_WS_URL;
   const apiUrl = tempUrl.replace("https://", "wss://");
@@ -154,6 +162,62 @@ const [selectedTranscription, setSelectedTranscription] = useState(null);
     return data;
   };
 
+  const multipartRequest = async (method, audioFileId, params = {}, body) => {
+    const { tokens } = await fetchAuthSession();
+    const query = new URLSearchParams({
+      audio_file_id: audioFileId,
+      file_name: audioFile.name,
+      file_type: audioFile.type,
+      ...params,
+    });
+    const response = await fetch(
+      `${import.meta.env.VITE_API_ENDPOINT}student/multipart_upload?${query}`,
+      {
+        method,
+        headers: { Authorization: tokens.idToken, "Content-Type": "application/json" },
+        body: body ? JSON.stringify(body) : undefined,
+      }
+    );
+    if (!response.ok) throw new Error("Multipart upload request failed");
+    return response.json();
+  };
+
+  // Uploads large files in parts, several at a time; a failed part is retried on its own
+  const uploadFileInParts = async (audioFileId, file) => {
+    const { uploadId, partSize, parts } = await multipartRequest("POST", audioFileId, {
+      file_size: file.size,
+    });
+    const uploaded = [];
+    const queue = [...parts];
+
+    const uploadPart = async ({ partNumber, url }) => {
+      const start = (partNumber - 1) * partSize;
+      const blob = file.slice(start, start + partSize);
+      for (let attempt = 1; ; attempt++) {
+        try {
+          const response = await fetch(url, { method: "PUT", body: blob });
+          if (!response.ok) throw new Error(`Part ${partNumber} failed`);
+          uploaded.push({ partNumber, etag: response.headers.get("ETag") });
+          return;
+        } catch (err) {
+          if (attempt >= PART_ATTEMPTS) throw err;
+        }
+      }
+    };
+
+    try {
+      await Promise.all(
+        Array.from({ length: MULTIPART_CONCURRENCY }, async () => {
+          while (queue.length) await uploadPart(queue.shift());
+        })
+      );
+      await multipartRequest("PUT", audioFileId, { upload_id: uploadId }, { parts: uploaded });
+    } catch (err) {
+      await multipartRequest("DELETE", audioFileId, { upload_id: uploadId }).catch(() => {});
+      throw err;
+    }
+  };
+
   const uploadFile = async (file, presignedUrl) => {
     const response = await fetch(presignedUrl, {
       method: "PUT",
@@ -164,21 +228,40 @@ const [selectedTranscription, setSelectedTranscription] = useState(null);
     return response;
   };
 
+  // Reads the recording length from the file's metadata; resolves to 0 if it cannot be read
+  const getAudioDuration = (file) =>
+    new Promise((resolve) => {
+      const audio = document.createElement("audio");
+      const url = URL.createObjectURL(file);
+      const done = (duration) => {
+        URL.revokeObjectURL(url);
+        resolve(Number.isFinite(duration) ? duration : 0);
+      };
+      audio.preload = "metadata";
+      audio.onloadedmetadata = () => done(audio.duration);
+      audio.onerror = () => done(0);
+      audio.src = url;
+    });
+
   const audioToText = async (audioFileId) => {
     const fileName = audioFile.name;
     const fileType = audioFile.file.type;
     const fileExtension = audioFile.type;
     const { tokens } = await fetchAuthSession();
     const token = tokens.idToken;
-    const cognitoToken = tokens.idToken.toString();
     const cognitoId = tokens.idToken.payload.sub;
 
+    // Long recordings are transcribed in segments so partial transcripts arrive sooner
+    const duration = await getAudioDuration(audioFile.file);
+    const segmented = duration >= SEGMENTED_MIN_SECONDS;
+
+    // Starts the transcription job; completion is announced over the WebSocket subscription
     const response = await fetch(
       `${import.meta.env.VITE_API_ENDPOINT}student/audio_to_text?` +
       `audio_file_id=${encodeURIComponent(audioFileId)}&` +
       `file_name=${encodeURIComponent(fileName)}&` +
       `file_type=${encodeURIComponent(fileExtension)}&` +
-      `cognito_token=${encodeURIComponent(cognitoToken)}`,
+      `segmented=${segmented}`,
       {
         method: "GET",
         headers: { Authorization: token, "Content-Type": "application/json" },
@@ -187,7 +270,7 @@ const [selectedTranscription, setSelectedTranscription] = useState(null);
 
     if (!response.ok) throw new Error("Failed to transcribe audio");
     const data = await response.json();
-    return data.text;
+    return data.jobName;
   };
 
   const handleAudioUploading = async () => {
@@ -198,8 +281,12 @@ const [selectedTranscription, setSelectedTranscription] = useState(null);
 
     try {
       const audioFileId = uuidv4();
-      const presignedUrl = await generatePresignedUrl(audioFileId);
-      await uploadFile(audioFile.file, presignedUrl);
+      if (audioFile.file.size >= MULTIPART_MIN_BYTES) {
+        await uploadFileInParts(audioFileId, audioFile.file);
+      } else {
+        const presignedUrl = await generatePresignedUrl(audioFileId);
+        await uploadFile(audioFile.file, presignedUrl);
+      }
       await initializeAudioFileInDb(audioFileId, audioFile.name, audioTitle);
       audioToText(audioFileId);
       const { tokens } = await fetchAuthSession();
@@ -289,6 +376,13 @@ const [selectedTranscription, setSelectedTranscription] = useState(null);
            // ✅ Refresh transcriptions in real-time
           fetchTranscriptions();
           resolve();
+        } else if (msg.type === "data" && msg.payload?.data?.onNotify?.message === "transcription_partial") {
+          // A segmented transcription stored a longer partial transcript
+          fetchTranscriptions();
+          setSnackbarMessage("Partial transcript available");
+        } else if (msg.type === "data" && msg.payload?.data?.onNotify?.message === "transcription_failed") {
+          ws.close();
+          reject(new Error("Transcription failed"));
         } else if (msg.type === "error") {
           console.error("WebSocket subscription error:", msg);
           reject(new Error(`Subscription error: ${JSON.stringify(msg)}`));
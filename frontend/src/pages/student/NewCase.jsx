@@ -25,6 +25,7 @@ import { useNavigate } from "react-router-dom";
 import theme from "../../Theme";
 import StudentHeader from "../../components/StudentHeader";
 import { fetchAuthSession, fetchUserAttributes } from "aws-amplify/auth";
+import { fetchWithBackoff, TRY_AGAIN_MESSAGE } from "../../functions/fetchWithBackoff";
 import { v4 as uuidv4 } from 'uuid';
 
 const NewCaseForm = () => {
@@ -102,7 +103,7 @@ const NewCaseForm = () => {
       const token = tokens.idToken;
 
       // Step 1: Create the case in the database
-      const response = await fetch(
+      const response = await fetchWithBackoff(
         `${import.meta.env.VITE_API_ENDPOINT}student/case?` +
           `user_id=${encodeURIComponent(cognito_id)}`,
         {
@@ -115,6 +116,12 @@ const NewCaseForm = () => {
         }
       );
 
+      if (response.status === 429) {
+        setError(TRY_AGAIN_MESSAGE);
+        setIsSubmitting(false);
+        return;
+      }
+
       const data = await response.json();
 
       // Check for guardrails or other errors
@@ -124,40 +131,12 @@ const NewCaseForm = () => {
         return;
       }
 
-      // Step 3: Optionally update the case with the new title
-      const updatedCaseData = {
-        case_title: data.case_title,
-        case_type: formData.broadAreaOfLaw,
-        jurisdiction: formData.jurisdiction,
-        status: "In Progress",
-        case_description: formData.legalMatterSummary,
-        province: formData.province,
-        statute: formData.statuteDetails,
-      };
-      
-      const updateResponse = await fetch(
-        `${import.meta.env.VITE_API_ENDPOINT}student/edit_case?case_id=${data.case_id}`,
-        {
-          method: "PUT",
-          headers: {
-            Authorization: token,
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify(updatedCaseData),
-        }
-      );
-
-      // If the update fails, you can optionally display an error
-      if (!updateResponse.ok) {
-        const updateData = await updateResponse.json();
-        setError(updateData.error || "Failed to update case title");
-        setIsSubmitting(false);
-        return;
-      }
+      // The case title is generated asynchronously by the case lambda and
+      // announced over the notification channel, so no title update is needed here.
 
       // Step 4: Continue with the rest of the logic (e.g., generating the legal summary)
       
-      const init_llm_response = await fetch(
+      const init_llm_response = await fetchWithBackoff(
         `${import.meta.env.VITE_API_ENDPOINT}student/text_generation?case_id=${data.case_id}`,
         {
           method: "POST",
@@ -171,6 +150,13 @@ const NewCaseForm = () => {
         }
       );
 
+      // The case exists, so the student is sent to it to ask again rather than resubmitting the form
+      if (init_llm_response.status === 429) {
+        console.warn("Initial analysis shed under load. Redirecting to the case.");
+        navigate(`/case/${data.case_id}/interview-assistant`);
+        return;
+      }
+
       if (init_llm_response.status === 504) {
         console.warn("LLM generation timed out. Redirecting to /home.");
         navigate("/home");